@@ -11,22 +11,26 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import hashlib
 import os
 import re
 import time
 import json
 import logging
 import zipfile
-import sqlite3
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import tldextract
 import multiprocessing as mp
 from pathlib import Path
 from tqdm import tqdm
 from datetime import datetime
 from androguard.core.bytecodes import dvm
+from androguard.core.bytecodes.apk import APK
 from androguard.misc import AnalyzeAPK
-from utils.dex_parser import DEXParser
+from utils.dex_parser import DEXParser, fast_apk_id
+from utils.db_connection import initialize_pool, execute_query
 from utils.ui_logger import UILogger, ui_logger, should_cancel as session_should_cancel
 
 # Import config values with fallbacks
@@ -36,6 +40,15 @@ except ImportError:
     MAX_DOWNLOAD_RETRIES = 20
     DOWNLOAD_RETRY_CYCLES = 4
 
+# Bump when extraction output changes, so feature caches written by older code are ignored
+FEATURE_CACHE_VERSION = 1
+
+# Shared HTTP session so concurrent AndroZoo downloads reuse pooled TLS connections. Dropped
+# connections are retried with backoff here; bad responses are retried by download_apk
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16,
+                                           max_retries=Retry(total=3, backoff_factor=0.5)))
+
 def sanitize_string(input_string):
     """Clean and sanitise extracted strings"""
     return input_string.replace('\x00', '')
@@ -120,13 +133,16 @@ def extract_apk_features(file_path, data_type='urls', use_cache_json=False, pars
     Args:
         file_path: Path to APK file
         data_type: Type of data to extract ('urls', 'domains', 'subdomains', etc.)
-        use_cache_json: Whether to use cached JSON results
+        use_cache_json: Whether to use cached JSON results, stored next to the APK and
+            keyed by parser, data type and FEATURE_CACHE_VERSION
         parser_selection: Parser to use ('digisilk' or 'androguard')
     
     Returns:
         List or dict with extracted features
     """
-    json_file_path = f"{file_path}.{data_type}.json"
+    # "custom_dex" is the legacy name for the digisilk parser
+    parser_key = "digisilk" if parser_selection in ["digisilk", "custom_dex"] else parser_selection
+    json_file_path = f"{file_path}.{parser_key}.v{FEATURE_CACHE_VERSION}.{data_type}.json"
     
     # Check cache first
     if os.path.exists(json_file_path) and use_cache_json:
@@ -136,6 +152,7 @@ def extract_apk_features(file_path, data_type='urls', use_cache_json=False, pars
     
     # Initialise data structure
     data = []
+    extracted = False
     
     try:
         if parser_selection in ["digisilk", "custom_dex"]:  # Support both legacy and new naming
@@ -187,14 +204,18 @@ def extract_apk_features(file_path, data_type='urls', use_cache_json=False, pars
                             data.append(class_name)
 
         logging.info(f"Extracted {len(data)} items of type {data_type} from {file_path}")
+        extracted = True
 
     except Exception as e:
         logging.error(f'Error whilst extracting {data_type} from {file_path}: {str(e)}')
 
-    # Cache the results
-    if use_cache_json:
-        with open(json_file_path, 'w') as json_file:
+    # Cache the results, unless extraction failed. Written to a temporary file and renamed
+    # so pool workers never read a partial cache
+    if use_cache_json and extracted:
+        tmp_path = f"{json_file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as json_file:
             json.dump(data, json_file)
+        os.replace(tmp_path, json_file_path)
     
     return data
 
@@ -204,23 +225,20 @@ def extract_apk_features(file_path, data_type='urls', use_cache_json=False, pars
 
 def initialize_database(db_path):
     """Initialize database - exact copy from original files"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
+    # Pooled connections are reused across calls and threads (no-op once the pool exists)
+    initialize_pool(db_path)
+    execute_query('''
     CREATE TABLE IF NOT EXISTS apks (
         sha256 TEXT PRIMARY KEY,
         pkg_name TEXT,
         vercode TEXT,
         vt_scan_date TEXT
     )
-    ''')
-    conn.commit()
-    conn.close()
+    ''', commit=True)
 
 def find_sha256_vercode_vtscandate(package_name, db_path, start_date, end_date):
     """Find APK metadata from database"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    initialize_pool(db_path)
 
     query = """
     SELECT sha256, vercode, vt_scan_date
@@ -229,15 +247,13 @@ def find_sha256_vercode_vtscandate(package_name, db_path, start_date, end_date):
     ORDER BY vt_scan_date
     """
 
-    cursor.execute(query, (package_name, start_date, end_date))
-    results = cursor.fetchall()
-    conn.close()
+    results = execute_query(query, (package_name, start_date, end_date), fetch_all=True)
 
     return [(sha256, vercode, vt_scan_date) for sha256, vercode, vt_scan_date in results]
 
 def download_file_with_progress(url, filename):
     """Download file with progress bar"""
-    response = requests.get(url, stream=True)
+    response = http_session.get(url, stream=True)
     total = int(response.headers.get('content-length', 0))
     with tqdm(total=total, unit='iB', unit_scale=True) as progress_bar:
         with open(filename, 'wb') as file:
@@ -265,7 +281,7 @@ def download_apk(sha256, vercode, vtscandate, package_name, apikey, universal_ca
     for cycle in range(retry_cycles):
         attempts = 0
         while attempts < max_retries:
-            response = requests.get(url, stream=True)
+            response = http_session.get(url, stream=True)
             if response.status_code == 200:
                 with open(apk_path, 'wb') as f:
                     for chunk in response.iter_content(chunk_size=1024):
@@ -366,6 +382,26 @@ def process_package_apks(universal_cache_dir, package_name, num_cores, parser_se
 # Validation and Cleanup Functions
 # ============================================================================
 
+def apk_digest(path):
+    """SHA-256 hex digest of a file, hashed by OpenSSL where hashlib.file_digest exists"""
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        digest = hashlib.sha256()
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+        return digest.hexdigest()
+
+def read_apk_id(path):
+    """Package name, version code and SHA-256, falling back to a full androguard parse for the first two"""
+    try:
+        package_name, version_code = fast_apk_id(path)
+    except Exception as e:
+        logging.warning(f"Header-only manifest parse failed for {path}: {str(e)}")
+        apk = APK(path)
+        package_name, version_code = apk.get_package(), apk.get_androidversion_code()
+    return package_name, version_code, apk_digest(path)
+
 def check_apk_in_cache(sha256, universal_cache_dir):
     """Check if APK exists in cache"""
     apk_path = os.path.join(universal_cache_dir, f"{sha256}.apk")
@@ -13,10 +13,25 @@
 # limitations under the License.
 import dash
 import dash_bootstrap_components as dbc
+import importlib.util
 import os
+import threading
+from flask import request, send_file
 from flask_login import LoginManager, UserMixin
 import secrets
 
+try:
+    from flask_compress import Compress
+    HAS_FLASK_COMPRESS = True
+except ImportError:
+    HAS_FLASK_COMPRESS = False
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
 # Get environment variables with defaults
 debug_mode = os.environ.get('DASH_DEBUG_MODE', 'True').lower() == 'true'
 
@@ -25,6 +40,80 @@ app = dash.Dash(__name__, external_stylesheets=[dbc.themes.JOURNAL], title="JANU
 server = app.server
 app.config.suppress_callback_exceptions = True
 
+# Let browsers cache static assets (sponsors.png, custom.js) between visits.
+# Asset filenames aren't content-hashed, so keep the default at a day
+server.config['SEND_FILE_MAX_AGE_DEFAULT'] = int(os.environ.get('ASSET_MAX_AGE', 86400))
+
+# Serve a WebP copy of the sponsors banner to browsers that accept it. The copy is made on the
+# first request that could use it, not at import; if it can't be written, the PNG is served
+SPONSORS_PNG = os.path.join(app.config.assets_folder, 'sponsors.png')
+SPONSORS_WEBP = os.path.join(app.config.assets_folder, 'sponsors.webp')
+
+def ensure_webp_variant(png_path, webp_path, quality=85):
+    """Write a WebP copy of a PNG unless an up-to-date one exists; returns whether it's usable"""
+    try:
+        if os.path.exists(webp_path) and os.path.getmtime(webp_path) >= os.path.getmtime(png_path):
+            return True
+        if not HAS_PIL:
+            return False
+        # Write beside the target and rename, so a failed save never leaves a partial WebP
+        tmp_path = f"{webp_path}.{os.getpid()}.tmp"
+        with Image.open(png_path) as image:
+            image.save(tmp_path, 'WEBP', quality=quality)
+        os.replace(tmp_path, webp_path)
+        return True
+    except (OSError, ValueError, KeyError):
+        # Missing PNG, read-only assets folder or no WebP support in Pillow
+        return False
+
+_sponsors_webp_state = {}
+_sponsors_webp_lock = threading.Lock()
+
+def has_sponsors_webp():
+    """Whether the WebP banner can be served, checked (and generated) once per process"""
+    if 'usable' not in _sponsors_webp_state:
+        with _sponsors_webp_lock:
+            if 'usable' not in _sponsors_webp_state:
+                _sponsors_webp_state['usable'] = ensure_webp_variant(SPONSORS_PNG, SPONSORS_WEBP)
+    return _sponsors_webp_state['usable']
+
+@server.before_request
+def serve_sponsors_webp():
+    if request.path == '/assets/sponsors.png' and 'image/webp' in request.headers.get('Accept', '') and has_sponsors_webp():
+        return send_file(SPONSORS_WEBP, mimetype='image/webp')
+
+@server.after_request
+def vary_sponsors_on_accept(response):
+    # The PNG and WebP share a URL, so shared caches must key on Accept
+    if request.path == '/assets/sponsors.png' and has_sponsors_webp():
+        response.vary.add('Accept')
+    return response
+
+# Compress HTML/JSON responses (layout, callback payloads) when flask-compress is installed
+if HAS_FLASK_COMPRESS:
+    Compress(server)
+
+# Dash encodes layouts and callback payloads, and the views serialise figures, through plotly's
+# JSON encoder; use orjson when installed. This is the only place the engine is switched
+HAS_ORJSON = importlib.util.find_spec('orjson') is not None
+if HAS_ORJSON:
+    import plotly.io as pio
+    pio.json.config.default_engine = "orjson"
+
+# Manager for long-running (background) callbacks. Opt-in: background callbacks run in worker
+# processes, which don't share the in-process package, figure and render caches
+background_callback_manager = None
+if os.environ.get('BACKGROUND_CALLBACKS', 'False').lower() == 'true':
+    try:
+        import diskcache
+        from dash import DiskcacheManager
+        # DiskcacheManager also needs multiprocess and psutil, and raises ImportError without them
+        background_callback_manager = DiskcacheManager(
+            diskcache.Cache(os.environ.get('BACKGROUND_CALLBACK_CACHE_DIR', os.path.join('cache', 'background')))
+        )
+    except ImportError as e:
+        print(f"Background callbacks unavailable, running callbacks in-process: {e}")
+
 # Set a secret key for Flask session management
 # In production, you should use a more secure method to generate and store this key
 server.secret_key = os.environ.get('SECRET_KEY', secrets.token_hex(16))
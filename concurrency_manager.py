@@ -58,6 +58,11 @@ def get_max_concurrent_users():
 # Global variables for concurrency control
 MAX_CONCURRENT_USERS = get_max_concurrent_users()  # Dynamic based on system resources
 active_sessions = {}  # Dictionary to track active analysis sessions
+active_count = 0  # len(active_sessions), published for the capacity indicators
+
+def get_active_count():
+    """Number of active analysis sessions"""
+    return active_count
 
 def clean_stale_sessions():
     """Remove sessions that have been active for too long"""
@@ -68,30 +73,36 @@ def clean_stale_sessions():
         if current_time - session_data['start_time'] > SESSION_TIMEOUT:
             stale_sessions.append(session_id)
     
+    global active_count
     for session_id in stale_sessions:
         logger.info(f"Removing stale session: {session_id}")
         del active_sessions[session_id]
+    active_count = len(active_sessions)
     
     if stale_sessions:
         logger.info(f"Removed {len(stale_sessions)} stale sessions. Active sessions: {len(active_sessions)}")
 
 def register_session(session_id, data):
     """Register a new analysis session"""
+    global active_count
     active_sessions[session_id] = {
         'start_time': time.time(),
         **data
     }
+    active_count = len(active_sessions)
     logger.info(f"Registered session {session_id}. Current active sessions: {len(active_sessions)}")
     return True
 
 def remove_session(session_id):
     """Remove a session when it's complete"""
+    global active_count
     if session_id in active_sessions:
         del active_sessions[session_id]
+        active_count = len(active_sessions)
         logger.info(f"Removed session {session_id}. Current active sessions: {len(active_sessions)}")
         return True
     return False
 
 def has_capacity():
     """Check if the server has capacity for more sessions"""
-    return len(active_sessions) < MAX_CONCURRENT_USERS
+    return active_count < MAX_CONCURRENT_USERS
@@ -17,6 +17,16 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Applied to every new connection: WAL lets readers proceed during writes, NORMAL sync drops the
+# per-commit fsync (still safe under WAL), and a larger page cache plus mmap cut read syscalls
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -64000",  # 64 MB
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+)
+
 class SQLiteConnectionPool:
     """A simple connection pool for SQLite"""
     _instance = None
@@ -66,6 +76,8 @@ class SQLiteConnectionPool:
                     conn.execute("PRAGMA foreign_keys = ON")
                     # Set busy timeout to avoid database locked errors
                     conn.execute("PRAGMA busy_timeout = 30000")  # 30 seconds
+                    for pragma in CONNECTION_PRAGMAS:
+                        conn.execute(pragma)
                     self._in_use[thread_id] = conn
                     return conn
                 except Exception as e:
@@ -72,9 +72,77 @@ class DEXParser:
 def extract_apk_dex_files(apk_path):
     """Extract DEX files from APK"""
     dex_files = []
+    # ZipFile seeks straight to the members, so only the DEX entries are read
     with zipfile.ZipFile(apk_path, 'r') as z:
         for filename in z.namelist():
             if filename.endswith('.dex'):
                 dex_data = z.read(filename)
                 dex_files.append(dex_data)
     return dex_files
+
+# Binary AndroidManifest.xml (AXML) chunk types and the versionCode resource id
+AXML_STRING_POOL = 0x0001
+AXML_RESOURCE_MAP = 0x0180
+AXML_START_ELEMENT = 0x0102
+ATTR_VERSION_CODE = 0x0101021b
+
+def _read_axml_string(data, offset, utf8):
+    """Read one string from an AXML string pool"""
+    if utf8:
+        # UTF-16 length then UTF-8 byte length, each 1 or 2 bytes
+        if data[offset] & 0x80:
+            offset += 2
+        else:
+            offset += 1
+        length = data[offset]
+        if length & 0x80:
+            length = ((length & 0x7f) << 8) | data[offset + 1]
+            offset += 2
+        else:
+            offset += 1
+        return data[offset:offset + length].decode('utf-8', errors='replace')
+    length = struct.unpack_from('<H', data, offset)[0]
+    offset += 2
+    if length & 0x8000:
+        length = ((length & 0x7fff) << 16) | struct.unpack_from('<H', data, offset)[0]
+        offset += 2
+    return data[offset:offset + length * 2].decode('utf-16-le', errors='replace')
+
+def fast_apk_id(apk_path):
+    """Read (package, versionCode) from the binary manifest without a full APK parse"""
+    with zipfile.ZipFile(apk_path, 'r') as z:
+        data = z.read('AndroidManifest.xml')
+
+    strings = []
+    resource_ids = []
+    offset = struct.unpack_from('<H', data, 2)[0]
+    while offset + 8 <= len(data):
+        chunk_type, header_size, chunk_size = struct.unpack_from('<HHI', data, offset)
+        if chunk_size < 8:
+            break
+        if chunk_type == AXML_STRING_POOL:
+            string_count, _, flags, strings_start = struct.unpack_from('<IIII', data, offset + 8)
+            string_offsets = struct.unpack_from(f'<{string_count}I', data, offset + header_size)
+            utf8 = bool(flags & 0x100)
+            strings = [_read_axml_string(data, offset + strings_start + o, utf8) for o in string_offsets]
+        elif chunk_type == AXML_RESOURCE_MAP:
+            resource_ids = struct.unpack_from(f'<{(chunk_size - header_size) // 4}I', data, offset + header_size)
+        elif chunk_type == AXML_START_ELEMENT:
+            # The first element is <manifest>; only its attributes are needed
+            attr_start, attr_size, attr_count = struct.unpack_from('<HHH', data, offset + header_size + 8)
+            package = version_code = None
+            for i in range(attr_count):
+                attr_offset = offset + header_size + attr_start + i * attr_size
+                _, name, raw_value, _, _, data_type, value = struct.unpack_from('<IIIHBBI', data, attr_offset)
+                attr_name = strings[name] if name < len(strings) else ''
+                if attr_name == 'package':
+                    package = strings[raw_value]
+                elif attr_name == 'versionCode' or (name < len(resource_ids) and resource_ids[name] == ATTR_VERSION_CODE):
+                    # Stored as a string (type 0x03) or as an integer
+                    version_code = strings[raw_value] if data_type == 0x03 else str(value)
+            # Let callers fall back to a full parse rather than pass on a partial id
+            if not package or version_code is None:
+                raise ValueError(f"Manifest in {apk_path} has no package or versionCode attribute")
+            return package, version_code
+        offset += chunk_size
+    raise ValueError(f"No manifest element found in {apk_path}")
@@ -0,0 +1,56 @@
+# Copyright 2025 Elisa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Builds the base64 data URLs behind the "Download Figure" buttons, shared by all views so
+each figure is serialised and encoded once.
+"""
+import base64
+import hashlib
+import threading
+import plotly.io as pio
+from plotly.offline import get_plotlyjs_version
+
+# Standalone page for a downloaded figure, loading plotly.js from the CDN rather than inlining it
+DOWNLOAD_HTML_TEMPLATE = (
+    '<div><script src="https://cdn.plot.ly/plotly-{version}.min.js" charset="utf-8"></script>'
+    '<div id="janus-figure" class="plotly-graph-div" style="height:100%; width:100%;"></div>'
+    '<script type="text/javascript">var figure = {figure_json};'
+    'Plotly.newPlot("janus-figure", figure.data, figure.layout, {{"responsive": true}});</script></div>'
+)
+
+# Encoded download hrefs, keyed by a hash of the figure JSON
+_download_href_cache = {}
+_download_href_lock = threading.Lock()
+MAX_CACHED_DOWNLOADS = 16
+
+def figure_download_href(fig):
+    """Build the base64 data URL for a figure (a Figure or plain dict), cached on its content"""
+    figure_json = pio.to_json(fig, validate=False)
+    fig_hash = hashlib.sha256(figure_json.encode()).hexdigest()
+    with _download_href_lock:
+        href = _download_href_cache.get(fig_hash)
+    if href is None:
+        # Embed the JSON already produced for the hash; escape "</" so it can't close the script
+        plot_html = DOWNLOAD_HTML_TEMPLATE.format(
+            version=get_plotlyjs_version(),
+            figure_json=figure_json.replace('</', '<\\/'),
+        )
+        encoded = base64.b64encode(plot_html.encode()).decode()
+        href = f"data:text/html;base64,{encoded}"
+        with _download_href_lock:
+            if len(_download_href_cache) >= MAX_CACHED_DOWNLOADS:
+                # Remove oldest entry
+                _download_href_cache.pop(next(iter(_download_href_cache)), None)
+            _download_href_cache[fig_hash] = href
+    return href
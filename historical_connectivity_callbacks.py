@@ -31,18 +31,17 @@ import requests
 import time
 
 # Concurrency controls
-from utils.concurrency_manager import active_sessions, MAX_CONCURRENT_USERS, register_session, remove_session, has_capacity
+from utils.concurrency_manager import active_sessions, MAX_CONCURRENT_USERS, register_session, remove_session, has_capacity, get_active_count
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+HEX_COLOR_PATTERN = re.compile(r'^#(?:[0-9a-fA-F]{3}){1,2}$')
+VALID_COLOR_NAMES = frozenset(['red', 'blue', 'green', 'yellow', 'purple', 'orange', 'black', 'white'])
+
 def is_valid_color(color):
-    # Check for valid hex colour
-    if re.match(r'^#(?:[0-9a-fA-F]{3}){1,2}$', color):
-        return True
-    # Check for valid colour name
-    valid_color_names = ['red', 'blue', 'green', 'yellow', 'purple', 'orange', 'black', 'white']
-    return color.lower() in valid_color_names
+    # Check for valid hex colour or colour name
+    return bool(HEX_COLOR_PATTERN.match(color)) or color.lower() in VALID_COLOR_NAMES
 
 # Load package IDs with counts
 try:
@@ -529,11 +528,12 @@ def show_spinner_on_click(n_clicks, package_value, api_key_valid, api_key_invali
     [Output("historical-server-capacity-indicator", "value"),
      Output("historical-server-capacity-indicator", "color"),
      Output("historical-server-capacity-text", "children")],
-    [Input("progress-interval", "n_intervals")]
+    [Input("progress-interval", "n_intervals")],
+    [State("historical-server-capacity-text", "children")]
 )
-def update_historical_server_capacity(n_intervals):
+def update_historical_server_capacity(n_intervals, current_text):
     """Update the server capacity indicator for historical connectivity page"""
-    num_active = len(active_sessions)
+    num_active = get_active_count()
     capacity_percentage = (num_active / MAX_CONCURRENT_USERS) * 100
     
     # Pick color based on load
@@ -549,6 +549,8 @@ def update_historical_server_capacity(n_intervals):
     
     # Create text info
     text = f"{status}: {num_active}/{MAX_CONCURRENT_USERS} active analyses"
+    if text == current_text:
+        raise PreventUpdate
     
     return capacity_percentage, color, text
 
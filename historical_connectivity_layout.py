@@ -13,6 +13,7 @@
 # limitations under the License.
 from dash import dcc, html
 import dash_bootstrap_components as dbc
+from utils.logo_svg import ascii_art_data_uri
 from datetime import datetime
 
 ascii_logo = """
@@ -91,12 +92,34 @@ color_palette = [
     "#FF69B4", "#800080", "#FFA500", "#008000",  # Vibrant colors
 ]
 
+# Static component options, built once at import
+CATEGORY_CHECKLIST_OPTIONS = {
+    category: tuple({"label": name, "value": name} for name in items)
+    for category, items in preset_configs.items()
+}
+COLOR_PICKER_OPTIONS = tuple({
+    "label": html.Div(style={
+        "backgroundColor": color,
+        "width": "20px",
+        "height": "20px",
+        "border": "1px solid #dee2e6",
+        "borderRadius": "4px",
+        "display": "inline-block"
+    }),
+    "value": color
+} for color in color_palette)
+CORE_SLIDER_MARKS = {i: str(i) for i in range(1, 5)}
+
+# Static header rows, built once
+ASCII_LOGO_ROW = dbc.Row(dbc.Col(html.Img(src=ascii_art_data_uri(ascii_logo), alt="JANUS")))
+SPONSORS_ROW = dbc.Row(dbc.Col(html.Img(src="/assets/sponsors.png",
+                                        style={'height': '71px', 'display': 'inline-block', 'margin-bottom': '0px',
+                                               'margin-top': '0px'})))
+
 layout = dbc.Container([
     # ASCII art and sponsors at the very top
-    dbc.Row(dbc.Col(html.Pre(ascii_logo, style={'font-family': 'monospace', 'color': 'blue'}))),
-    dbc.Row(dbc.Col(html.Img(src="/assets/sponsors.png",
-                             style={'height': '71px', 'display': 'inline-block', 'margin-bottom': '0px',
-                                    'margin-top': '0px'}))),
+    ASCII_LOGO_ROW,
+    SPONSORS_ROW,
     # Add the script for the custom JavaScript
     html.Script(src='/assets/custom.js'),
     
@@ -210,10 +233,7 @@ layout = dbc.Container([
                             dbc.Accordion([
                                 dbc.AccordionItem([
                                     dbc.Checklist(
-                                        options=[
-                                            {"label": name, "value": name} 
-                                            for name in items.keys()
-                                        ],
+                                        options=CATEGORY_CHECKLIST_OPTIONS[category],
                                         id=f"highlight-checklist-{category.lower().replace(' ', '-')}",
                                         className="gap-2",
                                         value=[]  # Initialize with empty selection
@@ -237,17 +257,7 @@ layout = dbc.Container([
                                     dbc.Label("Choose a color:", className="mb-1"),
                                     dbc.RadioItems(
                                         id="highlight-color-picker",
-                                        options=[{
-                                            "label": html.Div(style={
-                                                "backgroundColor": color,
-                                                "width": "20px",
-                                                "height": "20px",
-                                                "border": "1px solid #dee2e6",
-                                                "borderRadius": "4px",
-                                                "display": "inline-block"
-                                            }),
-                                            "value": color
-                                        } for color in color_palette],
+                                        options=COLOR_PICKER_OPTIONS,
                                         value=color_palette[0],
                                         inline=True,
                                         className="mb-2"
@@ -279,7 +289,7 @@ layout = dbc.Container([
                                     max=4,
                                     step=1,
                                     value=1,
-                                    marks={i: str(i) for i in range(1, 5)},
+                                    marks=CORE_SLIDER_MARKS,
                                 ),
                             ], style={'display': 'none'}),
                         ]),
@@ -11,7 +11,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import base64
+import csv
 import gc
 import json
 import logging
@@ -24,6 +24,7 @@ import time
 import uuid
 import zipfile
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
 import pandas as pd
 import requests
@@ -35,7 +36,8 @@ from tqdm import tqdm
 import plotly.graph_objects as go
 import threading
 from utils.dex_parser import DEXParser, extract_apk_dex_files
-from utils.ui_logger import UILogger, ui_logger, register_process, should_cancel as session_should_cancel
+from utils.figure_download import figure_download_href
+from utils.ui_logger import UILogger, ui_logger, register_process, session_scoped, should_cancel as session_should_cancel
 from utils.apk_analysis_core import (
     apply_config_overrides,
     calculate_sampling_frequency,
@@ -59,7 +61,6 @@ progress = {
     'total_tasks': 0,
     'completed_tasks': 0
 }
-import plotly.io as pio
 from dash.exceptions import PreventUpdate
 from utils.db_connection import initialize_pool, execute_query
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -85,17 +86,19 @@ def initialize_database(db_path):
 
 def check_and_print_csv(filename):
     try:
-        data = pd.read_csv(filename, nrows=5)
-        if data.empty:
+        # Only a preview is printed, so read the header and first rows with the stdlib reader
+        with open(filename, newline='') as f:
+            rows = list(islice(csv.reader(f), 6))
+        if len(rows) < 2:
             print("CSV file is empty.")
         else:
             print("First few rows of the CSV file:")
-            print(data)
-    except pd.errors.EmptyDataError:
-        print("CSV file is empty.")
+            for row in rows:
+                print(", ".join(row))
     except Exception as e:
         print(f"Error reading CSV file: {e}")
 
+@session_scoped
 def process_apks(n_clicks, api_key, start_date, end_date, package_list_input, desired_versions, highlight_config, num_cores, parser_selection, session_id=None):
     """
     Process APKs for analysis with session tracking
@@ -191,6 +194,7 @@ def process_apks(n_clicks, api_key, start_date, end_date, package_list_input, de
 
 # TODO: improve basic check of CSV integrity
 
+@session_scoped
 def process_package(package_name, base_directory, apikey, db_path, start_date, end_date, desired_versions, highlight_config, num_cores, parser_selection, session_id=None):
     # Get the session logger
     if session_id:
@@ -369,6 +373,18 @@ def check_apk_in_cache_(sha256, universal_cache_dir):
     apk_path = os.path.join(universal_cache_dir, f"{sha256}.apk")
     return os.path.exists(apk_path)
 
+# Backreferences change meaning once patterns are fused into one alternation
+BACKREFERENCE_PATTERN = re.compile(r'\\\d|\(\?P=')
+
+def build_highlight_prefilter(patterns):
+    """One case-insensitive alternation of all patterns, or None if there's nothing to gain or they can't be fused"""
+    if len(patterns) < 2 or any(BACKREFERENCE_PATTERN.search(pattern) for pattern in patterns):
+        return None
+    try:
+        return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+    except re.error:
+        return None
+
 def plot_data(all_data, package_name, highlight_config, data_type):
     print(f"Preparing data for plotting {data_type}...")
     
@@ -386,8 +402,7 @@ def plot_data(all_data, package_name, highlight_config, data_type):
 
     df = df[['version', 'vtscandate', data_type]].rename(columns={data_type: 'Data'})
     df['Data'] = df['Data'].apply(lambda x: truncate_string(x, MAX_STRING_LENGTH))
-    df['Count'] = 1
-    df = df.groupby(['version', 'vtscandate', 'Data']).sum().reset_index()
+    df = df.groupby(['version', 'vtscandate', 'Data']).size().reset_index(name='Count')
 
     if df.empty:
         print(f"No data to plot for {data_type}.")
@@ -407,49 +422,30 @@ def plot_data(all_data, package_name, highlight_config, data_type):
     df_date_pivot = df_date_pivot[sorted_versions]
 
     # create a new list for x-axis labels combining version and date
-    sorted_versions_with_dates = []
-    for version in sorted_versions:
-        #find the earliest date for this version
-        earliest_date = df[df['version'] == version]['vtscandate'].min()
-        label = f"{version} ({earliest_date})"
-        sorted_versions_with_dates.append(label)
+    #earliest date of every version in one pass
+    earliest_dates = df.groupby('version', sort=False)['vtscandate'].min()
+    sorted_versions_with_dates = [f"{version} ({earliest_dates[version]})" for version in sorted_versions]
 
-    sorted_versions = sorted(df['version'].unique(),
-                             key=lambda x: [int(part) if part.isdigit() else part for part in re.split('([0-9]+)', x)])
-
-    #evolutionary sorting logic
+    #evolutionary sorting logic, read straight off the pivot (columns are in version order)
+    presence = df_count_pivot.gt(0).values
     # 1: count appearances of each domain across all versions
-    data_appearances = {}
-    for version in sorted_versions:
-        for item in df[df['version'] == version]['Data'].unique():
-            data_appearances[item] = data_appearances.get(item, 0) + 1
+    data_appearances = presence.sum(axis=1)
+    # 2: index of the first version each domain appears in
+    first_version = presence.argmax(axis=1)
 
-    # 2: sort domains within each version based on appearances and re-addition
-    version_sorted_data = {}
-    for version in sorted_versions:
-        current_version_data = df[df['version'] == version]['Data'].unique().tolist()
-        # sort domains within the current version based on their total appearances (descending)
-        sorted_data = sorted(current_version_data, key=lambda x: (-data_appearances[x], x))
-        version_sorted_data[version] = sorted_data
-
-    # 3: build the master list of domains, maintaining the staircase effect
-    #initialize a master list of domains across all versions
-    master_data_list = []
-    seen_data = set()
-
-    for version in sorted_versions:
-        #retrieve the sorted list of domains for the current version
-        current_version_sorted_data = version_sorted_data[version]
-        #filter to include only new or re-added domains not already in master_domain_list
-        new_or_readded_data = [item for item in current_version_sorted_data if item not in seen_data]
-        master_data_list.extend(new_or_readded_data)
-        #update the seen_domains set
-        seen_data.update(new_or_readded_data)
-
-    sorted_data = master_data_list
+    # 3: order by first appearance, then by total appearances (descending), keeping the staircase effect
+    # (np.lexsort takes its primary key last)
+    order = np.lexsort((np.asarray(df_count_pivot.index, dtype=str), -data_appearances, first_version))
+    sorted_data = df_count_pivot.index[order].tolist()
 
     # Reverse the highlight_config items
     highlight_config_items = list(highlight_config.items())[::-1]
+    compiled_highlights = [(re.compile(pattern, re.IGNORECASE), color) for pattern, color in highlight_config_items]
+    # A single scan rules out most features before each pattern is tried
+    highlight_prefilter = build_highlight_prefilter([pattern for pattern, _ in highlight_config_items])
+
+    # Presence grid in display order (rows: sorted_data, columns: sorted_versions)
+    presence_matrix = presence[order]
 
     #create the hover text matrix
     hover_text = []
@@ -546,22 +542,22 @@ def plot_data(all_data, package_name, highlight_config, data_type):
         # Add colour highlighting config, workaround for plotly
         shapes = []
         for data_idx, item in enumerate(sorted_data):
-            for version_idx, version in enumerate(sorted_versions):
-                count = df_count_pivot.loc[item, version]
-                if count > 0:
-                    for pattern, color in highlight_config_items:
-                        if re.search(pattern, item, re.IGNORECASE):
-                            shapes.append({
-                                'type': 'rect',
-                                'x0': version_idx - 0.5,
-                                'y0': data_idx - 0.5,
-                                'x1': version_idx + 0.5,
-                                'y1': data_idx + 0.5,
-                                'fillcolor': color,
-                                'opacity': 0.3,
-                                'line': {'width': 0},
-                            })
-                            break  # Stop after first match to avoid overlapping shapes
+            # First matching pattern wins, to avoid overlapping shapes; it depends only on the item
+            if highlight_prefilter is not None and not highlight_prefilter.search(item):
+                continue
+            color = next((color for regex, color in compiled_highlights if regex.search(item)), None)
+            if color is None:
+                continue
+            shapes.extend({
+                'type': 'rect',
+                'x0': version_idx - 0.5,
+                'y0': data_idx - 0.5,
+                'x1': version_idx + 0.5,
+                'y1': data_idx + 0.5,
+                'fillcolor': color,
+                'opacity': 0.3,
+                'line': {'width': 0},
+            } for version_idx in presence_matrix[data_idx].nonzero()[0].tolist())
 
         title_description = data_type.capitalize()
 
@@ -596,22 +592,22 @@ def plot_data(all_data, package_name, highlight_config, data_type):
         # Add colour highlighting config, workaround for plotly
         shapes = []
         for data_idx, item in enumerate(sorted_data):
-            for version_idx, version in enumerate(sorted_versions):
-                count = df_count_pivot.loc[item, version]
-                if count > 0:
-                    for pattern, color in highlight_config_items:
-                        if re.search(pattern, item, re.IGNORECASE):
-                            shapes.append({
-                                'type': 'rect',
-                                'x0': version_idx - 0.5,
-                                'y0': data_idx - 0.5,
-                                'x1': version_idx + 0.5,
-                                'y1': data_idx + 0.5,
-                                'fillcolor': color,
-                                'opacity': 0.3,
-                                'line': {'width': 0},
-                            })
-                            break  # Stop after first match to avoid overlapping shapes
+            # First matching pattern wins, to avoid overlapping shapes; it depends only on the item
+            if highlight_prefilter is not None and not highlight_prefilter.search(item):
+                continue
+            color = next((color for regex, color in compiled_highlights if regex.search(item)), None)
+            if color is None:
+                continue
+            shapes.extend({
+                'type': 'rect',
+                'x0': version_idx - 0.5,
+                'y0': data_idx - 0.5,
+                'x1': version_idx + 0.5,
+                'y1': data_idx + 0.5,
+                'fillcolor': color,
+                'opacity': 0.3,
+                'line': {'width': 0},
+            } for version_idx in presence_matrix[data_idx].nonzero()[0].tolist())
 
         title_description = data_type.capitalize()
 
@@ -635,14 +631,8 @@ def generate_download_link(fig, package_name, data_type):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{package_name}_{data_type}_{timestamp}.html"
     
-    # Convert figure to HTML
-    plot_html = pio.to_html(fig, full_html=False)
-    
-    # Encode HTML content
-    encoded = base64.b64encode(plot_html.encode()).decode()
-    
-    # Create download link
-    href = f"data:text/html;base64,{encoded}"
+    # Create download link, reusing the encoded HTML if this figure was seen before
+    href = figure_download_href(fig)
     
     return html.Div([
         html.A(
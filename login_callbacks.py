@@ -17,29 +17,60 @@ import flask
 from flask_login import login_user, logout_user
 import os
 import json
+import hashlib
+import hmac
+from functools import lru_cache
 
+# Default login details
+default_credentials = {
+"admin": "humanities_informatics_2025",
+"elisa": "janus_25_androzoo",
+"ashwin": "janus_25_androzoo", 
+"researcher": "janus_andro_analysis25",
+"analyst": "janus_andro_analysis25"
+}
 
+credentials_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'credentials.json')
+
+def _hash_password(password):
+    return hashlib.sha256(password.encode('utf-8')).hexdigest()
+
+def _hash_credentials(credentials):
+    # Skip entries without a usable password, so an empty one can never match
+    return {username: _hash_password(password) for username, password in credentials.items()
+            if isinstance(password, str) and password}
+
+_default_credential_hashes = _hash_credentials(default_credentials)
+
+@lru_cache(maxsize=1)
+def _load_credential_hashes(mtime):
+    """Load and hash credentials.json, cached until the file's mtime changes"""
+    try:
+        with open(credentials_file, 'r') as f:
+            credentials = json.load(f)
+        if not isinstance(credentials, dict):
+            raise ValueError("credentials.json must map usernames to passwords")
+        return _hash_credentials(credentials)
+    except (OSError, ValueError):
+        return _default_credential_hashes
 
 # TODO: Basic login for demo - replace with proper auth later
 def get_credentials():
-    # Default login details
-    default_credentials = {
-    "admin": "humanities_informatics_2025",
-    "elisa": "janus_25_androzoo",
-    "ashwin": "janus_25_androzoo", 
-    "researcher": "janus_andro_analysis25",
-    "analyst": "janus_andro_analysis25"
-    }
-    
-    # Check for credentials file
-    credentials_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'credentials.json')
-    if os.path.exists(credentials_file):
-        try:
-            with open(credentials_file, 'r') as f:
-                return json.load(f)
-        except:
-            return default_credentials
-    return default_credentials
+    """Return a dict of username -> sha256 password hash"""
+    try:
+        mtime = os.path.getmtime(credentials_file)
+    except OSError:
+        return _default_credential_hashes
+    return _load_credential_hashes(mtime)
+
+def check_credentials(username, password):
+    """Constant-time check of a username/password pair"""
+    if not username or not password:
+        return False
+    expected = get_credentials().get(username)
+    if expected is None:
+        return False
+    return hmac.compare_digest(expected, _hash_password(password))
 
 def register_callbacks(app, User):
     @app.callback(
@@ -53,9 +84,7 @@ def register_callbacks(app, User):
         if n_clicks is None:
             raise PreventUpdate
             
-        credentials = get_credentials()
-        
-        if username in credentials and credentials[username] == password:
+        if check_credentials(username, password):
             user = User(username)
             login_user(user)
             return "/historical-connectivity", ""
@@ -0,0 +1,44 @@
+# Copyright 2025 Elisa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Renders the ASCII-art banner as an SVG image once at import, so pages show a cached
+image instead of laying out a large <pre> block.
+"""
+import base64
+from xml.sax.saxutils import escape
+
+# Monospace glyph advance and line height, in ems
+CHAR_WIDTH_EM = 0.6
+LINE_HEIGHT_EM = 1.2
+FONT_SIZE_PX = 14
+
+def ascii_art_svg(text, color="blue"):
+    """SVG document drawing each line of text in a monospace font"""
+    lines = text.strip("\n").split("\n")
+    width = max(len(line) for line in lines) * CHAR_WIDTH_EM * FONT_SIZE_PX
+    height = len(lines) * LINE_HEIGHT_EM * FONT_SIZE_PX
+    tspans = "".join(
+        f'<tspan x="0" dy="{LINE_HEIGHT_EM}em">{escape(line)}</tspan>' for line in lines
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+        f'viewBox="0 0 {width:.0f} {height:.0f}">'
+        f'<text y="-0.25em" font-family="monospace" font-size="{FONT_SIZE_PX}" fill="{color}" '
+        f'xml:space="preserve">{tspans}</text></svg>'
+    )
+
+def ascii_art_data_uri(text, color="blue"):
+    """ascii_art_svg as a base64 data: URI for html.Img"""
+    svg = ascii_art_svg(text, color).encode("utf-8")
+    return "data:image/svg+xml;base64," + base64.b64encode(svg).decode("ascii")
@@ -14,8 +14,11 @@
 import shutil
 from datetime import datetime
 import csv
+import hashlib
+import json
 import requests
-from collections import defaultdict
+from collections import Counter
+from operator import itemgetter
 from androguard.misc import AnalyzeAPK
 import pandas as pd
 from androguard.core.bytecodes import apk, dvm
@@ -33,14 +36,26 @@ from flask import session
 import time
 import glob
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import os
 import urllib.request
 import gzip
 from tqdm import tqdm
 
+try:
+    from joblib import Parallel, delayed
+    HAS_JOBLIB = True
+except ImportError:
+    HAS_JOBLIB = False
+
 
 filename = "latest_with-added-date.csv"
 
+PLOT_CACHE_DIR = "cache"
+PLOT_CACHE_MAX_AGE = 24 * 60 * 60  # in seconds
+
+URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+\{\}]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+
 def download_file_with_progress(url, output_path):
     class DownloadProgressBar(tqdm):
         def update_to(self, b=1, bsize=1, tsize=None):
@@ -72,7 +87,7 @@ if not os.path.isfile(filename) or check_file_corruption(filename):
         print("Extracting file...")
         with gzip.open(filename + ".gz", "rb") as f_in:
             with open(filename, "wb") as f_out:
-                f_out.write(f_in.read())
+                shutil.copyfileobj(f_in, f_out, length=1024 * 1024)
         print("File extracted.")
 
         # Clean up the gzip file
@@ -103,11 +118,11 @@ def find_sha256_vercode_vtscandate(package_name, csv_path, start_date, end_date)
             if row[5] == package_name:
                 vt_scan_date = datetime.strptime(row[10], '%Y-%m-%d %H:%M:%S.%f')
                 if start_date <= vt_scan_date <= end_date:
-                    sha256_vercode_vtscandate_values.append((row[0], row[6], row[10]))
+                    sha256_vercode_vtscandate_values.append((row[0], row[6], row[10], vt_scan_date))
 
-    # Sort by vt_scan_date in ascending order
-    sha256_vercode_vtscandate_values.sort(key=lambda x: datetime.strptime(x[2], '%Y-%m-%d %H:%M:%S.%f'))
-    return sha256_vercode_vtscandate_values
+    # Sort by vt_scan_date in ascending order, reusing the date parsed above
+    sha256_vercode_vtscandate_values.sort(key=itemgetter(3))
+    return [(sha256, vercode, vtscandate) for sha256, vercode, vtscandate, _ in sha256_vercode_vtscandate_values]
 
 # Function to calculate sampling frequency
 def calculate_sampling_frequency(total_versions, desired_versions):
@@ -188,27 +203,28 @@ def extract_elements(file_path):
     print(f"Extracting domains, subdomains, and URLs from file: {file_path}...")
     try:
         a = apk.APK(file_path)
-        domains = []
-        subdomains = []
-        urls = []
+        url_counts = Counter()
         for dex in a.get_all_dex():
             dv = dvm.DalvikVMFormat(dex)
             for string in dv.get_strings():
-                found_urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+\{\}]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', string)
-                for url in found_urls:
-                    urls.append(url)  # Collect each URL
-                    parsed_url = tldextract.extract(url)
-                    domain = '.'.join([part for part in [parsed_url.domain, parsed_url.suffix] if part])
-                    subdomain = '.'.join([part for part in parsed_url if part])
-                    domains.append(domain)
-                    subdomains.append(subdomain)
-        print(domains)
-        print(subdomain)
-        print(urls)
-        return domains, subdomains, urls
+                url_counts.update(URL_PATTERN.findall(string))
+
+        # Only run tldextract once per unique URL, carrying the counts over
+        domain_counts = Counter()
+        subdomain_counts = Counter()
+        for url, count in url_counts.items():
+            parsed_url = tldextract.extract(url)
+            domain = '.'.join([part for part in [parsed_url.domain, parsed_url.suffix] if part])
+            subdomain = '.'.join([part for part in parsed_url if part])
+            domain_counts[domain] += count
+            subdomain_counts[subdomain] += count
+        print(list(domain_counts))
+        print(list(subdomain_counts))
+        print(list(url_counts))
+        return domain_counts, subdomain_counts, url_counts
     except Exception as e:
         print(f'Error while extracting domains, subdomains, and URLs from {file_path}: {str(e)}')
-        return [], [], []
+        return Counter(), Counter(), Counter()
 
 # Function to check valid entry (for beginner Janus)
 def valid_entry(entry):
@@ -224,27 +240,33 @@ def analyze_elements(folder_path):
     print(f"Analyzing folder for APK files and extracting domains, subdomains, and URLs...")
     cores = 2
     #pool = mp.Pool(max(1, mp.cpu_count() - 1))  # Use one less than the total number of cores
-    pool = mp.Pool(cores)
 
     file_names = os.listdir(folder_path)
-    results = pool.starmap(process_file, [(file_name, folder_path) for file_name in file_names])
+    if HAS_JOBLIB:
+        # loky keeps its workers alive between runs and batches adaptively for uneven APK sizes
+        results = Parallel(n_jobs=cores, backend='loky', prefer='processes', batch_size='auto')(
+            delayed(process_file)(file_name, folder_path) for file_name in file_names)
+    else:
+        with mp.Pool(cores) as pool:
+            results = pool.starmap(process_file, [(file_name, folder_path) for file_name in file_names], chunksize=1)
 
-    version_vtscandate_domains_counts = []
-    version_vtscandate_subdomains_counts = []
-    version_vtscandate_url_counts = []
+    element_columns = {element_type: {'Version': [], 'vt_scan_date': [], 'Element': [], 'Count': []}
+                       for element_type in ('domains', 'subdomains', 'urls')}
 
     for result in results:
         if result is not None:
-            version = result["version"]
+            version = str(result["version"])
             vt_scan_date = result["vt_scan_date"]
-            for domain, count in result["domains"]:
-                version_vtscandate_domains_counts.append((version, vt_scan_date, domain, count))
-            for subdomain, count in result["subdomains"]:
-                version_vtscandate_subdomains_counts.append((version, vt_scan_date, subdomain, count))
-            for url, count in result["urls"]:
-                version_vtscandate_url_counts.append((version, vt_scan_date, url, count))
+            for element_type, columns in element_columns.items():
+                for element, count in result[element_type]:
+                    columns['Version'].append(version)
+                    columns['vt_scan_date'].append(vt_scan_date)
+                    columns['Element'].append(element)
+                    columns['Count'].append(count)
 
-    return version_vtscandate_domains_counts, version_vtscandate_subdomains_counts, version_vtscandate_url_counts
+    return (pd.DataFrame(element_columns['domains']),
+            pd.DataFrame(element_columns['subdomains']),
+            pd.DataFrame(element_columns['urls']))
 
 # Function to process APK file
 def process_file(file_name, folder_path):
@@ -254,16 +276,7 @@ def process_file(file_name, folder_path):
         a, _, _ = AnalyzeAPK(file_path)
         version = a.get_androidversion_code()
         vt_scan_date = file_name.split('_')[2].split('.')[0]
-        domains, subdomains, urls = extract_elements(file_path)
-        domain_counts = defaultdict(int)
-        subdomain_counts = defaultdict(int)
-        url_counts = defaultdict(int)
-        for domain in domains:
-            domain_counts[domain] += 1
-        for subdomain in subdomains:
-            subdomain_counts[subdomain] += 1
-        for url in urls:
-            url_counts[url] += 1
+        domain_counts, subdomain_counts, url_counts = extract_elements(file_path)
         return {
             "version": version,
             "vt_scan_date": vt_scan_date,
@@ -275,17 +288,14 @@ def process_file(file_name, folder_path):
         return None
 
 
-def plot_data(version_vtscandate_elements_counts, element_type, binary=False):
+def plot_data(elements_df, element_type, binary=False):
     print("Preparing data for plotting...")
-    data = [{'Version': str(version), 'vt_scan_date': vt_scan_date, element_type.capitalize(): element, 'Count': count}
-            for version, vt_scan_date, element, count in version_vtscandate_elements_counts]
-    df = pd.DataFrame(data)
-    if df.empty:
+    if elements_df.empty:
         print("No data to plot.")
         return None
 
     print("Plotting data...")
-    df['Version'] = df['Version'].astype(str)
+    df = elements_df.rename(columns={'Element': element_type.capitalize()})
     df['vt_scan_date'] = pd.to_datetime(df['vt_scan_date'], errors='coerce').dt.strftime('%Y-%m-%d')
     #df['vt_scan_date'] = pd.to_datetime(df['vt_scan_date']).dt.strftime('%Y-%m-%d')
 
@@ -308,19 +318,16 @@ def plot_data(version_vtscandate_elements_counts, element_type, binary=False):
     sorted_versions = sorted(df['Version'].unique(),
                              key=lambda x: [int(part) if part.isdigit() else part for part in re.split('([0-9]+)', x)])
 
-    element_appearances = {element: df[df[element_type.capitalize()] == element]['Version'].nunique() for element in
-                           df[element_type.capitalize()].unique()}
-
-    version_sorted_elements = {version: sorted(df[df['Version'] == version][element_type.capitalize()].unique(),
-                                               key=lambda x: (-element_appearances.get(x, 0), x)) for version in
-                               sorted_versions}
-
-    master_element_list = []
-    seen_elements = set()
-    for version in sorted_versions:
-        new_elements = [elem for elem in version_sorted_elements[version] if elem not in seen_elements]
-        master_element_list.extend(new_elements)
-        seen_elements.update(new_elements)
+    # order elements by first appearance, then by number of versions they appear in
+    version_rank = {version: rank for rank, version in enumerate(sorted_versions)}
+    element_groups = df.assign(rank=df['Version'].map(version_rank)).groupby(element_type.capitalize())
+    element_order = pd.DataFrame({
+        'first': element_groups['rank'].min(),
+        'appearances': element_groups['Version'].nunique(),
+    })
+    element_order['name'] = element_order.index
+    master_element_list = element_order.sort_values(['first', 'appearances', 'name'],
+                                                    ascending=[True, False, True]).index.tolist()
 
     df_count_pivot = df_count_pivot.reindex(master_element_list)
     df_date_pivot = df_date_pivot.reindex(master_element_list)
@@ -360,7 +367,7 @@ def plot_data(version_vtscandate_elements_counts, element_type, binary=False):
         yaxis=dict(autorange="reversed")
     )
 
-    plot_html = fig.to_html(full_html=False)
+    plot_html = fig.to_html(full_html=False, include_plotlyjs='cdn')
     return plot_html
 
 
@@ -387,17 +394,14 @@ def count_apps(package_name, csv_path, start_date, end_date):
 
 
 # Function to plot grouped bar data
-def plot_data_grouped_bar(version_vtscandate_elements_counts, element_type):
+def plot_data_grouped_bar(elements_df, element_type):
     print("Preparing data for plotting...")
-    data = [{'Version': str(version), 'vt_scan_date': vt_scan_date, element_type.capitalize(): element, 'Count': count}
-            for version, vt_scan_date, element, count in version_vtscandate_elements_counts]
-    df = pd.DataFrame(data)
-    if df.empty:
+    if elements_df.empty:
         print("No data to plot.")
         return None
 
     print("Plotting data...")
-    df['Version'] = df['Version'].astype(str)
+    df = elements_df.rename(columns={'Element': element_type.capitalize()})
     df_count_pivot = df.pivot_table(index=element_type.capitalize(), columns='Version', values='Count', aggfunc='sum',
                                     fill_value=0)
     df_date_pivot = df.pivot_table(index=element_type.capitalize(), columns='Version', values='vt_scan_date',
@@ -418,10 +422,38 @@ def plot_data_grouped_bar(version_vtscandate_elements_counts, element_type):
     fig = go.Figure(data=bars)
     fig.update_layout(barmode='group', title=title, xaxis_title=element_type, yaxis_title="Count")
 
-    plot_html = pio.to_html(fig, full_html=False)
+    plot_html = pio.to_html(fig, full_html=False, include_plotlyjs='cdn')
     return plot_html
 
 
+def has_zip_eocd(apk_path):
+    """Check for the zip End-of-Central-Directory record in the file's tail"""
+    try:
+        with open(apk_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 65536))
+            return f.read().rfind(b'PK\x05\x06') != -1
+    except OSError:
+        return False
+
+
+def check_package_dir(package_dir):
+    """Return True if package_dir holds at least one APK and none are corrupted"""
+    print(f"Checking directory: {package_dir}")
+    valid_apks_found = False  # asume no valid APKs initially
+
+    with os.scandir(package_dir) as entries:
+        apk_paths = [entry.path for entry in entries if entry.name.endswith('.apk')]
+
+    for apk_path in apk_paths:
+        if not has_zip_eocd(apk_path):
+            print(f"Corrupted APK detected: {apk_path}")
+            return False  # found a corrupted APK, no need to check further
+        valid_apks_found = True  # valid APK found
+
+    return valid_apks_found
+
+
 def validate_and_clean_apks(package_list, base_dir, trash_dir):
     for package_name in package_list:
         # find directories that start with the package name
@@ -431,25 +463,13 @@ def validate_and_clean_apks(package_list, base_dir, trash_dir):
             print(f"No directory found for package: {package_name}")
             continue
 
-        for package_dir in package_dirs:
-            print(f"Checking directory: {package_dir}")
-            valid_apks_found = False  # asume no valid APKs initially
-            corrupted_apks_found = False
-
-            for apk_file in os.listdir(package_dir):
-                apk_path = os.path.join(package_dir, apk_file)
-                if apk_path.endswith('.apk'):
-                    try:
-                        with zipfile.ZipFile(apk_path, 'r') as zip_ref:
-                            zip_ref.namelist()
-                            valid_apks_found = True  # valid APK found
-                    except zipfile.BadZipFile:
-                        print(f"Corrupted APK detected: {apk_path}")
-                        corrupted_apks_found = True
-                        break  # found a corrupted APK, no need to check further
+        # checks are disk-bound, so threads overlap well
+        with ThreadPoolExecutor(max_workers=min(8, len(package_dirs))) as executor:
+            dir_checks = list(zip(package_dirs, executor.map(check_package_dir, package_dirs)))
 
+        for package_dir, is_valid in dir_checks:
             # if no valid APKs found or a corrupted APK is detected, move directory to trash
-            if not valid_apks_found or corrupted_apks_found:
+            if not is_valid:
                 # prepare trash directory path
                 trash_package_path = os.path.join(trash_dir, Path(package_dir).name)
                 final_trash_path = trash_package_path
@@ -479,6 +499,13 @@ def run(apikey, packages, start_date, end_date):
         session_id = str(uuid.uuid4())
         session['id'] = session_id
 
+        # Identical requests reuse the zip from a previous run
+        cache_key = hashlib.sha256(json.dumps([sorted(packages), start_date, end_date]).encode()).hexdigest()
+        cached_zip_path = os.path.join(PLOT_CACHE_DIR, f"plots_{cache_key}.zip")
+        if os.path.exists(cached_zip_path) and time.time() - os.path.getmtime(cached_zip_path) < PLOT_CACHE_MAX_AGE:
+            print(f"Using cached plots: {cached_zip_path}")
+            return cached_zip_path
+
         csv_path = "latest_with-added-date.csv"
         folder_path = f"folder_{session_id}"
 
@@ -493,6 +520,10 @@ def run(apikey, packages, start_date, end_date):
         plot_html_domains_heatmap = plot_data(version_vtscandate_domains, 'domain')
         plot_html_urls_heatmap = plot_data(version_vtscandate_urls, 'url')
 
+        # Only cache results that actually contain data, not e.g. a run whose downloads failed
+        has_data = any(plot_html is not None for plot_html in
+                       (plot_html_subdomains_heatmap, plot_html_domains_heatmap, plot_html_urls_heatmap))
+
         if plot_html_subdomains_heatmap is None:
             plot_html_subdomains_heatmap = "<p>No data to plot for subdomains</p>"
         if plot_html_domains_heatmap is None:
@@ -503,30 +534,25 @@ def run(apikey, packages, start_date, end_date):
         plot_html_domains_gb = plot_data_grouped_bar(version_vtscandate_domains, 'domain')
         plot_html_subdomains_gb = plot_data_grouped_bar(version_vtscandate_subdomains, 'subdomain')
 
-        with open(f"plot_subdomains_heatmap_{session_id}.html", "w", encoding='utf-8') as file:
-            file.write(plot_html_subdomains_heatmap)
-
-        with open(f"plot_urls_heatmap_{session_id}.html", "w", encoding='utf-8') as file:
-            file.write(plot_html_urls_heatmap)
-
-        with open(f"plot_domains_heatmap_{session_id}.html", "w", encoding='utf-8') as file:
-            file.write(plot_html_domains_heatmap)
-
-        with open(f"plot_domains_grouped_bar_{session_id}.html", "w", encoding='utf-8') as file:
-            file.write(plot_html_domains_gb)
-
-        with open(f"plot_subdomains_grouped_bar_{session_id}.html", "w", encoding='utf-8') as file:
-            file.write(plot_html_subdomains_gb)
+        plot_files = {
+            f"plot_subdomains_heatmap_{session_id}.html": plot_html_subdomains_heatmap,
+            f"plot_urls_heatmap_{session_id}.html": plot_html_urls_heatmap,
+            f"plot_domains_heatmap_{session_id}.html": plot_html_domains_heatmap,
+            f"plot_domains_grouped_bar_{session_id}.html": plot_html_domains_gb,
+            f"plot_subdomains_grouped_bar_{session_id}.html": plot_html_subdomains_gb,
+        }
 
         zip_file_path = f"plots_{session_id}.zip"
 
-        with zipfile.ZipFile(zip_file_path, 'w') as zipf:
-            zipf.write(f"plot_subdomains_heatmap_{session_id}.html")
-            zipf.write(f"plot_urls_heatmap_{session_id}.html")
-            zipf.write(f"plot_domains_heatmap_{session_id}.html")
-            zipf.write(f"plot_domains_grouped_bar_{session_id}.html")
-            zipf.write(f"plot_subdomains_grouped_bar_{session_id}.html")
+        # Write the plots straight into the archive, no intermediate files on disk. Stored
+        # uncompressed, as plotly HTML with inline JS compresses poorly
+        with zipfile.ZipFile(zip_file_path, 'w', compression=zipfile.ZIP_STORED) as zipf:
+            for plot_file, plot_html in plot_files.items():
+                zipf.writestr(plot_file, plot_html)
 
+        if has_data:
+            os.makedirs(PLOT_CACHE_DIR, exist_ok=True)
+            shutil.copy(zip_file_path, cached_zip_path)
 
         return zip_file_path
     except Exception as e:
@@ -15,132 +15,216 @@
 from dash import dcc, html, callback_context
 import dash
 from dash.dependencies import Input, Output, State, ALL, MATCH
-from app import app
+from app import app, background_callback_manager
+import gzip
+import hashlib
+import importlib.util
 import json
 import re
 import os
-import plotly.graph_objects as go
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from dash.exceptions import PreventUpdate
 import logging
-from layouts.precomputed_connectivity_layout import preset_configs
-import base64
+from layouts.precomputed_connectivity_layout import preset_configs, PRESET_REGEXES, preset_prefilter
+from utils.figure_download import figure_download_href
 from datetime import datetime
-import plotly.io as pio
+from functools import lru_cache
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+# pandas is only needed for the Parquet export; import it on first use
+HAS_PANDAS = importlib.util.find_spec('pandas') is not None
+
 # Constants
 PRECOMPUTED_DATA_DIR = 'precomputed_data'
+# Package list locations for the dropdown
+PRECOMPUTED_METADATA_PATH = '/var/www/janus/precomputed_data/metadata.json'
+FALLBACK_PACKAGE_LIST_PATH = '/var/www/janus/filtered_package_ids_with_counts10_ver.json'
+# Features classified against the highlight patterns per chunk
+CLASSIFY_CHUNK_SIZE = 1000
+# Maximum number of packages sent to the dropdown per search
+MAX_DROPDOWN_OPTIONS = 50
+# Per-type tables in the columnar (Parquet) package export
+PARQUET_DATA_TYPES = ('urls', 'domains', 'subdomains')
+# Android package names: dot-separated Java identifiers
+PACKAGE_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)+$')
 
 # Domain metadata cache
 _domain_metadata = None
+_compiled_domain_patterns = None
 def get_domain_metadata():
     """Load domain metadata from JSON file"""
-    global _domain_metadata
+    global _domain_metadata, _compiled_domain_patterns
     if _domain_metadata is None:
+        metadata_path = os.path.join('utils', 'domain_metadata.json')
         try:
-            metadata_path = os.path.join('utils', 'domain_metadata.json')
-            if os.path.exists(metadata_path):
-                with open(metadata_path, 'r') as f:
-                    _domain_metadata = json.load(f)
-                    logger.info(f"Loaded domain metadata with {len(_domain_metadata['patterns'])} patterns")
-            else:
-                logger.warning(f"Domain metadata file not found: {metadata_path}")
-                _domain_metadata = {"patterns": []}
+            with open(metadata_path, 'rb') as f:
+                _domain_metadata = json.load(f)
+                logger.info(f"Loaded domain metadata with {len(_domain_metadata['patterns'])} patterns")
+        except FileNotFoundError:
+            logger.warning(f"Domain metadata file not found: {metadata_path}")
+            _domain_metadata = {"patterns": []}
         except Exception as e:
             logger.error(f"Error loading domain metadata: {e}")
             _domain_metadata = {"patterns": []}
+        _compiled_domain_patterns = compile_domain_patterns(_domain_metadata["patterns"])
     return _domain_metadata
 
+def compile_domain_patterns(patterns):
+    """Compile metadata patterns once, skipping any that are invalid"""
+    compiled = []
+    for pattern_data in patterns:
+        try:
+            compiled.append((re.compile(pattern_data["pattern"], re.IGNORECASE), pattern_data))
+        except re.error as e:
+            logger.error(f"Invalid domain metadata pattern {pattern_data.get('pattern')}: {e}")
+    return compiled
+
+@lru_cache(maxsize=8192)
 def match_domain_metadata(domain):
     """Match domain against metadata patterns"""
-    metadata = get_domain_metadata()
-    for pattern_data in metadata["patterns"]:
-        if re.search(pattern_data["pattern"], domain, re.IGNORECASE):
+    get_domain_metadata()
+    for compiled_pattern, pattern_data in _compiled_domain_patterns:
+        if compiled_pattern.search(domain):
             return pattern_data
     return None
 
+# Preset regex strings mapped to their precompiled patterns
+PRESET_PATTERNS = {regex.pattern: regex for regex in PRESET_REGEXES}
+
+@lru_cache(maxsize=256)
+def compile_highlight_pattern(pattern):
+    """Compiled case-insensitive highlight pattern, presets first (raises re.error if invalid)"""
+    return PRESET_PATTERNS.get(pattern) or re.compile(pattern, re.IGNORECASE)
+
+HEX_COLOR_PATTERN = re.compile(r'^#(?:[0-9a-fA-F]{3}){1,2}$')
+VALID_COLOR_NAMES = frozenset(['red', 'blue', 'green', 'yellow', 'purple', 'orange', 'black', 'white'])
+
 def is_valid_color(color):
-    # Check for valid hex colour
-    if re.match(r'^#(?:[0-9a-fA-F]{3}){1,2}$', color):
-        return True
-    # Check for valid colour name
-    valid_color_names = ['red', 'blue', 'green', 'yellow', 'purple', 'orange', 'black', 'white']
-    return color.lower() in valid_color_names
+    # Check for valid hex colour or colour name
+    return bool(HEX_COLOR_PATTERN.match(color)) or color.lower() in VALID_COLOR_NAMES
 
 def get_precomputed_packages():
     """Get packages that have been pre-computed"""
     try:
         metadata_path = os.path.join(PRECOMPUTED_DATA_DIR, 'metadata.json')
-        if os.path.exists(metadata_path):
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
-                packages = metadata['processed_packages']
-                # Sort alphabetically
-                return sorted(packages)
+        with open(metadata_path, 'rb') as f:
+            metadata = json.load(f)
+            packages = metadata['processed_packages']
+            # Sort alphabetically
+            return sorted(packages)
+    except FileNotFoundError:
         return []
     except Exception as e:
         logger.error(f"Error loading precomputed packages: {e}")
         return []
+def _file_mtime_ns(path):
+    """Return a file's mtime in ns, or None if it doesn't exist"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+@lru_cache(maxsize=1)
+def _load_dropdown_options(mtime_key):
+    """Build the sorted dropdown options as a tuple, cached until either package list file changes"""
+    metadata_path = PRECOMPUTED_METADATA_PATH
+    
+    try:
+        with open(metadata_path, 'rb') as f:
+            logger.info(f"Found metadata at: {metadata_path}")
+            metadata = json.load(f)
+            packages = metadata.get('processed_packages', [])
+            
+            if packages:
+                logger.info(f"Loaded {len(packages)} packages from precomputed metadata")
+                return tuple({'label': pkg, 'value': pkg} for pkg in sorted(packages))
+            else:
+                logger.warning("No processed_packages in metadata.json")
+    except FileNotFoundError:
+        logger.warning(f"Metadata file not found at: {metadata_path}")
+    
+    # FALLBACK: Load from filtered_package_ids JSON
+    json_path = FALLBACK_PACKAGE_LIST_PATH
+    
+    try:
+        with open(json_path, 'rb') as f:
+            logger.info(f"Loading from fallback: {json_path}")
+            # Stream just the names from a list of package dicts when ijson is available
+            packages = list(ijson.items(f, 'item.name')) if HAS_IJSON else []
+            if packages:
+                logger.info(f"Loaded {len(packages)} packages from filtered JSON")
+                return tuple({'label': pkg, 'value': pkg} for pkg in sorted(packages))
+            f.seek(0)
+            data = json.load(f)
+            
+            if isinstance(data, list) and data and isinstance(data[0], dict) and 'name' in data[0]:
+                packages = [pkg['name'] for pkg in data]
+            elif isinstance(data, list):
+                packages = data
+            elif isinstance(data, dict):
+                packages = list(data.keys())
+            else:
+                packages = []
+            
+            logger.info(f"Loaded {len(packages)} packages from filtered JSON")
+            return tuple({'label': pkg, 'value': pkg} for pkg in sorted(packages))
+    except FileNotFoundError:
+        pass
+    
+    logger.error("No package data found in either location")
+    return ()
+
 @app.callback(
     Output('precomputed-package-dropdown', 'options'),
-    Input('url', 'pathname')
+    [Input('url', 'pathname'),
+     Input('precomputed-package-dropdown', 'search_value')],
+    State('precomputed-package-dropdown', 'value')
 )
-def populate_precomputed_package_dropdown(pathname):
-    """Populate the dropdown with available packages"""
+def populate_precomputed_package_dropdown(pathname, search_value, selected_package):
+    """Populate the dropdown with the packages matching the current search"""
     if pathname != '/precomputed-connectivity':
         return []
     
     try:
-        # Use absolute path for metadata
-        metadata_path = '/var/www/janus/precomputed_data/metadata.json'
+        mtime_key = (_file_mtime_ns(PRECOMPUTED_METADATA_PATH), _file_mtime_ns(FALLBACK_PACKAGE_LIST_PATH))
+        options = _load_dropdown_options(mtime_key)
         
-        if os.path.exists(metadata_path):
-            logger.info(f"Found metadata at: {metadata_path}")
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
-                packages = metadata.get('processed_packages', [])
-                
-                if packages:
-                    logger.info(f"Loaded {len(packages)} packages from precomputed metadata")
-                    return [{'label': pkg, 'value': pkg} for pkg in sorted(packages)]
-                else:
-                    logger.warning("No processed_packages in metadata.json")
+        # Filter in Python and only send the top matches to the browser
+        search = (search_value or '').lower()
+        if search:
+            prefix_matches = [opt for opt in options if opt['value'].lower().startswith(search)]
+            if len(prefix_matches) < MAX_DROPDOWN_OPTIONS:
+                prefix_matches += [opt for opt in options
+                                   if search in opt['value'].lower() and not opt['value'].lower().startswith(search)]
+            matches = prefix_matches[:MAX_DROPDOWN_OPTIONS]
         else:
-            logger.warning(f"Metadata file not found at: {metadata_path}")
-        
-        # FALLBACK: Load from filtered_package_ids JSON
-        json_path = '/var/www/janus/filtered_package_ids_with_counts10_ver.json'
-        
-        if os.path.exists(json_path):
-            logger.info(f"Loading from fallback: {json_path}")
-            with open(json_path, 'r') as f:
-                data = json.load(f)
-                
-                if isinstance(data, list) and data and isinstance(data[0], dict) and 'name' in data[0]:
-                    packages = [pkg['name'] for pkg in data]
-                elif isinstance(data, list):
-                    packages = data
-                elif isinstance(data, dict):
-                    packages = list(data.keys())
-                else:
-                    packages = []
-                
-                logger.info(f"Loaded {len(packages)} packages from filtered JSON")
-                return [{'label': pkg, 'value': pkg} for pkg in sorted(packages)]
-        
-        logger.error("No package data found in either location")
-        return []
+            matches = list(options[:MAX_DROPDOWN_OPTIONS])
         
+        # Keep the selected package listed so its label stays visible
+        if selected_package and all(opt['value'] != selected_package for opt in matches):
+            matches = [{'label': selected_package, 'value': selected_package}] + matches
+        return matches
     except Exception as e:
         logger.error(f"Error loading package dropdown options: {e}", exc_info=True)
         return []
-        
-    except Exception as e:
-        logger.error(f"Error loading package dropdown options: {e}")
-        return []
 
 @app.callback(
     Output("precomputed-stats-display", "children"),
@@ -156,20 +240,19 @@ def update_precomputed_stats(pathname):
         # Try to count from filtered_package_ids_with_counts10_ver.json
         try:
             json_path = 'filtered_package_ids_with_counts10_ver.json'
-            if os.path.exists(json_path):
-                with open(json_path, 'r') as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        count = len(data)
-                    elif isinstance(data, dict):
-                        count = len(data.keys())
-                    else:
-                        count = 0
-                    
-                    return html.Div([
-                        html.P(f"Total Packages Available: {count}"),
-                        html.P("10 versions per package", className="text-muted small")
-                    ])
+            with open(json_path, 'rb') as f:
+                data = json.load(f)
+                if isinstance(data, list):
+                    count = len(data)
+                elif isinstance(data, dict):
+                    count = len(data.keys())
+                else:
+                    count = 0
+                
+                return html.Div([
+                    html.P(f"Total Packages Available: {count}"),
+                    html.P("10 versions per package", className="text-muted small")
+                ])
         except:
             pass
         
@@ -185,25 +268,90 @@ def get_precomputed_stats():
     """Get stats about precomputed data"""
     try:
         metadata_path = os.path.join(PRECOMPUTED_DATA_DIR, 'metadata.json')
-        if os.path.exists(metadata_path):
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
-                return metadata.get('stats', {})
+        with open(metadata_path, 'rb') as f:
+            metadata = json.load(f)
+            return metadata.get('stats', {})
+    except FileNotFoundError:
         return {}
     except Exception as e:
         logger.error(f"Error loading precomputed stats: {e}")
         return {}
 
+@lru_cache(maxsize=32)
+def _load_package_data_cached(data_path, mtime):
+    """Parse a package's data.json(.gz), cached until the file's mtime changes"""
+    opener = gzip.open if data_path.endswith('.gz') else open
+    with opener(data_path, 'rb') as f:
+        if HAS_ORJSON:
+            return orjson.loads(f.read())
+        return json.load(f)
+
+@lru_cache(maxsize=32)
+def _load_package_parquet_cached(package_dir, mtime, package_name):
+    """Rebuild package data from the columnar apks/<data_type>.parquet tables"""
+    import pandas as pd
+    
+    apks_df = pd.read_parquet(os.path.join(package_dir, 'apks.parquet'), columns=['vercode', 'vtscandate'])
+    apks = [
+        {'vercode': vercode, 'vtscandate': vtscandate, 'features': {}}
+        for vercode, vtscandate in zip(apks_df['vercode'].tolist(), apks_df['vtscandate'].tolist())
+    ]
+    # Package metadata, as in the JSON export, is kept in the apks table's attrs when present
+    metadata = dict(apks_df.attrs.get('metadata', {}))
+    metadata.setdefault('package_name', package_name)
+    package_data = {'metadata': metadata, 'apks': apks, 'features': {}}
+    
+    for data_type in PARQUET_DATA_TYPES:
+        df = pd.read_parquet(os.path.join(package_dir, f'{data_type}.parquet'), columns=['feature', 'vercode', 'count'])
+        package_data['features'][data_type] = df['feature'].unique().tolist()
+        # Keep (feature, vercode, count) rows as per-APK Counters rather than expanding them to lists
+        per_version = {}
+        for feature, vercode, count in zip(df['feature'].tolist(), df['vercode'].tolist(), df['count'].tolist()):
+            per_version.setdefault(vercode, Counter())[feature] += count
+        for apk in apks:
+            apk['features'][data_type] = per_version.get(apk['vercode'], Counter())
+    
+    return package_data
+
+def _load_package_parquet(package_name):
+    """Load a package from its Parquet export, or None if there isn't one"""
+    package_dir = os.path.join(PRECOMPUTED_DATA_DIR, 'packages', package_name)
+    parquet_paths = [os.path.join(package_dir, f'{name}.parquet') for name in ('apks',) + PARQUET_DATA_TYPES]
+    try:
+        mtime = max(os.path.getmtime(path) for path in parquet_paths)
+    except FileNotFoundError:
+        return None
+    return _load_package_parquet_cached(package_dir, mtime, package_name)
+
+def _load_package_json(package_name):
+    """Load a package from its JSON export, or None if there isn't one"""
+    package_dir = os.path.join(PRECOMPUTED_DATA_DIR, 'packages', package_name)
+    # Prefer the gzipped export, fall back to plain JSON
+    for filename in ('data.json.gz', 'data.json'):
+        data_path = os.path.join(package_dir, filename)
+        try:
+            mtime = os.path.getmtime(data_path)
+        except FileNotFoundError:
+            continue
+        return _load_package_data_cached(data_path, mtime)
+    return None
+
 def load_package_data(package_name):
     """Load precomputed data for a specific package"""
     try:
-        data_path = os.path.join(PRECOMPUTED_DATA_DIR, 'packages', package_name, 'data.json')
-        if os.path.exists(data_path):
-            with open(data_path, 'r') as f:
-                return json.load(f)
-        else:
+        # Prefer the columnar export when pandas/pyarrow can read it
+        if HAS_PANDAS:
+            try:
+                package_data = _load_package_parquet(package_name)
+            except Exception as e:
+                logger.warning(f"Could not read Parquet data for {package_name}, falling back to JSON: {e}")
+            else:
+                if package_data is not None:
+                    return package_data
+        package_data = _load_package_json(package_name)
+        if package_data is None:
             logger.warning(f"No precomputed data found for package: {package_name}")
-            return None
+        return package_data
     except Exception as e:
         logger.error(f"Error loading data for package {package_name}: {e}")
         return None
@@ -218,14 +366,8 @@ def generate_download_link(fig, package_name, data_type):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{package_name}_{data_type}_{timestamp}.html"
     
-    # Convert to HTML
-    plot_html = pio.to_html(fig, full_html=False)
-    
-    # Encode HTML
-    encoded = base64.b64encode(plot_html.encode()).decode()
-    
-    # Create download link
-    href = f"data:text/html;base64,{encoded}"
+    # Create download link, reusing the encoded HTML if this figure was seen before
+    href = figure_download_href(fig)
     
     return html.Div(children=[
         html.A(
@@ -250,10 +392,88 @@ def toggle_domains_filter(n_clicks, package_name):
         return {"display": "block"}
     return {"display": "none"}
 
+def find_runs(mask):
+    """Return (start, end) index pairs for each run of True values, end exclusive"""
+    edges = np.diff(np.concatenate(([0], np.asarray(mask, dtype=np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return [(int(start), int(end)) for start, end in zip(starts, ends)]
+
+# Preprocessed packages, keyed by id() of the (cached) package data
+_prepared_packages = {}
+_prepared_packages_lock = threading.Lock()
+MAX_PREPARED_PACKAGES = 32
+
+def preprocess_package(package_data):
+    """Sort APKs and build the staircase feature order once per package"""
+    with _prepared_packages_lock:
+        cached = _prepared_packages.get(id(package_data))
+    # Keep a reference to package_data so its id can't be reused while cached
+    if cached is not None and cached[0] is package_data:
+        return cached[1]
+    
+    # Sort versions by scan date
+    sorted_apks = sorted(package_data['apks'], key=lambda x: x['vtscandate'])
+    
+    # Extract versions and dates
+    versions = [apk['vercode'] for apk in sorted_apks]
+    dates = [apk['vtscandate'] for apk in sorted_apks]
+    
+    # Scan dates without the time part, split once per APK
+    date_strs = [date.split(' ', 1)[0] for date in dates]
+    
+    prepared = {
+        'sorted_apks': sorted_apks,
+        'versions': versions,
+        'dates': dates,
+        'date_strs': date_strs,
+        # Create x-axis labels
+        'x_labels': [f"{ver} ({date_str})" for ver, date_str in zip(versions, date_strs)],
+        'features': {},
+        'counts': {},
+        # Per-feature highlight colours, keyed by data type and highlight config
+        'highlight_colors': {}
+    }
+    
+    for data_type in ['urls', 'domains', 'subdomains']:
+        apk_counts = [Counter(apk['features'][data_type]) for apk in sorted_apks]
+        
+        # Apply staircase effect sorting logic (same as real-time analysis)
+        # 1: Count appearances of each feature across all versions. Summing the per-APK
+        # counts works whether features are lists (JSON) or Counters (Parquet)
+        feature_appearances = Counter()
+        for counts in apk_counts:
+            feature_appearances.update(counts)
+        
+        # 2: Sort features within each version based on appearances, then
+        # 3: build master list maintaining staircase effect
+        master_feature_list = []
+        seen_features = set()
+        seen_add = seen_features.add
+        master_append = master_feature_list.append
+        for apk in sorted_apks:
+            # Sort features by total appearances (descending), then alphabetically
+            version_features = sorted(apk['features'][data_type], key=lambda x: (-feature_appearances[x], x))
+            # Only add new features not already in master list
+            for feature in version_features:
+                if feature not in seen_features:
+                    seen_add(feature)
+                    master_append(feature)
+        
+        prepared['features'][data_type] = master_feature_list
+        prepared['counts'][data_type] = apk_counts
+    
+    with _prepared_packages_lock:
+        if len(_prepared_packages) >= MAX_PREPARED_PACKAGES:
+            # Remove oldest entry
+            _prepared_packages.pop(next(iter(_prepared_packages)), None)
+        _prepared_packages[id(package_data)] = (package_data, prepared)
+    return prepared
+
 def create_figure_from_precomputed_data(package_data, data_type, highlight_config, show_only_metadata=False):
     """Create visualisation from precomputed data"""
-    # Extract data from package
-    apks = package_data['apks']
+    # Deferred so worker start-up doesn't pay for plotly's figure classes
+    import plotly.graph_objects as go
     
     # Convert highlight config for plotting
     highlight_colors = {}
@@ -264,15 +484,13 @@ def create_figure_from_precomputed_data(package_data, data_type, highlight_confi
     # Create matrix of features x versions
     all_features = package_data['features'][data_type]
     
-    # Track features with metadata
-    features_with_metadata = set()
-    
-    # Find features with metadata
+    # Look up metadata once per feature (domains only)
+    feature_metadata = {}
     if data_type == 'domains':
-        for feature in all_features:
-            metadata = match_domain_metadata(feature)
-            if metadata:
-                features_with_metadata.add(feature)
+        feature_metadata = {feature: match_domain_metadata(feature) for feature in all_features}
+    
+    # Track features with metadata
+    features_with_metadata = {feature for feature, metadata in feature_metadata.items() if metadata}
                 
     # Filter features if requested (domains only)
     if data_type == 'domains' and show_only_metadata and features_with_metadata:
@@ -288,79 +506,52 @@ def create_figure_from_precomputed_data(package_data, data_type, highlight_confi
             'error': "No domains with metadata found for this package."
         }
     
-    # Sort versions by scan date
-    sorted_apks = sorted(apks, key=lambda x: x['vtscandate'])
+    # Sorted versions and staircase order are shared by all data types
+    prepared = preprocess_package(package_data)
+    sorted_apks = prepared['sorted_apks']
+    versions = prepared['versions']
+    dates = prepared['dates']
+    x_labels = prepared['x_labels']
     
-    # Extract versions and dates
-    versions = [apk['vercode'] for apk in sorted_apks]
-    dates = [apk['vtscandate'] for apk in sorted_apks]
+    # Use staircase-sorted features instead of raw order
+    all_features = prepared['features'][data_type]
     
-    # Apply staircase effect sorting logic (same as real-time analysis)
-    # 1: Count appearances of each feature across all versions
-    feature_appearances = {}
-    for apk in sorted_apks:
-        for feature in apk['features'][data_type]:
-            feature_appearances[feature] = feature_appearances.get(feature, 0) + 1
-    
-    # 2: Sort features within each version based on appearances  
-    version_sorted_features = {}
-    for apk in sorted_apks:
-        version_features = apk['features'][data_type]
-        # Sort features by total appearances (descending), then alphabetically
-        sorted_features = sorted(version_features, key=lambda x: (-feature_appearances[x], x))
-        version_sorted_features[apk['vercode']] = sorted_features
-    
-    # 3: Build master list maintaining staircase effect
-    master_feature_list = []
-    seen_features = set()
-    
-    for apk in sorted_apks:
-        version_features = version_sorted_features[apk['vercode']]
-        # Only add new features not already in master list
-        new_features = [f for f in version_features if f not in seen_features]
-        master_feature_list.extend(new_features)
-        seen_features.update(new_features)
+    # Create feature count matrix from one Counter per APK
+    feature_index = {feature: i for i, feature in enumerate(all_features)}
+    feature_matrix = np.zeros((len(all_features), len(sorted_apks)), dtype=np.int32)
     
-    # Use staircase-sorted features instead of raw order
-    all_features = master_feature_list
+    for j, apk_counts in enumerate(prepared['counts'][data_type]):
+        for feature, count in apk_counts.items():
+            i = feature_index.get(feature)
+            if i is not None:
+                feature_matrix[i, j] = count
     
-    # Create x-axis labels
-    x_labels = [f"{ver} ({date.split(' ')[0]})" for ver, date in zip(versions, dates)]
+    max_count = max(int(feature_matrix.max()) if feature_matrix.size else 0, 1)  # Track max count for scaling
     
-    # Create feature count matrix
-    feature_matrix = []
-    max_count = 1  # Track max count for scaling
+    # Counts are almost always tiny; narrow the dtype to shrink the serialised figure
+    if max_count < 256:
+        feature_matrix = feature_matrix.astype(np.uint8)
+    elif max_count < 32768:
+        feature_matrix = feature_matrix.astype(np.int16)
     
+    # Hover text comes from a template; only the date (per column) and
+    # domain metadata (per row) are passed as customdata
+    metadata_text = []
     for feature in all_features:
-        row = []
-        for apk in sorted_apks:
-            # Count how many times it appears in precomputed data
-            features_list = apk['features'][data_type]
-            count = features_list.count(feature)
-            max_count = max(max_count, count)
-            row.append(count)
-        feature_matrix.append(row)
-    
-    # Create hover text
-    hover_text = []
-    
-    for i, feature in enumerate(all_features):
-        hover_row = []
-        for j, apk in enumerate(sorted_apks):
-            count = feature_matrix[i][j]
-            hover_text_data = f"Feature: {truncate_string(feature)}<br>Version: {apk['vercode']}<br>Count: {count}<br>Date: {apk['vtscandate'].split(' ')[0]}"
-            
-            # Add domain metadata for domains
-            if data_type == 'domains':
-                metadata = match_domain_metadata(feature)
-                if metadata:
-                    hover_text_data += f"<br><br><b>Organisation:</b> {metadata['organization']}<br>"
-                    hover_text_data += f"<b>Country:</b> {metadata['country']}<br>"
-                    hover_text_data += f"<b>Category:</b> {metadata['category']}<br>"
-                    hover_text_data += f"<b>Description:</b> {metadata['description']}"
-            
-            hover_row.append(hover_text_data)
-        hover_text.append(hover_row)
+        metadata = feature_metadata.get(feature) if data_type == 'domains' else None
+        if metadata:
+            metadata_text.append(
+                f"<br><br><b>Organisation:</b> {metadata['organization']}<br>"
+                f"<b>Country:</b> {metadata['country']}<br>"
+                f"<b>Category:</b> {metadata['category']}<br>"
+                f"<b>Description:</b> {metadata['description']}"
+            )
+        else:
+            metadata_text.append("")
+    
+    hover_data = np.empty((len(all_features), len(sorted_apks), 2), dtype=object)
+    hover_data[:, :, 0] = prepared['date_strs']
+    hover_data[:, :, 1] = np.array(metadata_text, dtype=object)[:, None]
     
     # Create heatmap
     fig = go.Figure(data=go.Heatmap(
@@ -368,8 +559,8 @@ def create_figure_from_precomputed_data(package_data, data_type, highlight_confi
         z=feature_matrix,
         x=versions,
         y=all_features,
-        text=hover_text,
-        hoverinfo='text',
+        customdata=hover_data,
+        hovertemplate="Feature: %{y}<br>Version: %{x}<br>Count: %{z}<br>Date: %{customdata[0]}%{customdata[1]}<extra></extra>",
         colorscale=[[0, 'white'], [0.01, 'grey'], [0.4, '#505050'], [1, 'black']],
         zmin=0,
         zmax=max_count,
@@ -378,40 +569,71 @@ def create_figure_from_precomputed_data(package_data, data_type, highlight_confi
     ))
     
     # Add highlighting based on regex patterns
+    # Highlight colour only depends on the feature, so match each feature once
+    compiled_highlights = []
+    for pattern, color in highlight_colors.items():
+        try:
+            compiled_highlights.append((compile_highlight_pattern(pattern), color))
+        except re.error as e:
+            logger.warning(f"Skipping invalid highlight pattern {pattern}: {e}")
+    
+    # Colours only depend on the package's features and the highlight config,
+    # so classify once per package, data type and config
+    classification_key = (data_type, tuple((regex.pattern, color) for regex, color in compiled_highlights))
+    feature_colors = prepared['highlight_colors'].get(classification_key)
+    if feature_colors is None:
+        feature_colors = [None] * len(all_features)
+        if compiled_highlights:
+            # With presets only, one prefilter scan rules out most features
+            only_presets = all(pattern in PRESET_PATTERNS for pattern in highlight_colors)
+            
+            # Classify in fixed-size chunks so the candidate lists stay small
+            for chunk_start in range(0, len(all_features), CLASSIFY_CHUNK_SIZE):
+                chunk = all_features[chunk_start:chunk_start + CLASSIFY_CHUNK_SIZE]
+                if only_presets:
+                    candidates = [(i, feature) for i, feature in enumerate(chunk, chunk_start) if preset_prefilter(feature)]
+                else:
+                    candidates = enumerate(chunk, chunk_start)
+                for i, feature in candidates:
+                    # Stop after first match
+                    feature_colors[i] = next((color for regex, color in compiled_highlights if regex.search(feature)), None)
+        prepared['highlight_colors'][classification_key] = feature_colors
+    
     shapes = []
-    for feature_idx, feature in enumerate(all_features):
-        for ver_idx, _ in enumerate(versions):
-            if feature_matrix[feature_idx][ver_idx] > 0:  # If feature is present
-                # Highlight based on config
-                for pattern, color in highlight_colors.items():
-                    if re.search(pattern, feature, re.IGNORECASE):
-                        shapes.append({
-                            'type': 'rect',
-                            'x0': ver_idx - 0.5,
-                            'y0': feature_idx - 0.5,
-                            'x1': ver_idx + 0.5,
-                            'y1': feature_idx + 0.5,
-                            'fillcolor': color,
-                            'opacity': 0.3,
-                            'line': {'width': 0},
-                        })
-                        break  # Stop after first match
-                        
-    # For domains: add special border for features with metadata
-    if data_type == 'domains':
-        for feature_idx, feature in enumerate(all_features):
-            if feature in features_with_metadata:
-                # Special border for feature name (y-axis)
+    if compiled_highlights:
+        present = feature_matrix > 0
+        for feature_idx, color in enumerate(feature_colors):
+            if not color:
+                continue
+            # One rect per run of consecutive versions where the feature is present
+            for start, end in find_runs(present[feature_idx]):
                 shapes.append({
                     'type': 'rect',
-                    'x0': -0.5,  # Before first version
+                    'x0': start - 0.5,
                     'y0': feature_idx - 0.5,
-                    'x1': -0.1,  # Close to y-axis
+                    'x1': end - 0.5,
                     'y1': feature_idx + 0.5,
-                    'fillcolor': '#4CAF50',  # Green indicator
-                    'opacity': 0.8,
+                    'fillcolor': color,
+                    'opacity': 0.3,
                     'line': {'width': 0},
                 })
+                        
+    # For domains: add special border for features with metadata
+    if data_type == 'domains':
+        has_metadata = np.array([feature in features_with_metadata for feature in all_features], dtype=bool)
+        # One rect per run of consecutive features with metadata
+        for start, end in find_runs(has_metadata):
+            # Special border for feature name (y-axis)
+            shapes.append({
+                'type': 'rect',
+                'x0': -0.5,  # Before first version
+                'y0': start - 0.5,
+                'x1': -0.1,  # Close to y-axis
+                'y1': end - 0.5,
+                'fillcolor': '#4CAF50',  # Green indicator
+                'opacity': 0.8,
+                'line': {'width': 0},
+            })
     
     # Update layout
     title_text = f"{data_type.capitalize()} Presence and Frequency Across Versions for {package_data['metadata']['package_name']}"
@@ -452,7 +674,7 @@ def create_figure_from_precomputed_data(package_data, data_type, highlight_confi
         
         # Add domain metadata if available
         if data_type == 'domains':
-            metadata = match_domain_metadata(feature)
+            metadata = feature_metadata.get(feature)
             if metadata:
                 info['metadata'] = metadata
         
@@ -463,7 +685,7 @@ def create_figure_from_precomputed_data(package_data, data_type, highlight_confi
         'features': all_features,
         'versions': versions,
         'dates': dates,
-        'feature_matrix': feature_matrix,
+        'feature_matrix': feature_matrix.tolist(),
         'package_name': package_data['metadata']['package_name'],
         'data_type': data_type,
         'sorted_apks': [{'vercode': apk['vercode'], 'vtscandate': apk['vtscandate']} for apk in sorted_apks]
@@ -478,8 +700,7 @@ def create_figure_from_precomputed_data(package_data, data_type, highlight_confi
     }
 
 @app.callback(
-    [Output("precomputed-highlight-list", "children"),
-     Output("precomputed-highlight-config-store", "data"),
+    [Output("precomputed-highlight-config-store", "data"),
      Output("precomputed-highlight-dropdown", "value")],
     [Input("precomputed-highlight-dropdown", "value"),
      Input("precomputed-add-highlight", "n_clicks"),
@@ -499,8 +720,10 @@ def update_highlight_config(selected_presets, add_clicks, remove_clicks, custom_
 
     if triggered_id == "precomputed-highlight-dropdown":
         # Add newly selected presets
+        existing_names = {h['name'] for h in stored_config}
         for preset in selected_presets or []:
-            if not any(h['name'] == preset for h in stored_config):
+            if preset not in existing_names:
+                existing_names.add(preset)
                 stored_config.append({
                     "name": preset,
                     "regex": preset_configs[preset]["regex"],
@@ -522,20 +745,117 @@ def update_highlight_config(selected_presets, add_clicks, remove_clicks, custom_
             if not removed_item['name'].startswith("Custom:"):
                 selected_presets = [preset for preset in (selected_presets or []) if preset != removed_item['name']]
 
-    highlight_list = create_highlight_list(stored_config)
-    return highlight_list, stored_config, selected_presets
-
-def create_highlight_list(highlight_config):
-    """Create a list of highlight items for display"""
-    return [
-        html.Div([
-            html.Span(f"{item['name']}: ", style={"fontWeight": "bold"}),
-            html.Span(f"{item['regex'][:30]}..." if len(item['regex']) > 30 else item['regex']),
-            html.Span(f" ({item['color']})", style={"color": item['color']}),
-            html.Button(children="Ã—", id={"type": "precomputed-remove-highlight", "index": i}, n_clicks=0, style={"marginLeft": "10px"}),
-        ], style={"marginBottom": "5px"})
-        for i, item in enumerate(highlight_config)
-    ]
+    return stored_config, selected_presets
+
+# Render the highlight list in the browser straight from the store, so the
+# server only returns the updated config
+app.clientside_callback(
+    """
+    function(highlightConfig) {
+        function component(type, props) {
+            return {namespace: 'dash_html_components', type: type, props: props};
+        }
+        return (highlightConfig || []).map(function(item, i) {
+            var regex = item.regex.length > 30 ? item.regex.slice(0, 30) + '...' : item.regex;
+            return component('Div', {
+                style: {marginBottom: '5px'},
+                children: [
+                    component('Span', {children: item.name + ': ', style: {fontWeight: 'bold'}}),
+                    component('Span', {children: regex}),
+                    component('Span', {children: ' (' + item.color + ')', style: {color: item.color}}),
+                    component('Button', {
+                        children: '\u00d7',
+                        id: {type: 'precomputed-remove-highlight', index: i},
+                        n_clicks: 0,
+                        style: {marginLeft: '10px'}
+                    })
+                ]
+            });
+        });
+    }
+    """,
+    Output("precomputed-highlight-list", "children"),
+    Input("precomputed-highlight-config-store", "data")
+)
+
+# Rendered figure results are also written here, so repeat requests survive
+# restarts and are shared between workers
+RENDER_CACHE_DIR = os.path.join(PRECOMPUTED_DATA_DIR, 'renders')
+# Renders kept on disk; the least recently written are removed beyond this
+MAX_CACHED_RENDERS = 2000
+
+def _render_cache_path(package_name, data_type, highlight_key, show_only_metadata):
+    """Path of the on-disk render for a package and figure configuration"""
+    # The package name comes from the client, so it only reaches the filename hashed
+    render_key = json.dumps([package_name, data_type, highlight_key, show_only_metadata])
+    return os.path.join(RENDER_CACHE_DIR, f"{hashlib.sha256(render_key.encode()).hexdigest()}.json")
+
+def _package_data_mtime(package_name):
+    """Newest mtime among a package's data files and the domain metadata, or None"""
+    package_dir = os.path.join(PRECOMPUTED_DATA_DIR, 'packages', package_name)
+    try:
+        data_mtime = max(entry.stat().st_mtime for entry in os.scandir(package_dir) if entry.is_file())
+    except (OSError, ValueError):
+        return None
+    try:
+        return max(data_mtime, os.path.getmtime(os.path.join('utils', 'domain_metadata.json')))
+    except OSError:
+        return data_mtime
+
+def load_cached_render(render_path, data_mtime):
+    """Load a render from disk if it is newer than the package data"""
+    try:
+        if data_mtime is None or os.path.getmtime(render_path) < data_mtime:
+            return None
+        with open(render_path, 'rb') as f:
+            if HAS_ORJSON:
+                return orjson.loads(f.read())
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Could not read cached render {render_path}: {e}")
+        return None
+
+def save_cached_render(render_path, result):
+    """Write a render to disk atomically"""
+    from plotly.utils import PlotlyJSONEncoder
+    
+    try:
+        os.makedirs(RENDER_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{render_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f, cls=PlotlyJSONEncoder)
+        os.replace(tmp_path, render_path)
+        prune_render_cache()
+    except Exception as e:
+        logger.warning(f"Could not write cached render {render_path}: {e}")
+
+def prune_render_cache(max_renders=MAX_CACHED_RENDERS):
+    """Remove the oldest renders once the cache holds more than max_renders"""
+    with os.scandir(RENDER_CACHE_DIR) as entries:
+        renders = [entry for entry in entries if entry.name.endswith('.json')]
+    if len(renders) <= max_renders:
+        return
+    # Trim to 90% so pruning doesn't rerun on every write
+    renders.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in renders[:len(renders) - int(max_renders * 0.9)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+# Build visualisations in a background worker when a manager is available, so
+# large packages don't block the request or hit its timeout
+BACKGROUND_CALLBACK_KWARGS = (
+    {'background': True, 'manager': background_callback_manager}
+    if background_callback_manager is not None else {}
+)
+
+# Figure results per (package, data type, highlights, filter), for checkbox toggles
+_figure_results = {}
+_figure_results_lock = threading.Lock()
+MAX_CACHED_FIGURES = 24
 
 @app.callback(
     [Output("precomputed-results", "children"),
@@ -550,7 +870,8 @@ def create_highlight_list(highlight_config):
     [Input("precomputed-submit-button", "n_clicks"),
      Input("precomputed-show-only-metadata-domains", "value")],
     [State("precomputed-package-dropdown", "value"),
-     State("precomputed-highlight-config-store", "data")]
+     State("precomputed-highlight-config-store", "data")],
+    **BACKGROUND_CALLBACK_KWARGS
 )
 def generate_visualizations(n_clicks, show_only_metadata, package_name, highlight_config):
     """Generate visualizations based on precomputed data"""
@@ -565,6 +886,10 @@ def generate_visualizations(n_clicks, show_only_metadata, package_name, highligh
     if n_clicks is None or not package_name:
         raise PreventUpdate
     
+    # The name is joined into data and cache paths, so only accept Android package names
+    if not PACKAGE_NAME_PATTERN.match(package_name):
+        raise PreventUpdate
+    
     try:
         # Show spinner
         spinner_style = {"display": "block"}
@@ -591,20 +916,49 @@ def generate_visualizations(n_clicks, show_only_metadata, package_name, highligh
         data_types = ['urls', 'domains', 'subdomains']
         output_results = []
         
-        for data_type in data_types:
+        # Warm the shared per-package preprocessing before building figures in parallel
+        preprocess_package(package_data)
+        
+        highlight_key = json.dumps(highlight_config or [], sort_keys=True)
+        data_mtime = _package_data_mtime(package_name)
+        
+        def build_figure(data_type):
             # Apply filtering only for domains
-            current_show_only_metadata = False
-            if data_type == 'domains':
-                current_show_only_metadata = show_only_metadata
-                
-            # Create figure
-            result = create_figure_from_precomputed_data(
-                package_data, 
-                data_type, 
-                highlight_config or [],
-                show_only_metadata=current_show_only_metadata
-            )
+            current_show_only_metadata = bool(show_only_metadata) if data_type == 'domains' else False
+            
+            # Reuse the figure if nothing it depends on has changed, e.g. urls and
+            # subdomains when only the metadata checkbox is toggled
+            cache_key = (package_name, data_type, highlight_key, current_show_only_metadata)
+            with _figure_results_lock:
+                cached = _figure_results.get(cache_key)
+            if cached is not None and cached[0] is package_data:
+                return cached[1]
             
+            render_path = _render_cache_path(package_name, data_type, highlight_key, current_show_only_metadata)
+            result = load_cached_render(render_path, data_mtime)
+            if result is None:
+                result = create_figure_from_precomputed_data(
+                    package_data, 
+                    data_type, 
+                    highlight_config or [],
+                    show_only_metadata=current_show_only_metadata
+                )
+                # Error results (e.g. no domains with metadata) are cheap to rebuild, so not persisted
+                if 'error' not in result:
+                    save_cached_render(render_path, result)
+            
+            with _figure_results_lock:
+                if len(_figure_results) >= MAX_CACHED_FIGURES:
+                    # Remove oldest entry
+                    _figure_results.pop(next(iter(_figure_results)), None)
+                _figure_results[cache_key] = (package_data, result)
+            return result
+        
+        # Figures are independent, so build them concurrently
+        with ThreadPoolExecutor(max_workers=len(data_types)) as executor:
+            results = list(executor.map(build_figure, data_types))
+        
+        for data_type, result in zip(data_types, results):
             # Check for errors
             if 'error' in result:
                 output_results.extend([
@@ -767,8 +1121,3 @@ def show_spinner_on_click(n_clicks):
     if n_clicks:
         return {"display": "block"}, "Generating visualizations...", "primary", {"display": "none"}, False
     return {"display": "none"}, "Waiting for input...", "secondary", {"display": "none"}, False
-
-# Helper function
-def both_nonzero(a, b):
-    """Check if both values are non-zero"""
-    return a > 0 and b > 0
\ No newline at end of file
@@ -13,9 +13,33 @@
 # limitations under the License.
 from dash import dcc, html
 import dash_bootstrap_components as dbc
+from utils.logo_svg import ascii_art_data_uri
 from datetime import datetime
 import json
+import mmap
 import os
+import re
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+
+# Metadata files at least this large are stream-parsed instead of loaded whole
+METADATA_STREAM_THRESHOLD = 10 * 1024 * 1024
 
 
 
@@ -33,19 +57,39 @@ def create_highlight_options(preset_configs):
     options.append({"label": "Custom", "value": "custom"})
     return options
 
+# Parsed metadata, keyed by the file's (mtime_ns, size)
+_precomputed_packages_cache = {}
+
 # Load precomputed package metadata
 def get_precomputed_packages():
     try:
         metadata_path = os.path.join('precomputed_data', 'metadata.json')
-        if os.path.exists(metadata_path):
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
-                return metadata['processed_packages']
-        return []
+        try:
+            stat = os.stat(metadata_path)
+        except FileNotFoundError:
+            return []
+        key = (stat.st_mtime_ns, stat.st_size)
+        if _precomputed_packages_cache.get('key') != key:
+            with open(metadata_path, 'rb') as f:
+                if HAS_IJSON and stat.st_size >= METADATA_STREAM_THRESHOLD:
+                    # Only materialise the processed_packages array
+                    packages = list(ijson.items(f, 'processed_packages.item'))
+                elif HAS_ORJSON:
+                    # Parse straight from the mapped file instead of copying it into a bytes object
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                        packages = orjson.loads(view)['processed_packages']
+                else:
+                    packages = json.load(f)['processed_packages']
+            _precomputed_packages_cache['key'] = key
+            _precomputed_packages_cache['packages'] = packages
+        return _precomputed_packages_cache['packages']
     except Exception as e:
         print(f"Error loading precomputed packages: {e}")
         return []
 
+# Warm the cache so the first callback doesn't hit the disk
+get_precomputed_packages()
+
 preset_configs = {
     "Chinese Tech Giants": {"regex": "baidu|alibaba|tencent|huawei|xiaomi|bytedance|weibo|wechat|qq|douyin|\\.cn$|\\.中国$|\\.中國$", "color": "#0000FF"},
     "U.S. Tech Giants": {"regex": "google|facebook|amazon|apple|microsoft|twitter|linkedin|instagram|snapchat", "color": "#0000FF"},
@@ -55,14 +99,77 @@ preset_configs = {
     "Chinese Cloud Services": {"regex": "aliyun|alicloud|tencentcloud|huaweicloud|baiduyun|qcloud", "color": "#0000FF"},
     "Russian Cloud Services": {"regex": "selectel|cloudmts|sbercloud|mail\\.ru", "color": "#0000FF"},
 
-    "Education": {"regex": "edu|\\.edu$|university|school|college", "color": "#4B0082"},
+    "Education": {"regex": "edu|university|school|college", "color": "#4B0082"},
 }
 
+# Highlight dropdown options are fixed, so build them once
+HIGHLIGHT_DROPDOWN_OPTIONS = [{'label': k, 'value': k} for k in preset_configs]
+
+# Presets as parallel sequences (name, compiled pattern, colour) indexed by preset
+PRESET_NAMES = tuple(preset_configs)
+PRESET_REGEXES = tuple(re.compile(preset_configs[name]["regex"], re.IGNORECASE) for name in PRESET_NAMES)
+PRESET_COLORS = tuple(preset_configs[name]["color"] for name in PRESET_NAMES)
+
+# Preset patterns compiled once at import
+compiled_presets = dict(zip(PRESET_NAMES, PRESET_REGEXES))
+
+# All presets in one alternation, one named group per preset, so a single
+# scan tells whether (and via lastgroup, which) preset matches
+preset_group_names = {re.sub(r'\W+', '_', name.lower()).strip('_'): name for name in preset_configs}
+combined_preset_pattern = re.compile(
+    "|".join(f"(?P<{group}>{preset_configs[name]['regex']})" for group, name in preset_group_names.items()),
+    re.IGNORECASE
+)
+
+def _split_literal_preset(regex):
+    """Split an alternation of literals into (keywords, suffixes), or None if it uses other regex syntax"""
+    keywords, suffixes = [], []
+    for piece in regex.split('|'):
+        anchored = piece.endswith('$')
+        literal = piece[:-1] if anchored else piece
+        if not literal or any(c in literal.replace('\\.', '') for c in '.\\^$*+?{}[]()'):
+            return None
+        (suffixes if anchored else keywords).append(literal.replace('\\.', '.').lower())
+    return keywords, suffixes
+
+def _build_preset_automaton():
+    """Aho-Corasick automaton over the preset keywords, if every preset is literal"""
+    if not HAS_AHOCORASICK:
+        return None, ()
+    automaton = ahocorasick.Automaton()
+    suffixes = []
+    for config in preset_configs.values():
+        split = _split_literal_preset(config["regex"])
+        if split is None:
+            return None, ()
+        for keyword in split[0]:
+            automaton.add_word(keyword, keyword)
+        suffixes.extend(split[1])
+    if not len(automaton):
+        return None, ()
+    automaton.make_automaton()
+    return automaton, tuple(suffixes)
+
+_preset_automaton, _preset_suffixes = _build_preset_automaton()
+
+def preset_prefilter(feature):
+    """Return False if no preset can match the feature"""
+    if _preset_automaton is None:
+        return combined_preset_pattern.search(feature) is not None
+    lowered = feature.lower()
+    if lowered.endswith(_preset_suffixes):
+        return True
+    return next(_preset_automaton.iter(lowered), None) is not None
+
+# Static header rows, built once
+ASCII_LOGO_ROW = dbc.Row(dbc.Col(html.Img(src=ascii_art_data_uri(ascii_logo), alt="JANUS")))
+SPONSORS_ROW = dbc.Row(dbc.Col(html.Img(src="/assets/sponsors.png",
+                                        style={'height': '71px', 'display': 'inline-block', 'margin-bottom': '0px',
+                                               'margin-top': '0px'})))
+
 layout = dbc.Container([
-    dbc.Row(dbc.Col(html.Pre(ascii_logo, style={'font-family': 'monospace', 'color': 'blue'}))),
-    dbc.Row(dbc.Col(html.Img(src="/assets/sponsors.png",
-                             style={'height': '71px', 'display': 'inline-block', 'margin-bottom': '0px',
-                                    'margin-top': '0px'}))),
+    ASCII_LOGO_ROW,
+    SPONSORS_ROW,
     # Add the script for the custom JavaScript
     html.Script(src='/assets/custom.js'),
     # Add empty div with ID for copy button container
@@ -86,6 +193,9 @@ layout = dbc.Container([
                     placeholder="Select a pre-computed package",
                     searchable=True,
                     clearable=True,
+                    # Fixed row height keeps the virtualised option list cheap to lay out
+                    optionHeight=35,
+                    maxHeight=300,
                 ),
                 
                 dbc.Label("Highlight Configuration"),
@@ -95,14 +205,14 @@ layout = dbc.Container([
                 ], color="info", className="mb-2", style={"padding": "8px 12px", "fontSize": "0.875rem"}),
                 dcc.Dropdown(
                     id='precomputed-highlight-dropdown',
-                    options=[{'label': k, 'value': k} for k in preset_configs.keys()],
+                    options=HIGHLIGHT_DROPDOWN_OPTIONS,
                     multi=True,
                     placeholder="Select preset highlight patterns",
                     style={'marginBottom': '10px'}
                 ),
                 html.Div([
-                    dbc.Input(id="precomputed-highlight-pattern", type="text", placeholder="Enter regex pattern", className="mb-2"),
-                    dbc.Input(id="precomputed-highlight-color", type="text", placeholder="Enter color (e.g., #FF0000)", className="mb-2"),
+                    dbc.Input(id="precomputed-highlight-pattern", type="text", debounce=True, placeholder="Enter regex pattern", className="mb-2"),
+                    dbc.Input(id="precomputed-highlight-color", type="text", debounce=True, placeholder="Enter color (e.g., #FF0000)", className="mb-2"),
                     dbc.Button("Add Custom Highlight", id="precomputed-add-highlight", color="secondary", size="sm", className="mb-2"),
                 ], id="precomputed-custom-highlight-inputs"),
                 html.Div(id="precomputed-highlight-list", style={'maxHeight': '200px', 'overflowY': 'auto'}),
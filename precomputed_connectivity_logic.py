@@ -12,16 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import base64
+import csv
+import functools
 import gc
 import json
 import logging
 import multiprocessing as mp
+import numpy as np
 import os
 import re
 import shutil
 import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
 from datetime import datetime
+from itertools import groupby, islice
+from operator import itemgetter
 from pathlib import Path
 import pandas as pd
 import requests
@@ -32,8 +39,8 @@ from dash import html
 from tqdm import tqdm
 import threading
 from utils.dex_parser import DEXParser, extract_apk_dex_files
-from utils.ui_logger import UILogger, ui_logger, register_process, should_cancel as session_should_cancel
-import plotly.io as pio
+from utils.ui_logger import UILogger, ui_logger, register_process, session_scoped, should_cancel as session_should_cancel
+import plotly.graph_objects as go
 from dash.exceptions import PreventUpdate
 from utils.db_connection import initialize_pool, execute_query
 import uuid
@@ -51,44 +58,69 @@ from utils.apk_analysis_core import (
     process_file,
     process_package_apks,
     sanitize_string,
-    truncate_string,
     validate_and_clean_apks,
 )
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 _mp_context = mp.get_context('spawn')
-download_semaphore = _mp_context.Semaphore(3)
+MAX_CONCURRENT_DOWNLOADS = 3
+# Rows of extracted features aggregated per chunk before plotting
+FEATURE_CHUNK_SIZE = 50000
+download_semaphore = _mp_context.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+# Databases already initialised in this process
+_initialized_dbs = set()
+_init_lock = threading.Lock()
+
+# APK metadata lookups are cached for this many seconds
+APK_QUERY_CACHE_TTL = 600
+
+@functools.lru_cache(maxsize=256)
+def _cached_find(package_name, db_path, start_date, end_date, ttl_bucket):
+    """Cached find_sha256_vercode_vtscandate; ttl_bucket expires entries"""
+    return tuple(find_sha256_vercode_vtscandate(package_name, db_path, start_date, end_date))
+
+def clear_cache():
+    """Drop cached APK metadata lookups"""
+    _cached_find.cache_clear()
 
 def initialize_database(db_path):
-    """Initialise the database and connection pool"""
-    # Initialise the connection pool
-    initialize_pool(db_path, max_connections=20)
-    
-    # Create table if it doesn't exist
-    execute_query('''
-    CREATE TABLE IF NOT EXISTS apks (
-        sha256 TEXT PRIMARY KEY,
-        pkg_name TEXT,
-        vercode TEXT,
-        vt_scan_date TEXT
-    )
-    ''', commit=True)
-    
-    logger.info(f"Database initialised: {db_path}")
+    """Initialise the database and connection pool, once per db_path"""
+    with _init_lock:
+        if db_path in _initialized_dbs:
+            return
+        
+        # Initialise the connection pool
+        initialize_pool(db_path, max_connections=20)
+        
+        # Create table if it doesn't exist
+        execute_query('''
+        CREATE TABLE IF NOT EXISTS apks (
+            sha256 TEXT PRIMARY KEY,
+            pkg_name TEXT,
+            vercode TEXT,
+            vt_scan_date TEXT
+        )
+        ''', commit=True)
+        
+        _initialized_dbs.add(db_path)
+        logger.info(f"Database initialised: {db_path}")
 
 def check_and_print_csv(filename):
     try:
-        data = pd.read_csv(filename, nrows=5)
-        if data.empty:
+        # Only a preview is printed, so read the header and first rows with the stdlib reader
+        with open(filename, newline='') as f:
+            rows = list(islice(csv.reader(f), 6))
+        if len(rows) < 2:
             print("CSV file is empty.")
         else:
             print("First few rows of the CSV file:")
-            print(data)
-    except pd.errors.EmptyDataError:
-        print("CSV file is empty.")
+            for row in rows:
+                print(", ".join(row))
     except Exception as e:
         print(f"Error reading CSV file: {e}")
 
+@session_scoped
 def process_apks(n_clicks, api_key, start_date, end_date, package_list_input, desired_versions, highlight_config, num_cores, parser_selection, session_id=None):
     """
     Process APKs for analysis with session tracking
@@ -173,10 +205,14 @@ def process_apks(n_clicks, api_key, start_date, end_date, package_list_input, de
                     logger.warning(f"No figures generated for package {package_name}")
             except Exception as e:
                 logger.error(f"Error processing package {package_name}: {str(e)}")
+            finally:
+                # Reclaim the package's intermediate data before the next one
+                gc.collect()
 
     logger.info("APK processing complete")
     return results
 
+@session_scoped
 def process_package(package_name, base_directory, apikey, db_path, start_date, end_date, desired_versions, highlight_config, num_cores, parser_selection, session_id=None):
     # Get the session logger
     if session_id:
@@ -224,6 +260,11 @@ def process_package(package_name, base_directory, apikey, db_path, start_date, e
         logger.warning(f"No data extracted from APKs for {package_name}")
         return None
     
+    # Reduce the per-URL rows to counts per data type in chunks, so plotting
+    # never holds a full-size DataFrame of every occurrence
+    feature_counts = aggregate_feature_counts(all_data, ['urls', 'subdomains', 'domains'])
+    del all_data
+    
     # Plot the data for each data type
     figs = {}
     for data_type in ['urls', 'subdomains', 'domains']:
@@ -240,12 +281,34 @@ def process_package(package_name, base_directory, apikey, db_path, start_date, e
             formatted_highlight_config = {item['regex']: item['color'] for item in highlight_config}
             
         # Plot the data
-        fig = plot_data(all_data, package_name, formatted_highlight_config, data_type)
+        # pop so this data type's counts can be freed once it's plotted
+        fig = plot_data(feature_counts.pop(data_type), package_name, formatted_highlight_config, data_type)
         figs[data_type] = fig
+        
+        # plot_data's frames, pivots and hover text are garbage now; collect any cycles
+        gc.collect(generation=1)
     
     logger.info(f"Completed processing for {package_name}")
     return figs
 
+def aggregate_feature_counts(rows, data_types, chunk_size=FEATURE_CHUNK_SIZE):
+    """Count (version, vtscandate, feature) occurrences per data type, chunk_size rows at a time"""
+    partial_counts = {data_type: [] for data_type in data_types}
+    for start in range(0, len(rows), chunk_size):
+        chunk = pd.DataFrame(rows[start:start + chunk_size])
+        for data_type in data_types:
+            partial_counts[data_type].append(
+                chunk.groupby(['version', 'vtscandate', data_type]).size().rename('Count').reset_index()
+            )
+        del chunk
+
+    # Features spanning chunks are summed once more after concatenating
+    return {
+        data_type: pd.concat(partials, ignore_index=True)
+                     .groupby(['version', 'vtscandate', data_type], as_index=False)['Count'].sum()
+        for data_type, partials in partial_counts.items()
+    }
+
 def download_apks(package_names, apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions, session_id=None):
     """Download APKs for a list of packages within a date range with session tracking"""
     # Get the logger
@@ -259,7 +322,6 @@ def download_apks(package_names, apikey, universal_cache_dir, db_path, start_dat
     os.makedirs(universal_cache_dir, exist_ok=True)
     
     download_tasks = []
-    apk_log = {}
     
     for package_name in package_names:
         # Check if we should cancel
@@ -268,7 +330,8 @@ def download_apks(package_names, apikey, universal_cache_dir, db_path, start_dat
             return None
             
         # Get the list of APKs for this package
-        sha256_vercode_vtscandate_list = find_sha256_vercode_vtscandate(package_name, db_path, start_date, end_date)
+        sha256_vercode_vtscandate_list = list(_cached_find(package_name, db_path, start_date, end_date,
+                                                           int(time.time() // APK_QUERY_CACHE_TTL)))
         
         if not sha256_vercode_vtscandate_list:
             logger.warning(f"No APKs found for {package_name} in date range")
@@ -287,46 +350,62 @@ def download_apks(package_names, apikey, universal_cache_dir, db_path, start_dat
         
         for sha256, vercode, vtscandate in sampled_apps:
             download_tasks.append((sha256, vercode, vtscandate, package_name, apikey, universal_cache_dir))
-        
-        # Record the apps we're going to download
-        apk_log[package_name] = [
-            {"sha256": sha256, "vercode": vercode, "vtscandate": vtscandate}
-            for sha256, vercode, vtscandate in [latest_app] + sampled_apps
-        ]
+
     
     # Log how many APKs we're downloading
     logger.info(f"Downloading {len(download_tasks)} APKs")
     
-    # Download each APK sequentially to have better control over cancellation
+    # Download concurrently, bounded like download_semaphore, checking for
+    # cancellation as each download finishes
     results = []
-    for i, task in enumerate(download_tasks):
-        # Check if we should cancel
-        if session_id and session_should_cancel(session_id):
-            logger.info("Download cancelled during task execution")
-            return None
-            
-        logger.info(f"Downloading APK {i+1}/{len(download_tasks)}: {task[0]}")
-        result = download_apk_worker(*task)
-        if result:
-            results.append(result)
+    executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOWNLOADS)
+    try:
+        # Workers run in a copy of this context, so they see the same session and run
+        futures = {executor.submit(copy_context().run, download_apk_worker, *task): task for task in download_tasks}
+        for i, future in enumerate(as_completed(futures)):
+            # Check if we should cancel
+            if session_id and session_should_cancel(session_id):
+                logger.info("Download cancelled during task execution")
+                executor.shutdown(wait=False, cancel_futures=True)
+                return None
+
+            logger.info(f"Downloaded APK {i+1}/{len(download_tasks)}: {futures[future][0]}")
+            result = future.result()
+            if result:
+                results.append(result)
+    finally:
+        executor.shutdown(wait=False)
     
     # Save the APK log as JSON
-    with open(os.path.join(universal_cache_dir, 'apk_log.json'), 'w') as f:
-        json.dump(apk_log, f, indent=2)
+    write_apk_log(os.path.join(universal_cache_dir, 'apk_log.json'), download_tasks)
     
     logger.info(f"Downloaded {len(results)} APKs successfully")
     return results
 
+def write_apk_log(log_path, download_tasks):
+    """Write apk_log.json ({package: [apk, ...]}) one entry at a time from the download tasks"""
+    with open(log_path, 'w') as f:
+        f.write('{')
+        # Tasks are queued package by package, latest version first
+        for package_idx, (package_name, tasks) in enumerate(groupby(download_tasks, key=itemgetter(3))):
+            f.write(f'{"," if package_idx else ""}\n  {json.dumps(package_name)}: [')
+            for task_idx, (sha256, vercode, vtscandate, *_) in enumerate(tasks):
+                entry = json.dumps({"sha256": sha256, "vercode": vercode, "vtscandate": vtscandate})
+                f.write(f'{"," if task_idx else ""}\n    {entry}')
+            f.write('\n  ]')
+        f.write('\n}\n')
+
 def check_apk_in_cache_(sha256, universal_cache_dir):
     apk_path = os.path.join(universal_cache_dir, f"{sha256}.apk")
     return os.path.exists(apk_path)
 
-def plot_data(all_data, package_name, highlight_config, data_type):
+def plot_data(all_data, package_name, highlight_config, data_type, build_figure=True):
     print(f"Preparing data for plotting {data_type}...")
     
     MAX_STRING_LENGTH = 100
 
-    if not all_data:
+    # all_data is either the raw per-URL rows or pre-aggregated counts (see aggregate_feature_counts)
+    if all_data is None or len(all_data) == 0:
         print(f"No data available for {package_name}")
         return None
 
@@ -336,83 +415,75 @@ def plot_data(all_data, package_name, highlight_config, data_type):
         print(f"Error: '{data_type}' not found in the data. Available columns: {df.columns.tolist()}")
         return None
 
-    df = df[['version', 'vtscandate', data_type]].rename(columns={data_type: 'Data'})
-    df['Data'] = df['Data'].apply(lambda x: truncate_string(x, MAX_STRING_LENGTH))
-    df['Count'] = 1
-    df = df.groupby(['version', 'vtscandate', 'Data']).sum().reset_index()
+    has_counts = 'Count' in df.columns
+    df = df[['version', 'vtscandate', data_type] + (['Count'] if has_counts else [])].rename(columns={data_type: 'Data'})
+    # Same result as truncate_string, done column-wise on just the long values
+    too_long = df['Data'].str.len() > MAX_STRING_LENGTH
+    if too_long.any():
+        df.loc[too_long, 'Data'] = df.loc[too_long, 'Data'].str.slice(0, MAX_STRING_LENGTH - 3) + "..."
+    # versions are ordered explicitly below, so skip sorting the groups
+    if has_counts:
+        df = df.groupby(['version', 'vtscandate', 'Data'], sort=False)['Count'].sum().reset_index()
+    else:
+        df = df.groupby(['version', 'vtscandate', 'Data'], sort=False).size().reset_index(name='Count')
 
     if df.empty:
         print(f"No data to plot for {data_type}.")
         return None
 
-    # convert date to datetime and format it as a string
-    df['vtscandate'] = pd.to_datetime(df['vtscandate']).dt.strftime('%Y-%m-%d')
+    # keep just the date part; scan dates are ISO strings, so only parse other formats
+    scan_dates = df['vtscandate'].astype(str)
+    if scan_dates.str.match(r'\d{4}-\d{2}-\d{2}').all():
+        df['vtscandate'] = scan_dates.str.slice(0, 10)
+    else:
+        df['vtscandate'] = pd.to_datetime(df['vtscandate']).dt.strftime('%Y-%m-%d')
     df['version'] = df['version'].astype(str)
 
-    # pivot the count and date data
-    df_count_pivot = df.pivot_table(index='Data', columns='version', values='Count', aggfunc='sum', fill_value=0)
-    df_date_pivot = df.pivot_table(index='Data', columns='version', values='vtscandate', aggfunc='first')
-
-    sorted_versions = sorted(df_count_pivot.columns,
-                             key=lambda s: [int(u) if u.isdigit() else u for u in re.split('(\d+)', s)])
-    df_count_pivot = df_count_pivot[sorted_versions]
-    df_date_pivot = df_date_pivot[sorted_versions]
-
-    # create a new list for x-axis labels combining version and date
-    sorted_versions_with_dates = []
-    for version in sorted_versions:
-        #find the earliest date for this version
-        earliest_date = df[df['version'] == version]['vtscandate'].min()
-        label = f"{version} ({earliest_date})"
-        sorted_versions_with_dates.append(label)
-
+    # natural-sort the versions once and make version an ordered categorical, so
+    # the pivots and groupbys below come out in version order
     sorted_versions = sorted(df['version'].unique(),
-                             key=lambda x: [int(part) if part.isdigit() else part for part in re.split('([0-9]+)', x)])
+                             key=lambda s: [int(u) if u.isdigit() else u for u in re.split(r'(\d+)', s)])
+    df['version'] = pd.Categorical(df['version'], categories=sorted_versions, ordered=True)
 
-    #evolutionary sorting logic
-    # 1: count appearances of each domain across all versions
-    data_appearances = {}
-    for version in sorted_versions:
-        for item in df[df['version'] == version]['Data'].unique():
-            data_appearances[item] = data_appearances.get(item, 0) + 1
-
-    # 2: sort domains within each version based on appearances and re-addition
-    version_sorted_data = {}
-    for version in sorted_versions:
-        current_version_data = df[df['version'] == version]['Data'].unique().tolist()
-        # sort domains within the current version based on their total appearances (descending)
-        sorted_data = sorted(current_version_data, key=lambda x: (-data_appearances[x], x))
-        version_sorted_data[version] = sorted_data
+    # pivot the count and date data
+    df_count_pivot = df.pivot_table(index='Data', columns='version', values='Count', aggfunc='sum', fill_value=0, observed=True)
+    df_date_pivot = df.pivot_table(index='Data', columns='version', values='vtscandate', aggfunc='first', observed=True)
 
-    # 3: build the master list of domains, maintaining the staircase effect
-    #initialize a master list of domains across all versions
-    master_data_list = []
-    seen_data = set()
+    # create a new list for x-axis labels combining version and its earliest date
+    earliest_dates = df.groupby('version', observed=True)['vtscandate'].min()
+    sorted_versions_with_dates = [f"{version} ({earliest_dates[version]})" for version in sorted_versions]
 
-    for version in sorted_versions:
-        #retrieve the sorted list of domains for the current version
-        current_version_sorted_data = version_sorted_data[version]
-        #filter to include only new or re-added domains not already in master_domain_list
-        new_or_readded_data = [item for item in current_version_sorted_data if item not in seen_data]
-        master_data_list.extend(new_or_readded_data)
-        #update the seen_domains set
-        seen_data.update(new_or_readded_data)
+    #evolutionary sorting logic
+    # An item joins the master list at the first version it appears in, sorted within
+    # that version by its total appearances (descending) then alphabetically, which
+    # keeps the staircase effect
+    grouped = df.assign(version_rank=df['version'].cat.codes).groupby('Data')
+    first_rank = grouped['version_rank'].min().to_dict()
+    data_appearances = grouped['version'].nunique().to_dict()
 
-    sorted_data = master_data_list
+    sorted_data = sorted(first_rank, key=lambda x: (first_rank[x], -data_appearances[x], x))
 
     # Reverse the highlight_config items
     highlight_config_items = list(highlight_config.items())[::-1]
+    compiled_highlights = [(re.compile(pattern, re.IGNORECASE), pattern, color) for pattern, color in highlight_config_items]
+
+    # Match every item against the patterns once; reused by the summaries and shapes
+    item_matches = {
+        item: [(pattern, color) for regex, pattern, color in compiled_highlights if regex.search(item)]
+        for item in df_count_pivot.index
+    }
+
+    # Counts and dates as arrays in plot order (rows: sorted_data, columns: sorted_versions)
+    count_arr = df_count_pivot.reindex(index=sorted_data, columns=sorted_versions, fill_value=0).to_numpy()
+    date_arr = df_date_pivot.reindex(index=sorted_data, columns=sorted_versions).to_numpy(dtype=object)
 
     #create the hover text matrix
-    hover_text = []
-    for item in sorted_data:
-        hover_text_row = []
-        for version in sorted_versions:
-            count = df_count_pivot.at[item, version] if version in df_count_pivot.columns else 0
-            date = df_date_pivot.at[item, version] if version in df_date_pivot.columns else ''
-            hover_text_data = f"Feature: {truncate_string(item, MAX_STRING_LENGTH)}<br>Version: {version}<br>Count: {count}<br>Date: {date}"
-            hover_text_row.append(hover_text_data)
-        hover_text.append(hover_text_row)
+    # items were already truncated to MAX_STRING_LENGTH above
+    hover_text = [
+        [f"Feature: {item}<br>Version: {version}<br>Count: {count}<br>Date: {date}"
+         for version, count, date in zip(sorted_versions, count_row, date_row)]
+        for item, count_row, date_row in zip(sorted_data, count_arr.tolist(), date_arr.tolist())
+    ]
 
     # Prepare text summary
     text_summary = "Feature Analysis Summary:\n"
@@ -420,10 +491,9 @@ def plot_data(all_data, package_name, highlight_config, data_type):
         highlighted = False
         highlight_details = ""
         # Check for regex matches and prepare highlighting
-        for pattern, color in highlight_config_items:
-            if re.search(pattern, item, re.IGNORECASE):
-                highlighted = True
-                highlight_details = f"Highlight: {pattern} (Colour: {color})\n"
+        for pattern, color in item_matches[item]:
+            highlighted = True
+            highlight_details = f"Highlight: {pattern} (Colour: {color})\n"
 
         text_summary += f"\nFeature: {item}\n"
         if highlighted:
@@ -441,7 +511,7 @@ def plot_data(all_data, package_name, highlight_config, data_type):
     text_summary = "Feature Analysis Summary by Version:\n"
     # Iterate through each version
     for version in sorted_versions:
-        date = df[df['version'] == version]['vtscandate'].min()  # Get date for version
+        date = earliest_dates[version]  # Get date for version
         text_summary += f"\nVersion {version} ({date if date != 'nan' else 'No Date Available'}):\n"
         # Check each subdomain for current version
         for item in df_count_pivot.index:
@@ -449,9 +519,8 @@ def plot_data(all_data, package_name, highlight_config, data_type):
             if count > 0:  # Only list subdomains with count > 0
                 text_summary += f" {item}   Count: {count}\n"
                 # Check for regex matches and add them
-                for pattern, color in highlight_config_items:
-                    if re.search(pattern, item, re.IGNORECASE):
-                        text_summary += f" MATCH: {pattern} (Colour: {color})\n"
+                for pattern, color in item_matches[item]:
+                    text_summary += f" MATCH: {pattern} (Colour: {color})\n"
 
     # Save condensed summary to text file
     with open(f"{package_name}_condensed_summary.txt", 'w', encoding='utf-8') as file:
@@ -461,7 +530,7 @@ def plot_data(all_data, package_name, highlight_config, data_type):
     feature_info = []
     for item in sorted_data:
         info = {
-            'feature': truncate_string(item, MAX_STRING_LENGTH),
+            'feature': item,
             'alienvault_link': f"https://otx.alienvault.com/indicator/domain/{item}",
             'whois_link': f"https://www.whois.com/whois/{item}"
         }
@@ -469,123 +538,79 @@ def plot_data(all_data, package_name, highlight_config, data_type):
 
     # Set threshold for max features to display
     MAX_FEATURES_TO_DISPLAY = 250
+    too_large_to_display = len(sorted_data) > MAX_FEATURES_TO_DISPLAY
 
-    if len(sorted_data) > MAX_FEATURES_TO_DISPLAY:
-        # Create figure without displaying it
-        fig = go.Figure(data=go.Heatmap(
-            showscale=False,
-            z=df_count_pivot.reindex(sorted_data).values,
-            x=sorted_versions,
-            y=sorted_data,
-            text=hover_text,
-            hoverinfo='text',
-            colorscale=[[0, 'white'], [0.01, 'grey'], [0.4, '#505050'], [1, 'black']],
-            zmin=0,
-            zmax=df_count_pivot.max().max(),
-            xgap=1,
-            ygap=1
-        ))
-
-        # Update layout
-        fig.update_layout(
-            title=f"{data_type.capitalize()} Presence and Frequency Across Versions, {package_name}",
-            xaxis=dict(tickmode='array', tickvals=sorted_versions, ticktext=sorted_versions_with_dates),
-            yaxis=dict(autorange="reversed")
-        )
-
+    fig = None
+    if build_figure or not too_large_to_display:
         # Add colour highlighting config, workaround for plotly
         shapes = []
         for data_idx, item in enumerate(sorted_data):
-            for version_idx, version in enumerate(sorted_versions):
-                count = df_count_pivot.loc[item, version]
-                if count > 0:
-                    for pattern, color in highlight_config_items:
-                        if re.search(pattern, item, re.IGNORECASE):
-                            shapes.append({
-                                'type': 'rect',
-                                'x0': version_idx - 0.5,
-                                'y0': data_idx - 0.5,
-                                'x1': version_idx + 0.5,
-                                'y1': data_idx + 0.5,
-                                'fillcolor': color,
-                                'opacity': 0.3,
-                                'line': {'width': 0},
-                            })
-                            break  # Stop after first match to avoid overlapping shapes
-
-        title_description = data_type.capitalize()
-
-        # Update x-axis labels
-        fig.update_layout(
-            shapes=shapes,
-            title=f"{title_description} Presence and Frequency Across Versions, {package_name}",
-            xaxis=dict(tickmode='array', tickvals=sorted_versions, ticktext=sorted_versions_with_dates),
-            yaxis=dict(autorange="reversed"))  # Reverse y-axis to show earliest versions at top
-        return {
-            'figure': fig,
-            'feature_info': feature_info,
-            'too_large_to_display': True,
-            'feature_count': len(sorted_data)
-        }
-    else:
-        # Create heatmap
-        fig = go.Figure(data=go.Heatmap(
-            showscale=False,
-            z=df_count_pivot.reindex(sorted_data).values,
-            x=sorted_versions,
-            y=sorted_data,
-            text=hover_text,
-            hoverinfo='text',
-            colorscale=[[0, 'white'], [0.01, 'grey'], [0.4, '#505050'], [1, 'black']],
-            zmin=0,
-            zmax=df_count_pivot.max().max(),
-            xgap=1,
-            ygap=1
-        ))
-
-        # Add colour highlighting config, workaround for plotly
-        shapes = []
-        for data_idx, item in enumerate(sorted_data):
-            for version_idx, version in enumerate(sorted_versions):
-                count = df_count_pivot.loc[item, version]
-                if count > 0:
-                    for pattern, color in highlight_config_items:
-                        if re.search(pattern, item, re.IGNORECASE):
-                            shapes.append({
-                                'type': 'rect',
-                                'x0': version_idx - 0.5,
-                                'y0': data_idx - 0.5,
-                                'x1': version_idx + 0.5,
-                                'y1': data_idx + 0.5,
-                                'fillcolor': color,
-                                'opacity': 0.3,
-                                'line': {'width': 0},
-                            })
-                            break  # Stop after first match to avoid overlapping shapes
-
-        title_description = data_type.capitalize()
-
-        # Update x-axis labels
-        fig.update_layout(
-            shapes=shapes,
-            title=f"{title_description} Presence and Frequency Across Versions, {package_name}",
-            xaxis=dict(tickmode='array', tickvals=sorted_versions, ticktext=sorted_versions_with_dates),
-            yaxis=dict(autorange="reversed")  # Reverse y-axis to show earliest versions at top
-        )
-
-        return {
-            'figure': fig,
-            'feature_info': feature_info,
-            'too_large_to_display': False,
-            'feature_count': len(sorted_data)
-        }
+            # First match only, to avoid overlapping shapes
+            matches = item_matches[item]
+            if not matches:
+                continue
+            color = matches[0][1]
+            # One rect per run of consecutive versions where the item is present
+            for start, end in _find_runs(count_arr[data_idx] > 0):
+                shapes.append({
+                    'type': 'rect',
+                    'x0': start - 0.5,
+                    'y0': data_idx - 0.5,
+                    'x1': end - 0.5,
+                    'y1': data_idx + 0.5,
+                    'fillcolor': color,
+                    'opacity': 0.3,
+                    'line': {'width': 0},
+                })
+
+        title = f"{data_type.capitalize()} Presence and Frequency Across Versions, {package_name}"
+        fig = _build_heatmap(df_count_pivot.reindex(sorted_data).values, sorted_data, sorted_versions,
+                             sorted_versions_with_dates, hover_text, shapes, title, df_count_pivot.max().max())
+
+    return {
+        'figure': fig,
+        'feature_info': feature_info,
+        'too_large_to_display': too_large_to_display,
+        'feature_count': len(sorted_data)
+    }
+
+def _find_runs(mask):
+    """Return (start, end) index pairs, end exclusive, for each run of True values in mask"""
+    edges = np.diff(np.concatenate(([0], np.asarray(mask, dtype=np.int8), [0])))
+    return zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist())
+
+def _build_heatmap(z, sorted_data, sorted_versions, version_labels, hover_text, shapes, title, zmax):
+    """Build the feature x version heatmap with highlight shapes"""
+    fig = go.Figure(data=go.Heatmap(
+        showscale=False,
+        z=z,
+        x=sorted_versions,
+        y=sorted_data,
+        text=hover_text,
+        hoverinfo='text',
+        colorscale=[[0, 'white'], [0.01, 'grey'], [0.4, '#505050'], [1, 'black']],
+        zmin=0,
+        zmax=zmax,
+        xgap=1,
+        ygap=1
+    ))
+
+    # Update x-axis labels
+    fig.update_layout(
+        shapes=shapes,
+        title=title,
+        xaxis=dict(tickmode='array', tickvals=sorted_versions, ticktext=version_labels),
+        yaxis=dict(autorange="reversed")  # Reverse y-axis to show earliest versions at top
+    )
+    return fig
 
 def generate_download_link(fig, package_name, data_type):
     # Unique filename
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{package_name}_{data_type}_{timestamp}.html"
     
-    # Convert figure to HTML
+    # Convert figure to HTML (plotly.io is only needed here)
+    import plotly.io as pio
     plot_html = pio.to_html(fig, full_html=False)
     
     # Encode HTML content
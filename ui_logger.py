@@ -12,32 +12,79 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import logging
-from io import StringIO
+from collections import OrderedDict, deque
+from contextvars import ContextVar, copy_context
+from functools import wraps
 import uuid
 import threading
 
+# Session, and the run registered for it, that the current context is working for.
+# Executor workers inherit both when submitted through contextvars.copy_context().run;
+# pipelines set them inside a session_scoped call so they don't outlive the run
+SESSION_ID = ContextVar('session_id')
+_CURRENT_RUN = ContextVar('current_run', default=None)
+
+# Maximum number of log lines kept per session
+MAX_LOG_LINES = 5000
+
+class DequeHandler(logging.Handler):
+    """Logging handler that keeps the most recent formatted records in a bounded buffer"""
+    def __init__(self, maxlen=MAX_LOG_LINES):
+        super().__init__()
+        self.buffer = deque(maxlen=maxlen)
+        # Number of records ever emitted, used as a cursor for delta reads
+        self.total = 0
+    
+    def emit(self, record):
+        try:
+            line = self.format(record)
+            with self.lock:
+                self.buffer.append(line)
+                self.total += 1
+        except Exception:
+            self.handleError(record)
+    
+    def getvalue(self):
+        """Return the buffered log as a single string"""
+        return "\n".join(self.buffer) + "\n" if self.buffer else ""
+    
+    def get_since(self, cursor):
+        """Return (text, cursor, reset) for records after cursor; reset means text is the whole buffer"""
+        with self.lock:
+            lines = list(self.buffer)
+            total = self.total
+        first = total - len(lines)
+        if cursor is None or cursor < first or cursor > total:
+            new_lines, reset = lines, True
+        else:
+            new_lines, reset = lines[cursor - first:], False
+        text = "\n".join(new_lines) + "\n" if new_lines else ""
+        return text, total, reset
+
 class UILogger:
-    # Class variable to store loggers for different sessions
-    _loggers = {}
+    # Class variable to store loggers for different sessions, least recently used first
+    _loggers = OrderedDict()
     
     @classmethod
-    def get_logger(cls, session_id):
-        """Get or create a logger for a specific session"""
-        if session_id not in cls._loggers:
+    def get_logger(cls, session_id=None):
+        """Get or create a logger for a specific session, defaulting to the current context's"""
+        if session_id is None:
+            session_id = SESSION_ID.get('default')
+        if session_id in cls._loggers:
+            cls._loggers.move_to_end(session_id)
+        else:
             cls._loggers[session_id] = cls._create_new_logger()
             
-            # Clean up old sessions (keep only the most recent 100)
-            if len(cls._loggers) > 100:
-                oldest_session = list(cls._loggers.keys())[0]
-                del cls._loggers[oldest_session]
+            # Clean up old sessions (keep only the most recently used 100)
+            while len(cls._loggers) > 100:
+                cls._loggers.popitem(last=False)
                 
         return cls._loggers[session_id]
     
     @classmethod
     def _create_new_logger(cls):
         """Create a new logger instance"""
-        log_capture = StringIO()
-        ch = logging.StreamHandler(log_capture)
+        ch = DequeHandler()
         ch.setLevel(logging.INFO)
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         ch.setFormatter(formatter)
@@ -48,7 +95,7 @@ class UILogger:
         
         return {
             'logger': new_logger,
-            'capture': log_capture
+            'capture': ch
         }
     
     @classmethod
@@ -59,19 +106,35 @@ class UILogger:
         elif session_id is None and hasattr(cls, 'default_capture'):
             return cls.default_capture.getvalue()
         return "No logs available for this session."
+    
+    @classmethod
+    def get_logs_since(cls, session_id, cursor):
+        """Get (new_text, new_cursor, reset) for a session's logs after cursor"""
+        if session_id in cls._loggers:
+            return cls._loggers[session_id]['capture'].get_since(cursor)
+        return "No logs available for this session.", None, True
 
 ui_logger = UILogger()
-ui_logger.default_capture = StringIO()
 ui_logger.logger = logging.getLogger('UILogger-Default')
-handler = logging.StreamHandler(ui_logger.default_capture)
+handler = DequeHandler()
 handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 ui_logger.logger.addHandler(handler)
+ui_logger.default_capture = handler
 
 _process_registry = {}
 
+def session_scoped(func):
+    """Run func in a copy of the current context, so the session it registers is discarded on return"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return copy_context().run(func, *args, **kwargs)
+    return wrapper
+
 def register_process(session_id, process):
-    """Register a process for a specific session"""
+    """Register a process for a specific session and bind both to the current context"""
     _process_registry[session_id] = process
+    SESSION_ID.set(session_id)
+    _CURRENT_RUN.set(process)
 
 def get_process(session_id):
     """Get the process for a specific session"""
@@ -79,15 +142,20 @@ def get_process(session_id):
 
 def should_cancel(session_id=None):
     """Check if the current process should be cancelled"""
-    # If no session ID provided, nothing to cancel
+    # Fall back to the session bound to this context
+    if session_id is None:
+        session_id = SESSION_ID.get(None)
+    
+    # If there is no session, nothing to cancel
     if session_id is None:
         return False
     
     # Get the registered thread for this session
     registered_thread = _process_registry.get(session_id)
     
-    # The current thread that's executing this code
-    current_thread = threading.current_thread()
+    # The run this context belongs to; workers started with copy_context() inherit it,
+    # otherwise it is the thread that's executing this code
+    current_thread = _CURRENT_RUN.get() or threading.current_thread()
     
     # If no thread is registered, don't cancel - this prevents false cancellations during initialisation
     if registered_thread is None:
@@ -99,7 +167,7 @@ def should_cancel(session_id=None):
             )
         return False
     
-    # Check if the current thread is the registered thread
+    # Check if the current run is the registered one
     result = registered_thread != current_thread
     
     # Log the comparison if we're cancelling
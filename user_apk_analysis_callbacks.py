@@ -16,40 +16,57 @@ from dash import dcc, html, callback_context
 from dash.dependencies import Input, Output, State, ALL, MATCH
 from app import app
 
+# process_uploaded_apks is defined below; only the helpers come from the logic module
 from logic.user_apk_analysis_logic import (
-    process_uploaded_apks,
     generate_download_link,
     extract_apk_features,
     plot_data,
-    save_uploaded_file_to_server
+    save_uploaded_file_to_server,
+    write_base64_content,
+    save_upload_chunk,
+    assemble_uploaded_chunks,
+    remove_stale_upload_chunks,
+    UPLOAD_CHUNK_SIZE
 )
 from dash.exceptions import PreventUpdate
-
-from dash import dcc, html, callback_context
-from dash.dependencies import Input, Output, State, ALL, MATCH
-from dash.exceptions import PreventUpdate
-import dash
-from app import app
-from logic.user_apk_analysis_logic import process_uploaded_apks, generate_download_link, extract_apk_features
 import logging
+import hashlib
 import json
-import re
-from layouts.user_apk_analysis_layout import preset_configs
 import dash_bootstrap_components as dbc
-from androguard.core.bytecodes.apk import APK
-import base64
+from layouts.user_apk_analysis_layout import MAX_CORES
+from utils.apk_analysis_core import apk_digest, read_apk_id
 import os
 import uuid
 from utils.ui_logger import UILogger
+import atexit
+import multiprocessing
+import flask
+from flask_login import current_user
+import time
+import queue
+import threading
 import datetime
+from functools import lru_cache
+import pandas as pd
 import tldextract
+from concurrent.futures import ProcessPoolExecutor
 
 # Concurrency controls
-from utils.concurrency_manager import active_sessions, MAX_CONCURRENT_USERS, register_session, remove_session, has_capacity
+from utils.concurrency_manager import active_sessions, MAX_CONCURRENT_USERS, register_session, remove_session, has_capacity, get_active_count
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# One offline extractor (bundled suffix list snapshot) reused for every URL
+_TLD = tldextract.TLDExtract(cache_dir=os.path.join('cache', 'tldextract'), suffix_list_urls=())
+
+@lru_cache(maxsize=65536)
+def _split_host(url):
+    """(domain, subdomain) strings for a URL; versions of one app mostly share URLs"""
+    parsed = _TLD(url)
+    return ('.'.join(filter(None, [parsed.domain, parsed.suffix])),
+            '.'.join(filter(None, [parsed.subdomain, parsed.domain, parsed.suffix])))
+
 @app.callback(
     Output('user-apk-upload-output', 'children'),
     Input('user-apk-upload', 'contents'),
@@ -65,6 +82,17 @@ def update_output(list_of_contents, list_of_names):
         return children
     return []
 
+# Outputs of recent successful runs, keyed by a hash of the inputs
+_results_cache = {}
+_results_cache_lock = threading.Lock()
+MAX_RESULTS_CACHE_SIZE = 8
+
+def _inputs_signature(stored_data, highlight_config, num_cores, parser_selection, sort_order):
+    """Hash of everything that determines the analysis output"""
+    payload = json.dumps([stored_data, highlight_config, num_cores, parser_selection, sort_order],
+                         sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode()).hexdigest()
+
 @app.callback(
     [Output("user-apk-results", "children"),
      Output("user-apk-error-message", "children"),
@@ -91,6 +119,15 @@ def process_apks_callback(n_clicks, stored_data, highlight_config, num_cores, pa
     # Unique session ID for this request
     session_id = str(uuid.uuid4())
     
+    # Identical inputs to a recent run: reuse its output
+    signature = _inputs_signature(stored_data, highlight_config, num_cores, parser_selection, sort_order)
+    with _results_cache_lock:
+        cached = _results_cache.get(signature)
+    if cached is not None:
+        UILogger.get_logger(session_id)['logger'].info("Inputs unchanged since the last analysis, reusing its results")
+        output_results, feature_info_store = cached
+        return output_results, "", {"display": "none"}, False, False, None, feature_info_store, session_id, "Analysis complete!", "success", {"display": "none"}
+    
     try:
         # Session logger
         logger_data = UILogger.get_logger(session_id)
@@ -189,6 +226,11 @@ def process_apks_callback(n_clicks, stored_data, highlight_config, num_cores, pa
         remove_session(session_id)
         logger.info(f"Removed session {session_id}. Current active sessions: {len(active_sessions)}")
         
+        with _results_cache_lock:
+            if len(_results_cache) >= MAX_RESULTS_CACHE_SIZE:
+                _results_cache.pop(next(iter(_results_cache)), None)
+            _results_cache[signature] = (output_results, feature_info_store)
+        
         return output_results, "", {"display": "none"}, False, False, None, feature_info_store, session_id, status_message, status_color, spinner_style
     except Exception as e:
         error_message = f"An error occurred: {str(e)}"
@@ -205,17 +247,119 @@ def process_apks_callback(n_clicks, stored_data, highlight_config, num_cores, pa
         
         return [], error_message, {"display": "block"}, True, False, None, {}, session_id, status_message, status_color, spinner_style
 
+# Seconds between log checks in the progress stream, how long a finished session's stream stays
+# open, and the longest any stream may hold a server thread before the browser falls back to polling
+SSE_POLL_INTERVAL = 0.5
+SSE_IDLE_TIMEOUT = 30
+SSE_MAX_DURATION = 10 * 60
+
+@app.server.route('/stream/progress/<session_id>')
+def stream_progress(session_id):
+    """Server-sent events carrying a session's new log lines as they are written"""
+    if not current_user.is_authenticated:
+        flask.abort(401)
+    
+    def events():
+        cursor = None
+        idle_since = time.time()
+        deadline = idle_since + SSE_MAX_DURATION
+        while True:
+            if time.time() > deadline:
+                yield "event: expired\ndata: {}\n\n"
+                return
+            text, new_cursor, reset = UILogger.get_logs_since(session_id, cursor)
+            if new_cursor is not None and (text or reset):
+                cursor = new_cursor
+                idle_since = time.time()
+                yield f"data: {json.dumps({'text': text, 'reset': reset})}\n\n"
+            elif session_id not in active_sessions and time.time() - idle_since > SSE_IDLE_TIMEOUT:
+                yield "event: done\ndata: {}\n\n"
+                return
+            time.sleep(SSE_POLL_INTERVAL)
+    
+    return flask.Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+# Open the progress stream for a new session. Deltas go through the log-delta store, so Dash
+# still owns the log element, and the cursor store is flagged so polling stays quiet meanwhile
+app.clientside_callback(
+    """
+    function(sessionId) {
+        if (window.userApkProgressSource) {
+            window.userApkProgressSource.close();
+            window.userApkProgressSource = null;
+        }
+        if (!sessionId || !window.EventSource || !window.dash_clientside.set_props) {
+            return window.dash_clientside.no_update;
+        }
+        var source = new EventSource('/stream/progress/' + encodeURIComponent(sessionId));
+        window.userApkProgressSource = source;
+        var seq = 0;
+        source.onmessage = function(event) {
+            var delta = JSON.parse(event.data);
+            // A sequence number makes consecutive identical deltas distinct store updates
+            delta.seq = ++seq;
+            window.dash_clientside.set_props('user-apk-log-delta', {data: delta});
+        };
+        function stop(fallBack) {
+            source.close();
+            if (fallBack) {
+                window.dash_clientside.set_props('user-apk-log-cursor', {data: null});
+            }
+        }
+        source.addEventListener('done', function() { stop(false); });
+        source.addEventListener('expired', function() { stop(true); });
+        source.onerror = function() { stop(true); };
+        return {session: sessionId, streaming: true};
+    }
+    """,
+    Output('user-apk-log-cursor', 'data', allow_duplicate=True),
+    Input('user-apk-session-id-store', 'data'),
+    prevent_initial_call=True
+)
+
 @app.callback(
-    Output('user-apk-progress', 'children'),
+    [Output('user-apk-log-delta', 'data'),
+     Output('user-apk-log-cursor', 'data')],
     [Input('user-apk-progress-interval', 'n_intervals')],
-    [State('user-apk-session-id-store', 'data')]
+    [State('user-apk-session-id-store', 'data'),
+     State('user-apk-log-cursor', 'data')]
 )
-def update_progress(n, session_id):
-    if session_id:
-        return UILogger.get_logs(session_id)
-    else:
+def update_progress(n, session_id, log_cursor):
+    # The progress stream is delivering this session's log
+    if session_id and log_cursor and log_cursor.get('streaming') and log_cursor.get('session') == session_id:
+        raise PreventUpdate
+    
+    if not session_id:
         # Show placeholder when no session is active
-        return html.Div("No active session. Upload and analyse APKs to see progress.")
+        if log_cursor == {'session': None}:
+            raise PreventUpdate
+        return ({'text': "No active session. Upload and analyse APKs to see progress.", 'reset': True},
+                {'session': None})
+    
+    # Only send lines the browser hasn't seen; a new session starts from scratch
+    cursor = log_cursor.get('cursor') if log_cursor and log_cursor.get('session') == session_id else None
+    text, new_cursor, reset = UILogger.get_logs_since(session_id, cursor)
+    if not text and not reset:
+        raise PreventUpdate
+    return {'text': text, 'reset': reset}, {'session': session_id, 'cursor': new_cursor}
+
+# Append new log lines in the browser instead of resending the whole log
+app.clientside_callback(
+    """
+    function(delta, current) {
+        if (!delta) {
+            return window.dash_clientside.no_update;
+        }
+        if (delta.reset || typeof current !== 'string') {
+            return delta.text;
+        }
+        return current + delta.text;
+    }
+    """,
+    Output('user-apk-progress', 'children'),
+    Input('user-apk-log-delta', 'data'),
+    State('user-apk-progress', 'children')
+)
 
 @app.callback(
     Output({'type': 'user-apk-feature-info', 'index': MATCH}, 'children'),
@@ -234,16 +378,94 @@ def update_feature_info(selected_index, feature_info_store, dropdown_id):
     return html.Div([
         html.P(f"Feature: {feature}"),
         html.Div([
-            html.A("Open URL", href=f"https://{feature}", target="_blank", className="me-2"),
+            html.A("Open URL", href=info['open_url'], target="_blank", className="me-2"),
             html.A("AlienVault", href=info['alienvault_link'], target="_blank", className="me-2"),
             html.A("WHOIS", href=info['whois_link'], target="_blank", className="me-2"),
-            html.A("VirusTotal", href=f"https://www.virustotal.com/gui/domain/{feature}", target="_blank", className="me-2"),
-            html.A("Shodan", href=f"https://www.shodan.io/search?query={feature}", target="_blank", className="me-2"),
-            html.A("URLScan", href=f"https://urlscan.io/search/#{feature}", target="_blank", className="me-2"),
+            html.A("VirusTotal", href=info['virustotal_link'], target="_blank", className="me-2"),
+            html.A("Shodan", href=info['shodan_link'], target="_blank", className="me-2"),
+            html.A("URLScan", href=info['urlscan_link'], target="_blank", className="me-2"),
         ])
     ])
 
-@app.callback(
+# Highlight management runs entirely in the browser: the presets come from
+# user-apk-preset-configs-store, and colours/patterns are validated in JS
+app.clientside_callback(
+    """
+    function(selectedPresets, addClicks, removeClicks, customPattern, customColor, storedConfig, presetConfigs) {
+        var noUpdate = window.dash_clientside.no_update;
+        var triggered = window.dash_clientside.callback_context.triggered;
+        if (!triggered || !triggered.length) {
+            return [noUpdate, noUpdate, noUpdate];
+        }
+        var propId = triggered[0].prop_id;
+        var triggeredId = propId.slice(0, propId.lastIndexOf('.'));
+        var config = (storedConfig || []).slice();
+        var presets = selectedPresets;
+
+        function isValidColor(color) {
+            var names = ['red', 'blue', 'green', 'yellow', 'purple', 'orange', 'black', 'white'];
+            return /^#(?:[0-9a-fA-F]{3}){1,2}$/.test(color) || names.indexOf(color.toLowerCase()) !== -1;
+        }
+        function isValidPattern(pattern) {
+            // Python named groups (?P<name>...) are (?<name>...) in JS
+            try {
+                new RegExp(pattern.replace(/\\(\\?P</g, '(?<'), 'i');
+                return true;
+            } catch (e) {
+                return false;
+            }
+        }
+
+        if (triggeredId === 'user-apk-highlight-dropdown') {
+            // Add new selected presets
+            var names = config.map(function(item) { return item.name; });
+            (selectedPresets || []).forEach(function(preset) {
+                if (names.indexOf(preset) === -1) {
+                    config.push({name: preset, regex: presetConfigs[preset].regex, color: presetConfigs[preset].color});
+                }
+            });
+        } else if (triggeredId === 'user-apk-add-highlight') {
+            if (!(customPattern && customColor && isValidColor(customColor) && isValidPattern(customPattern))) {
+                return [noUpdate, noUpdate, noUpdate];
+            }
+            config.push({name: 'Custom: ' + customPattern, regex: customPattern, color: customColor});
+        } else if (triggeredId.indexOf('user-apk-remove-highlight') !== -1) {
+            // Remove buttons fire with no clicks when the list is re-rendered
+            if (!(removeClicks || []).some(Boolean)) {
+                return [noUpdate, noUpdate, noUpdate];
+            }
+            var removeIndex = JSON.parse(triggeredId).index;
+            if (removeIndex >= 0 && removeIndex < config.length) {
+                var removed = config.splice(removeIndex, 1)[0];
+                if (removed.name.indexOf('Custom:') !== 0) {
+                    presets = (selectedPresets || []).filter(function(preset) { return preset !== removed.name; });
+                }
+            }
+        }
+
+        function component(type, props) {
+            return {namespace: 'dash_html_components', type: type, props: props};
+        }
+        var highlightList = config.map(function(item, i) {
+            var regex = item.regex.length > 30 ? item.regex.slice(0, 30) + '...' : item.regex;
+            return component('Div', {
+                style: {marginBottom: '5px'},
+                children: [
+                    component('Span', {children: item.name + ': ', style: {fontWeight: 'bold'}}),
+                    component('Span', {children: regex}),
+                    component('Span', {children: ' (' + item.color + ')', style: {color: item.color}}),
+                    component('Button', {
+                        children: '\u00d7',
+                        id: {type: 'user-apk-remove-highlight', index: i},
+                        n_clicks: 0,
+                        style: {marginLeft: '10px'}
+                    })
+                ]
+            });
+        });
+        return [highlightList, config, presets];
+    }
+    """,
     [Output("user-apk-highlight-list", "children"),
      Output("user-apk-highlight-config-store", "data"),
      Output("user-apk-highlight-dropdown", "value")],
@@ -252,127 +474,200 @@ def update_feature_info(selected_index, feature_info_store, dropdown_id):
      Input({"type": "user-apk-remove-highlight", "index": ALL}, "n_clicks")],
     [State("user-apk-highlight-pattern", "value"),
      State("user-apk-highlight-color", "value"),
-     State("user-apk-highlight-config-store", "data")],
+     State("user-apk-highlight-config-store", "data"),
+     State("user-apk-preset-configs-store", "data")],
     prevent_initial_call=True
 )
-def update_highlight_config(selected_presets, add_clicks, remove_clicks, custom_pattern, custom_color, stored_config):
-    ctx = dash.callback_context
-    triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
-
-    if stored_config is None:
-        stored_config = []
-
-    if triggered_id == "user-apk-highlight-dropdown":
-        # Add new selected presets
-        for preset in selected_presets or []:
-            if preset not in [item['name'] for item in stored_config]:
-                stored_config.append({
-                    "name": preset,
-                    "regex": preset_configs[preset]["regex"],
-                    "color": preset_configs[preset]["color"]
-                })
 
-    elif triggered_id == "user-apk-add-highlight":
-        if custom_pattern and custom_color and is_valid_color(custom_color):
-            stored_config.append({
-                "name": f"Custom: {custom_pattern}",
-                "regex": custom_pattern,
-                "color": custom_color
-            })
-
-    elif "user-apk-remove-highlight" in triggered_id:
-        remove_index = json.loads(triggered_id)['index']
-        if 0 <= remove_index < len(stored_config):
-            removed_item = stored_config.pop(remove_index)
-            if not removed_item['name'].startswith("Custom:"):
-                selected_presets = [preset for preset in (selected_presets or []) if preset != removed_item['name']]
-
-    highlight_list = create_highlight_list(stored_config)
-    return highlight_list, stored_config, selected_presets
-
-def create_highlight_list(highlight_config):
-    return [
-        html.Div([
-            html.Span(f"{item['name']}: ", style={"fontWeight": "bold"}),
-            html.Span(f"{item['regex'][:30]}..." if len(item['regex']) > 30 else item['regex']),
-            html.Span(f" ({item['color']})", style={"color": item['color']}),
-            html.Button("×", id={"type": "user-apk-remove-highlight", "index": i}, n_clicks=0, style={"marginLeft": "10px"}),
-        ], style={"marginBottom": "5px"})
-        for i, item in enumerate(highlight_config)
-    ]
-
-def is_valid_color(color):
-    if re.match(r'^#(?:[0-9a-fA-F]{3}){1,2}$', color):
-        return True
-    valid_color_names = ['red', 'blue', 'green', 'yellow', 'purple', 'orange', 'black', 'white']
-    return color.lower() in valid_color_names
-
-# Callbacks for each data type
-for data_type in ['urls', 'domains', 'subdomains']:
-    @app.callback(
-        Output(f'user-apk-feature-info-{data_type}', 'children'),
-        [Input(f'user-apk-feature-dropdown-{data_type}', 'value')],
-        [State(f'user-apk-feature-info-store-{data_type}', 'data')]
-    )
-    def update_feature_info(selected_index, feature_info, data_type=data_type):
-        if selected_index is None or not feature_info:
-            return html.Div("No feature selected")
-        
-        info = feature_info[selected_index]
-        feature = info['feature']
-        
-        return html.Div([
-            html.P(f"Feature: {feature}"),
-            html.Div([
-                #html.A("Open URL", href=f"https://{feature}", target="_blank", className="me-2"),
-                html.A("AlienVault", href=info['alienvault_link'], target="_blank", className="me-2"),
-                html.A("WHOIS", href=info['whois_link'], target="_blank", className="me-2"),
-                html.A("VirusTotal", href=f"https://www.virustotal.com/gui/domain/{feature}", target="_blank", className="me-2"),
-                html.A("Shodan", href=f"https://www.shodan.io/search?query={feature}", target="_blank", className="me-2"),
-                html.A("URLScan", href=f"https://urlscan.io/search/#{feature}", target="_blank", className="me-2"),
-            ])
-        ])
+# Removed uploads are deleted by a background thread so the callback doesn't wait on disk
+_delete_queue = queue.Queue()
+
+# How often the cleanup thread sweeps abandoned chunked uploads, in seconds
+UPLOAD_CHUNK_SWEEP_INTERVAL = 10 * 60
+
+def _cleanup_worker():
+    """Delete queued upload files, and periodically remove abandoned chunked uploads"""
+    next_sweep = time.monotonic()
+    while True:
+        if time.monotonic() >= next_sweep:
+            remove_stale_upload_chunks()
+            next_sweep = time.monotonic() + UPLOAD_CHUNK_SWEEP_INTERVAL
+        try:
+            path = _delete_queue.get(timeout=UPLOAD_CHUNK_SWEEP_INTERVAL)
+        except queue.Empty:
+            continue
+        try:
+            os.remove(path)
+        except Exception as e:
+            logger.error(f"Error removing file {path}: {str(e)}")
+        finally:
+            _delete_queue.task_done()
+
+threading.Thread(target=_cleanup_worker, name='upload-cleanup', daemon=True).start()
+
+# Worker processes for upload header parsing, created on first upload
+_apk_pool = None
+
+_apk_pool_lock = threading.Lock()
+
+def _get_apk_pool():
+    """Return the shared upload parsing pool"""
+    global _apk_pool
+    with _apk_pool_lock:
+        if _apk_pool is None:
+            # Spawn rather than fork: this process runs server and cleanup threads
+            _apk_pool = ProcessPoolExecutor(max_workers=MAX_CORES, mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(_apk_pool.shutdown)
+    return _apk_pool
+
+# Chunked uploads: the browser POSTs raw slices of each file, then asks for reassembly
+@app.server.route('/upload_chunk/<upload_id>/<int:seq>', methods=['POST'])
+def upload_chunk(upload_id, seq):
+    """Store one slice of a chunked APK upload"""
+    if not current_user.is_authenticated:
+        flask.abort(401)
+    if (flask.request.content_length or 0) > UPLOAD_CHUNK_SIZE:
+        flask.abort(413)
+    try:
+        save_upload_chunk(upload_id, seq, flask.request.stream)
+    except ValueError:
+        flask.abort(400)
+    return flask.jsonify({'ok': True})
+
+@app.server.route('/upload_complete/<upload_id>', methods=['POST'])
+def upload_complete(upload_id):
+    """Reassemble a chunked APK upload and return its server path"""
+    if not current_user.is_authenticated:
+        flask.abort(401)
+    payload = flask.request.get_json(force=True)
+    try:
+        server_path = assemble_uploaded_chunks(upload_id, payload['filename'], payload['chunks'])
+    except (ValueError, TypeError, KeyError, OSError) as e:
+        logger.error(f"Error reassembling upload {upload_id}: {str(e)}")
+        flask.abort(400)
+    return flask.jsonify({'filename': payload['filename'], 'server_path': server_path})
+
+# Pick files, slice them into 5 MB chunks and upload up to four chunks at a time; only the
+# resulting (filename, server_path) pairs go through Dash
+app.clientside_callback(
+    """
+    async function(nClicks) {
+        if (!nClicks) {
+            return window.dash_clientside.no_update;
+        }
+        var files = await new Promise(function(resolve) {
+            var input = document.createElement('input');
+            input.type = 'file';
+            input.multiple = true;
+            input.accept = '.apk';
+            input.onchange = function() { resolve(Array.from(input.files)); };
+            input.click();
+        });
+        if (!files.length) {
+            return window.dash_clientside.no_update;
+        }
+        // Must match UPLOAD_CHUNK_SIZE on the server
+        var CHUNK_SIZE = 5 * 1024 * 1024;
+        var CONCURRENCY = 4;
+        var uploaded = [];
+        for (var f = 0; f < files.length; f++) {
+            var file = files[f];
+            var uploadId = Date.now().toString(16) + Math.random().toString(16).slice(2);
+            var count = Math.max(1, Math.ceil(file.size / CHUNK_SIZE));
+            var next = 0;
+            var sendChunks = async function() {
+                while (next < count) {
+                    var seq = next++;
+                    var response = await fetch('/upload_chunk/' + uploadId + '/' + seq, {
+                        method: 'POST',
+                        body: file.slice(seq * CHUNK_SIZE, (seq + 1) * CHUNK_SIZE)
+                    });
+                    if (!response.ok) {
+                        throw new Error('Upload of ' + file.name + ' failed');
+                    }
+                }
+            };
+            var workers = [];
+            for (var w = 0; w < Math.min(CONCURRENCY, count); w++) {
+                workers.push(sendChunks());
+            }
+            await Promise.all(workers);
+            var done = await fetch('/upload_complete/' + uploadId, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({filename: file.name, chunks: count})
+            });
+            if (done.ok) {
+                uploaded.push(await done.json());
+            }
+        }
+        return uploaded;
+    }
+    """,
+    Output('user-apk-chunked-upload-store', 'data'),
+    Input('user-apk-chunked-upload-button', 'n_clicks'),
+    prevent_initial_call=True
+)
 
 @app.callback(
     [Output('user-apk-upload-store', 'data'),
      Output('user-apk-upload-list', 'children')],
     [Input('user-apk-upload', 'contents'),
      Input('user-apk-upload', 'filename'),
+     Input('user-apk-chunked-upload-store', 'data'),
      Input({'type': 'move-up', 'index': ALL}, 'n_clicks'),
      Input({'type': 'move-down', 'index': ALL}, 'n_clicks'),
      Input({'type': 'remove-apk', 'index': ALL}, 'n_clicks')],
     [State('user-apk-upload-store', 'data')]
 )
-def manage_uploaded_files(contents, filenames, move_up_clicks, move_down_clicks, remove_clicks, stored_data):
+def manage_uploaded_files(contents, filenames, chunked_uploads, move_up_clicks, move_down_clicks, remove_clicks, stored_data):
     ctx = callback_context
     if not ctx.triggered:
         raise PreventUpdate
     
     trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
 
-    if trigger_id == 'user-apk-upload':
+    if trigger_id in ('user-apk-upload', 'user-apk-chunked-upload-store'):
         # Handle new file uploads
         stored_data = stored_data or []
-        for content, filename in zip(contents or [], filenames or []):
-            if content and filename:
-                try:
-                    # Save file to server and get path
-                    server_path = save_uploaded_file_to_server(content, filename)
-                    
-                    # Extract APK info
-                    apk = APK(server_path)
-                    stored_data.append({
-                        'filename': filename,
-                        'package_name': apk.get_package(),
-                        'version_code': apk.get_androidversion_code(),
-                        'server_path': server_path
-                    })
-                except Exception as e:
-                    logger.error(f"Error processing APK {filename}: {str(e)}")
+        saved = []
+        if trigger_id == 'user-apk-chunked-upload-store':
+            # Already reassembled on the server by /upload_complete
+            saved = [(item['filename'], item['server_path']) for item in chunked_uploads or []]
+        else:
+            for content, filename in zip(contents or [], filenames or []):
+                if content and filename:
+                    try:
+                        # Save file to server and get path
+                        saved.append((filename, save_uploaded_file_to_server(content, filename)))
+                    except Exception as e:
+                        logger.error(f"Error processing APK {filename}: {str(e)}")
+        
+        # Extract APK info from the manifests in parallel, off the callback thread
+        paths = [server_path for _, server_path in saved]
+        futures = [_get_apk_pool().submit(read_apk_id, path) for path in paths] if len(paths) > 1 else []
+        for i, (filename, server_path) in enumerate(saved):
+            try:
+                package_name, version_code, sha256 = futures[i].result() if futures else read_apk_id(server_path)
+                # The same APK uploaded again (possibly renamed) would only be analysed twice
+                if any(existing.get('sha256') == sha256 for existing in stored_data):
+                    logger.info(f"Skipping {filename}: already uploaded")
+                    _delete_queue.put(server_path)
+                    continue
+                stored_data.append({
+                    'filename': filename,
+                    'package_name': package_name,
+                    'version_code': version_code,
+                    'server_path': server_path,
+                    'sha256': sha256
+                })
+            except Exception as e:
+                logger.error(f"Error processing APK {filename}: {str(e)}")
 
     else:
         # Handle move/remove actions
-        action, index = json.loads(trigger_id)['type'], json.loads(trigger_id)['index']
+        parsed_id = json.loads(trigger_id)
+        action, index = parsed_id['type'], parsed_id['index']
 
         if action == 'move-up' and index > 0:
             stored_data[index], stored_data[index-1] = stored_data[index-1], stored_data[index]
@@ -381,40 +676,63 @@ def manage_uploaded_files(contents, filenames, move_up_clicks, move_down_clicks,
         elif action == 'remove-apk':
             # Remove file from server when removing from list
             file_to_remove = stored_data.pop(index)
-            try:
-                os.remove(file_to_remove['server_path'])
-            except Exception as e:
-                logger.error(f"Error removing file {file_to_remove['filename']}: {str(e)}")
+            _delete_queue.put(file_to_remove['server_path'])
 
     upload_list = create_upload_list(stored_data)
     return stored_data, upload_list
 
 def create_upload_list(stored_data):
+    return _render_upload_list(tuple((item['filename'], item['package_name'], item['version_code']) for item in stored_data))
+
+@lru_cache(maxsize=32)
+def _render_upload_list(items):
+    """Upload list, cached by (filename, package, version code) tuples"""
     return html.Div([
         dbc.ListGroup([
-            dbc.ListGroupItem([
-                dbc.Row([
-                    dbc.Col([
-                        html.H5(truncate_string(item['filename'], 30), className='mb-1', title=item['filename']),
-                        html.Small(f"Package: {item['package_name']}", className='text-muted d-block'),
-                        html.Small(f"Version Code: {item['version_code']}", className='text-muted d-block'),
-                    ], width=9),
-                    dbc.Col([
-                        dbc.ButtonGroup([
-                            dbc.Button("↑", id={'type': 'move-up', 'index': i}, size="sm", color="light", className="mr-1"),
-                            dbc.Button("↓", id={'type': 'move-down', 'index': i}, size="sm", color="light", className="mr-1"),
-                            dbc.Button("×", id={'type': 'remove-apk', 'index': i}, size="sm", color="danger"),
-                        ], size="sm")
-                    ], width=3, className="d-flex align-items-center justify-content-end")
-                ], className="g-0")
-            ])
-            for i, item in enumerate(stored_data)
+            _render_upload_item(i, filename, package_name, version_code)
+            for i, (filename, package_name, version_code) in enumerate(items)
         ])
     ])
 
+@lru_cache(maxsize=256)
+def _render_upload_item(i, filename, package_name, version_code):
+    """One upload list row; rows whose position and APK are unchanged are reused"""
+    return dbc.ListGroupItem([
+        dbc.Row([
+            dbc.Col([
+                html.H5(truncate_string(filename, 30), className='mb-1', title=filename),
+                html.Small(f"Package: {package_name}", className='text-muted d-block'),
+                html.Small(f"Version Code: {version_code}", className='text-muted d-block'),
+            ], width=9),
+            dbc.Col([
+                dbc.ButtonGroup([
+                    dbc.Button("↑", id={'type': 'move-up', 'index': i}, size="sm", color="light", className="mr-1"),
+                    dbc.Button("↓", id={'type': 'move-down', 'index': i}, size="sm", color="light", className="mr-1"),
+                    dbc.Button("×", id={'type': 'remove-apk', 'index': i}, size="sm", color="danger"),
+                ], size="sm")
+            ], width=3, className="d-flex align-items-center justify-content-end")
+        ], className="g-0")
+    ])
+
 def truncate_string(string, max_length):
     return string[:max_length] + '...' if len(string) > max_length else string
 
+def _extract_uploaded_apk(args):
+    """Pool worker: extract URL features from one uploaded APK"""
+    i, item, parser_selection = args
+    return i, extract_apk_features(item['server_path'], 'urls', False, parser_selection)
+
+# Extracted features of recently analysed uploads, keyed by (content hash, parser).
+# Kept in the callback process, since the pool workers don't outlive a run
+_features_cache = {}
+_features_cache_lock = threading.Lock()
+MAX_FEATURES_CACHE_SIZE = 64
+
+def _features_cache_key(item, parser_selection):
+    """Cache key for an uploaded APK's features"""
+    sha256 = item.get('sha256') or apk_digest(item['server_path'])
+    return sha256, parser_selection
+
 def process_uploaded_apks(stored_data, highlight_config, num_cores, parser_selection, sort_order, session_id):
     results = {
         'urls': [],
@@ -422,27 +740,52 @@ def process_uploaded_apks(stored_data, highlight_config, num_cores, parser_selec
         'subdomains': []
     }
     
-    for i, item in enumerate(stored_data):
-        # Use the server-side file path directly
-        apk_path = item['server_path']
-        features = extract_apk_features(apk_path, 'urls', False, parser_selection)
+    # Only APKs not parsed before (with this parser) need extracting
+    keys = [_features_cache_key(item, parser_selection) for item in stored_data]
+    with _features_cache_lock:
+        extracted = {i: _features_cache[key] for i, key in enumerate(keys) if key in _features_cache}
+    tasks = [(i, item, parser_selection) for i, item in enumerate(stored_data) if i not in extracted]
+    
+    # APK parsing is CPU-bound, so spread it over num_cores processes. APK sizes vary widely,
+    # so hand out one APK at a time rather than batching
+    num_cores = min(int(num_cores or 1), MAX_CORES)
+    if num_cores > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(num_cores, len(tasks))) as executor:
+            new_features = list(executor.map(_extract_uploaded_apk, tasks, chunksize=1))
+    else:
+        new_features = [_extract_uploaded_apk(task) for task in tasks]
+    
+    for i, features in new_features:
+        extracted[i] = features
+        with _features_cache_lock:
+            if len(_features_cache) >= MAX_FEATURES_CACHE_SIZE:
+                _features_cache.pop(next(iter(_features_cache)), None)
+            _features_cache[keys[i]] = features
+    
+    for i in range(len(stored_data)):
+        features = extracted[i]
+        item = stored_data[i]
         
         version = item['filename'] if sort_order == 'ui' else item['version_code']
         ui_index = i
         
-        for feature in features:
-            # Parse the URL to extract components
-            parsed_url = tldextract.extract(feature)
-            subdomain = '.'.join(filter(None, [parsed_url.subdomain, parsed_url.domain, parsed_url.suffix]))
-            domain = '.'.join(filter(None, [parsed_url.domain, parsed_url.suffix]))
-            
-            # Add to each data type
-            if feature:  # URLs
-                results['urls'].append({'Data': feature, 'version': version, 'ui_order': ui_index})
-            if domain:  # Domains
-                results['domains'].append({'Data': domain, 'version': version, 'ui_order': ui_index})
-            if subdomain:  # Subdomains
-                results['subdomains'].append({'Data': subdomain, 'version': version, 'ui_order': ui_index})
+        # Count each distinct URL, then parse only the distinct URLs
+        url_counts = pd.Series(features, dtype=object).value_counts(sort=False)
+        hosts = [_split_host(feature) for feature in url_counts.index]
+        df = pd.DataFrame({
+            'urls': url_counts.index,
+            'domains': [domain for domain, _ in hosts],
+            'subdomains': [subdomain for _, subdomain in hosts],
+            'Count': url_counts.to_numpy(),
+        })
+        
+        # One counted row per distinct non-empty value of each data type
+        for data_type in ('urls', 'domains', 'subdomains'):
+            totals = df[df[data_type] != ''].groupby(data_type, sort=False)['Count'].sum()
+            results[data_type].extend(
+                {'Data': value, 'version': version, 'ui_order': ui_index, 'Count': int(count)}
+                for value, count in totals.items()
+            )
     
     # Generate plots for each data type
     plot_results = {}
@@ -456,14 +799,20 @@ def process_uploaded_apks(stored_data, highlight_config, num_cores, parser_selec
     return plot_results
 
 def save_uploaded_file(item, temp_dir):
-    content_type, content_string = item['content'].split(',')
-    decoded = base64.b64decode(content_string)
     file_path = os.path.join(temp_dir, item['filename'])
-    with open(file_path, 'wb') as f:
-        f.write(decoded)
+    write_base64_content(item['content'], file_path)
     return file_path
 
-@app.callback(
+# Show spinner when submit button is clicked, in the browser so it needs no server round-trip
+app.clientside_callback(
+    """
+    function(n_clicks, storedData) {
+        if (n_clicks && storedData && storedData.length) {
+            return [{display: 'block'}, 'Starting analysis...', 'primary', {display: 'none'}, false];
+        }
+        return [{display: 'none'}, 'Waiting for input...', 'secondary', {display: 'none'}, false];
+    }
+    """,
     [Output("user-apk-spinner-wrapper", "style", allow_duplicate=True),
      Output("user-apk-status-message", "children", allow_duplicate=True),
      Output("user-apk-status-message", "color", allow_duplicate=True),
@@ -473,22 +822,18 @@ def save_uploaded_file(item, temp_dir):
     [State("user-apk-upload-store", "data")],
     prevent_initial_call=True
 )
-def show_spinner_on_click(n_clicks, stored_data):
-    """Show spinner when submit button is clicked"""
-    if n_clicks and stored_data:
-        return {"display": "block"}, "Starting analysis...", "primary", {"display": "none"}, False
-    return {"display": "none"}, "Waiting for input...", "secondary", {"display": "none"}, False
 
 # Server capacity indicator callback
 @app.callback(
     [Output("server-capacity-indicator", "value"),
      Output("server-capacity-indicator", "color"),
      Output("server-capacity-text", "children")],
-    [Input("user-apk-progress-interval", "n_intervals")]
+    [Input("user-apk-progress-interval", "n_intervals")],
+    [State("server-capacity-text", "children")]
 )
-def update_server_capacity(n_intervals):
+def update_server_capacity(n_intervals, current_text):
     """Update server capacity indicator"""
-    num_active = len(active_sessions)
+    num_active = get_active_count()
     capacity_percentage = (num_active / MAX_CONCURRENT_USERS) * 100
     
     # Choose colour based on load
@@ -504,6 +849,8 @@ def update_server_capacity(n_intervals):
     
     # Create status text
     text = f"{status}: {num_active}/{MAX_CONCURRENT_USERS} active analyses"
+    if text == current_text:
+        raise PreventUpdate
     
     return capacity_percentage, color, text
 
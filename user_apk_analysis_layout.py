@@ -13,7 +13,21 @@
 # limitations under the License.
 from dash import dcc, html
 import dash_bootstrap_components as dbc
-import multiprocessing as mp
+from utils.logo_svg import ascii_art_data_uri
+import os
+import re
+from functools import cache, lru_cache
+from types import MappingProxyType
+
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+
+# Upper bound for the cores slider: never more than the machine has
+MAX_CORES = min(os.cpu_count() or 1, 8)
+CORE_SLIDER_MARKS = {i: str(i) for i in range(1, MAX_CORES + 1)}
 
 ascii_logo = """
      ██  █████  ███    ██ ██    ██ ███████ 
@@ -23,14 +37,10 @@ ascii_logo = """
  █████  ██   ██ ██   ████  ██████  ███████ """
 
 def create_highlight_options(preset_configs):
-    options = []
-    for category, config in preset_configs.items():
-        options.append({"label": category, "value": category})
-    options.append({"label": "Custom", "value": "custom"})
-    return options
+    return [*({"label": category, "value": category} for category in preset_configs), {"label": "Custom", "value": "custom"}]
 
 
-preset_configs = {
+preset_configs = MappingProxyType({
     "Chinese Tech Giants": {
         "regex": "baidu|alibaba|tencent|huawei|xiaomi|bytedance|weibo|wechat|qq|douyin|\\.cn$|\\.中国$|\\.中國$",
         "color": "#0000FF"},
@@ -45,166 +55,261 @@ preset_configs = {
     "Chinese Cloud Services": {"regex": "aliyun|alicloud|tencentcloud|huaweicloud|baiduyun|qcloud", "color": "#0000FF"},
     "Russian Cloud Services": {"regex": "selectel|cloudmts|sbercloud|mail\\.ru", "color": "#0000FF"},
 
-    "Education": {"regex": "edu|\\.edu$|university|school|college", "color": "#4B0082"},
+    "Education": {"regex": "edu|university|school|college", "color": "#4B0082"},
+})
+
+# Shared initial payload for list stores; serialised as a JSON array like []
+_EMPTY_LIST = ()
+
+# Dropdown options, built once and shared by every render
+PRESET_OPTIONS = tuple({"label": k, "value": k} for k in preset_configs) + ({"label": "Custom", "value": "custom"},)
+HIGHLIGHT_DROPDOWN_OPTIONS = PRESET_OPTIONS[:-1]
+
+# Preset name -> (compiled case-insensitive pattern, colour), compiled once at import
+PRESET_COMPILED = MappingProxyType({
+    name: (re.compile(config["regex"], re.IGNORECASE), config["color"]) for name, config in preset_configs.items()
+})
+
+@lru_cache(maxsize=64)
+def build_combined_pattern(selected_keys):
+    """One alternation over the selected presets (a frozenset of names), with a named group per
+    preset, plus a {group name: colour} map for dispatching on match.lastgroup"""
+    groups = {re.sub(r'\W+', '_', name).strip('_'): name for name in sorted(selected_keys)}
+    pattern = re.compile(
+        "|".join(f"(?P<{group}>{preset_configs[name]['regex']})" for group, name in groups.items()),
+        re.IGNORECASE
+    )
+    return pattern, {group: preset_configs[name]["color"] for group, name in groups.items()}
+
+def _split_literal_preset(regex):
+    """Split an alternation of literals into (keywords, suffixes), or None if it uses other regex syntax"""
+    keywords, suffixes = [], []
+    for piece in regex.split('|'):
+        anchored = piece.endswith('$')
+        literal = piece[:-1] if anchored else piece
+        if not literal or any(c in literal.replace('\\.', '') for c in '.\\^$*+?{}[]()'):
+            return None
+        (suffixes if anchored else keywords).append(literal.replace('\\.', '.').lower())
+    return keywords, suffixes
+
+def _build_preset_scanner():
+    """One Aho-Corasick automaton over every preset keyword, valued with (keyword length, presets
+    containing it), plus the anchored suffixes; (None, ()) if unavailable or a preset isn't literal"""
+    if not HAS_AHOCORASICK:
+        return None, ()
+    automaton = ahocorasick.Automaton()
+    suffixes = []
+    for name, config in preset_configs.items():
+        split = _split_literal_preset(config["regex"])
+        if split is None:
+            return None, ()
+        keywords, anchored = split
+        for keyword in keywords:
+            presets = automaton.get(keyword, (len(keyword), ()))[1]
+            automaton.add_word(keyword, (len(keyword), presets + ((name, config["color"]),)))
+        suffixes.extend((suffix, name, config["color"]) for suffix in anchored)
+    automaton.make_automaton()
+    return automaton, tuple(suffixes)
+
+_preset_automaton, _preset_suffixes = _build_preset_scanner()
+PRESET_SCANNER_AVAILABLE = _preset_automaton is not None
+
+def scan_presets(text):
+    """(start, end, preset name, colour) for every preset hit in text; needs PRESET_SCANNER_AVAILABLE"""
+    lowered = text.lower()
+    hits = [(end + 1 - length, end + 1, name, color)
+            for end, (length, presets) in _preset_automaton.iter(lowered)
+            for name, color in presets]
+    # Only the $-anchored TLD tails need checking separately
+    hits.extend((len(lowered) - len(suffix), len(lowered), name, color)
+                for suffix, name, color in _preset_suffixes if lowered.endswith(suffix))
+    return hits
+
+# Component styles, shared by every build of the tree (plain dicts: Dash only serialises dict styles)
+_UPLOAD_STYLE = {
+    'width': '100%',
+    'height': '60px',
+    'lineHeight': '60px',
+    'borderWidth': '1px',
+    'borderStyle': 'dashed',
+    'borderRadius': '5px',
+    'textAlign': 'center',
+    'margin': '10px 0'
 }
-layout = dbc.Container([
-    dbc.Row(dbc.Col(html.Pre(ascii_logo, style={'font-family': 'monospace', 'color': 'blue'}))),
-    dbc.Row(dbc.Col(html.Img(src="/assets/sponsors.png",
-                             style={'height': '71px', 'display': 'inline-block', 'margin-bottom': '0px',
-                                    'margin-top': '0px'}))),
-    dbc.Row([
-        dbc.Col([
-            dbc.Form([
-                html.H4("User APK Analysis", className="mb-3"),
-                dcc.Upload(
-                    id='user-apk-upload',
-                    children=html.Div([
-                        'Drag and Drop or ',
-                        html.A('Select APK Files')
-                    ]),
-                    style={
-                        'width': '100%',
-                        'height': '60px',
-                        'lineHeight': '60px',
-                        'borderWidth': '1px',
-                        'borderStyle': 'dashed',
-                        'borderRadius': '5px',
-                        'textAlign': 'center',
-                        'margin': '10px 0'
-                    },
-                    multiple=True
-                ),
-                html.Div(id='user-apk-upload-list', style={'marginTop': '10px', 'marginBottom': '10px'}),
+_LOG_PRE_STYLE = {
+    'whiteSpace': 'pre-wrap',
+    'wordBreak': 'break-word',
+    'maxHeight': '200px',
+    'overflowY': 'scroll',
+    'backgroundColor': '#f8f9fa',
+    'padding': '10px',
+    'border': '1px solid #ddd',
+    'borderRadius': '5px'
+}
+_HIDDEN_STYLE = {"display": "none"}
+
+# Static header rows, built once
+ASCII_LOGO_ROW = dbc.Row(dbc.Col(html.Img(src=ascii_art_data_uri(ascii_logo), alt="JANUS")))
+SPONSORS_ROW = dbc.Row(dbc.Col(html.Img(src="/assets/sponsors.png",
+                                        style={'height': '71px', 'display': 'inline-block', 'margin-bottom': '0px',
+                                               'margin-top': '0px'})))
+
+@cache
+def _build_layout():
+    """The page's component tree; built once per process"""
+    return dbc.Container([
+        ASCII_LOGO_ROW,
+        SPONSORS_ROW,
+        dbc.Row([
+            dbc.Col([
+                dbc.Form([
+                    html.H4("User APK Analysis", className="mb-3"),
+                    dcc.Upload(
+                        id='user-apk-upload',
+                        children=html.Div([
+                            'Drag and Drop or ',
+                            html.A('Select APK Files')
+                        ]),
+                        style=_UPLOAD_STYLE,
+                        multiple=True
+                    ),
+                    # Large APKs are sent in 5 MB slices instead of one base64 blob
+                    dbc.Button("Upload Large APKs", id="user-apk-chunked-upload-button", color="link", size="sm",
+                               className="p-0"),
+                    html.Div(id='user-apk-upload-list', style={'marginTop': '10px', 'marginBottom': '10px'}),
                 
-                # Highlight configuration dropdown
-                html.Label("Preset Highlight Patterns"),
-                dbc.Alert([
-                    html.I(className="fas fa-info-circle me-2"),
-                    "Changes to highlight settings require reanalysing the APKs to take effect."
-                ], color="info", className="mb-2", style={"padding": "8px 12px", "fontSize": "0.875rem"}),
-                dcc.Dropdown(
-                    id='user-apk-highlight-dropdown',
-                    options=[{'label': k, 'value': k} for k in preset_configs.keys()],
-                    multi=True,
-                    placeholder="Select preset highlight patterns",
-                    style={'marginBottom': '10px'}
-                ),
+                    # Highlight configuration dropdown
+                    html.Label("Preset Highlight Patterns"),
+                    dbc.Alert([
+                        html.I(className="fas fa-info-circle me-2"),
+                        "Changes to highlight settings require reanalysing the APKs to take effect."
+                    ], color="info", className="mb-2", style={"padding": "8px 12px", "fontSize": "0.875rem"}),
+                    dcc.Dropdown(
+                        id='user-apk-highlight-dropdown',
+                        options=HIGHLIGHT_DROPDOWN_OPTIONS,
+                        multi=True,
+                        placeholder="Select preset highlight patterns",
+                        style={'marginBottom': '10px'}
+                    ),
                 
-                # Custom highlight input section (always visible)
-                html.Label("Custom Highlight Pattern"),
-                dbc.Input(id="user-apk-highlight-pattern", type="text", placeholder="Enter regex pattern", className="mb-2"),
-                dbc.Input(id="user-apk-highlight-color", type="text", placeholder="Enter color (e.g., #FF0000)", className="mb-2"),
-                dbc.Button("Add Custom Highlight", id="user-apk-add-highlight", color="secondary", size="sm", className="mb-2"),
+                    # Custom highlight input section (always visible)
+                    html.Label("Custom Highlight Pattern"),
+                    dbc.Input(id="user-apk-highlight-pattern", type="text", placeholder="Enter regex pattern", className="mb-2"),
+                    dbc.Input(id="user-apk-highlight-color", type="text", placeholder="Enter color (e.g., #FF0000)", className="mb-2"),
+                    dbc.Button("Add Custom Highlight", id="user-apk-add-highlight", color="secondary", size="sm", className="mb-2"),
                 
-                # List of selected highlights
-                html.Div(id="user-apk-highlight-list", style={'maxHeight': '200px', 'overflowY': 'auto'}),
+                    # List of selected highlights
+                    html.Div(id="user-apk-highlight-list", style={'maxHeight': '200px', 'overflowY': 'auto'}),
                 
-                # Modify the number of cores slider
-                html.Label("Number of Cores"),
-                dcc.Slider(
-                    id='user-apk-num-cores-slider',
-                    min=1,
-                    max=4,
-                    step=1,
-                    value=2,  # Default to 2 cores
-                    marks={i: str(i) for i in range(1, 5)}
-                ),
+                    # Modify the number of cores slider
+                    html.Label("Number of Cores"),
+                    dcc.Slider(
+                        id='user-apk-num-cores-slider',
+                        min=1,
+                        max=MAX_CORES,
+                        step=1,
+                        value=min(2, MAX_CORES),  # Default to 2 cores
+                        marks=CORE_SLIDER_MARKS
+                    ),
                 
-                # Modify the parser selection dropdown
-                html.Label("Parser Selection"),
-                dcc.Dropdown(
-                    id='user-apk-parser-selection',
-                    options=[
-                        {'label': 'Custom DEX Parser', 'value': 'custom_dex'},
-                        {'label': 'Androguard', 'value': 'androguard'}
-                    ],
-                    value='custom_dex',  # Set default to custom DEX parser
-                    clearable=False
-                ),
+                    # Modify the parser selection dropdown
+                    html.Label("Parser Selection"),
+                    dcc.Dropdown(
+                        id='user-apk-parser-selection',
+                        options=[
+                            {'label': 'Custom DEX Parser', 'value': 'custom_dex'},
+                            {'label': 'Androguard', 'value': 'androguard'}
+                        ],
+                        value='custom_dex',  # Set default to custom DEX parser
+                        clearable=False
+                    ),
                 
-                # Add the sort order radio items
-                html.Label("Sort Order"),
-                dcc.RadioItems(
-                    id='user-apk-sort-order',
-                    options=[
-                        {'label': 'UI Order', 'value': 'ui'},
-                        {'label': 'Version Code', 'value': 'vercode'}
-                    ],
-                    value='vercode',
-                    inline=True
-                ),
+                    # Add the sort order radio items
+                    html.Label("Sort Order"),
+                    dcc.RadioItems(
+                        id='user-apk-sort-order',
+                        options=[
+                            {'label': 'UI Order', 'value': 'ui'},
+                            {'label': 'Version Code', 'value': 'vercode'}
+                        ],
+                        value='vercode',
+                        inline=True
+                    ),
                 
-                dbc.Button("Analyse APKs", id="user-apk-submit-button", color="primary", size="md", className="mt-3", style={'width': '100%'}),
+                    dbc.Button("Analyse APKs", id="user-apk-submit-button", color="primary", size="md", className="mt-3", style={'width': '100%'}),
                 
-                # Server capacity indicator
+                    # Server capacity indicator
+                    html.Div([
+                        html.Hr(className="my-2"),
+                        html.Label("Server Capacity:", className="mt-2"),
+                        dbc.Progress(
+                            id="server-capacity-indicator",
+                            value=0,  # Will be updated via callback
+                            color="success",
+                            style={"height": "20px"},
+                            className="mt-1 mb-1"
+                        ),
+                        html.Div(id="server-capacity-text", className="text-muted small")
+                    ], className="mt-3")
+                ])
+            ], width=12, lg=4, className="mb-4"),
+            dbc.Col([
+                html.H4("Analysis Status"),
+                dbc.Alert(
+                    "Waiting for input...",
+                    id="user-apk-status-message",
+                    color="secondary",
+                    className="mb-3"
+                ),
+                # Add error message alert that will be hidden until needed
+                dbc.Alert(
+                    "",
+                    id="user-apk-error-message",
+                    color="danger",
+                    className="mb-3",
+                    style=_HIDDEN_STYLE,
+                    is_open=False
+                ),
                 html.Div([
-                    html.Hr(className="my-2"),
-                    html.Label("Server Capacity:", className="mt-2"),
-                    dbc.Progress(
-                        id="server-capacity-indicator",
-                        value=0,  # Will be updated via callback
-                        color="success",
-                        style={"height": "20px"},
-                        className="mt-1 mb-1"
+                    dbc.Spinner(
+                        html.Div(id="user-apk-spinner-container", style={"height": "50px"}),
+                        id="user-apk-spinner",
+                        color="primary",
+                        type="grow",
+                        size="sm"
                     ),
-                    html.Div(id="server-capacity-text", className="text-muted small")
-                ], className="mt-3")
-            ])
-        ], width=12, lg=4, className="mb-4"),
-        dbc.Col([
-            html.H4("Analysis Status"),
-            dbc.Alert(
-                "Waiting for input...",
-                id="user-apk-status-message",
-                color="secondary",
-                className="mb-3"
-            ),
-            # Add error message alert that will be hidden until needed
-            dbc.Alert(
-                "",
-                id="user-apk-error-message",
-                color="danger",
-                className="mb-3",
-                style={"display": "none"},
-                is_open=False
-            ),
-            html.Div([
-                dbc.Spinner(
-                    html.Div(id="user-apk-spinner-container", style={"height": "50px"}),
-                    id="user-apk-spinner",
-                    color="primary",
-                    type="border"
-                ),
-            ], id="user-apk-spinner-wrapper", style={"display": "none"}),
-            html.H4("Analysis Log"),
-            html.Pre(
-                id='user-apk-progress', 
-                style={
-                    'whiteSpace': 'pre-wrap', 
-                    'wordBreak': 'break-word', 
-                    'maxHeight': '200px', 
-                    'overflowY': 'scroll',
-                    'backgroundColor': '#f8f9fa',
-                    'padding': '10px',
-                    'border': '1px solid #ddd',
-                    'borderRadius': '5px'
-                }
-            ),
-            dcc.Interval(id='user-apk-progress-interval', interval=1000, n_intervals=0),
-            html.H4("Results"),
-            html.Div([
-                dcc.Loading(
-                    id="user-apk-loading",
-                    type="default",
-                    children=html.Div(id="user-apk-loading-output")
+                ], id="user-apk-spinner-wrapper", style=_HIDDEN_STYLE),
+                html.H4("Analysis Log"),
+                html.Pre(
+                    id='user-apk-progress', 
+                    style=_LOG_PRE_STYLE
                 ),
+                # Log lines are pushed over /stream/progress while a session is open; polling is
+                # the fallback and also drives the capacity indicator
+                dcc.Interval(id='user-apk-progress-interval', interval=5000, n_intervals=0),
+                html.H4("Results"),
+                html.Div([
+                    # Quick callbacks (cached results) finish before the loader would appear
+                    dcc.Loading(
+                        id="user-apk-loading",
+                        type="dot",
+                        delay_show=200,
+                        children=html.Div(id="user-apk-loading-output")
+                    ),
+
+                    html.Div(id="user-apk-results")
+                ], style={'minHeight': '100px'})
+            ], width=12, lg=8)
+        ]),
+        dcc.Store(id='user-apk-upload-store', data=_EMPTY_LIST),
+        dcc.Store(id='user-apk-chunked-upload-store', data=None),
+        dcc.Store(id='user-apk-highlight-config-store', data=_EMPTY_LIST),
+        # Preset patterns for the clientside highlight callback
+        dcc.Store(id='user-apk-preset-configs-store', data=dict(preset_configs)),
+        dcc.Store(id='user-apk-feature-info-store', data={}),
+        dcc.Store(id='user-apk-session-id-store', data=None),
+        dcc.Store(id='user-apk-log-cursor', data=None),
+        dcc.Store(id='user-apk-log-delta', data=None),
+    ], fluid=True)
 
-                html.Div(id="user-apk-results")
-            ], style={'minHeight': '100px'})
-        ], width=12, lg=8)
-    ]),
-    dcc.Store(id='user-apk-upload-store', data=[]),
-    dcc.Store(id='user-apk-highlight-config-store', data=[]),
-    dcc.Store(id='user-apk-feature-info-store', data={}),
-    dcc.Store(id='user-apk-session-id-store', data=None),
-], fluid=True)
+layout = _build_layout()
@@ -12,13 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import base64
+import csv
 import logging
 import re
+import shutil
 import time
 import zipfile
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 import uuid
+import numpy as np
 import pandas as pd
 import requests
 import tldextract
@@ -28,19 +33,20 @@ from dash import html
 from tqdm import tqdm
 import threading
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from io import StringIO
 import os
 import tempfile
 from utils.dex_parser import DEXParser, extract_apk_dex_files
-from utils.ui_logger import UILogger, register_process, should_cancel
+from utils.figure_download import figure_download_href
+from utils.ui_logger import UILogger, register_process, session_scoped, should_cancel
 import sqlite3
-import plotly.io as pio
 from dash.exceptions import PreventUpdate
 import utils.apk_analysis_core
 from utils.apk_analysis_core import (
     calculate_sampling_frequency,
     check_apk_in_cache,
-    download_apk,
     download_apk_worker,
     download_file_with_progress,
     extract_apk_dex_files,
@@ -55,10 +61,25 @@ from utils.apk_analysis_core import (
     validate_and_clean_apks,
 )
 import plotly.graph_objects as go
+from layouts.user_apk_analysis_layout import (
+    PRESET_COMPILED,
+    PRESET_SCANNER_AVAILABLE,
+    build_combined_pattern,
+    preset_configs,
+    scan_presets,
+)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 current_process = None
 logger = logging.getLogger(__name__)
 ui_logger = UILogger()
+# AndroZoo downloads in flight at once, matching the precomputed page
+MAX_CONCURRENT_DOWNLOADS = 3
+
+# Shared APK cache and trash directories, resolved and created once
+BASE_DIR = Path(__file__).resolve().parent.parent
+UNIVERSAL_CACHE_DIR = str(BASE_DIR / "apk_cache")
+TRASH_DIR = str(BASE_DIR / "trash")
+os.makedirs(UNIVERSAL_CACHE_DIR, exist_ok=True)
 
 def initialize_database(db_path):
     conn = sqlite3.connect(db_path)
@@ -76,17 +97,19 @@ def initialize_database(db_path):
 
 def check_and_print_csv(filename):
     try:
-        data = pd.read_csv(filename, nrows=5)
-        if data.empty:
+        # Only a preview is printed, so read the header and first rows with the stdlib reader
+        with open(filename, newline='') as f:
+            rows = list(islice(csv.reader(f), 6))
+        if len(rows) < 2:
             print("CSV file is empty.")
         else:
             print("First few rows of the CSV file:")
-            print(data)
-    except pd.errors.EmptyDataError:
-        print("CSV file is empty.")
+            for row in rows:
+                print(", ".join(row))
     except Exception as e:
         print(f"Error reading CSV file: {e}")
 
+@session_scoped
 def process_apks(n_clicks, api_key, start_date, end_date, package_list_input, desired_versions, highlight_config, num_cores, parser_selection):
     if n_clicks is None:
         raise PreventUpdate
@@ -110,10 +133,7 @@ def process_apks(n_clicks, api_key, start_date, end_date, package_list_input, de
     end_date_str = datetime.strptime(end_date, '%Y-%m-%d').strftime('%Y-%m-%d ') + "23:59:59.999999"
 
     # Validate and clean APKs
-    base_dir = Path(__file__).parent.parent.absolute()
-    universal_cache_dir = os.path.join(base_dir, "apk_cache")
-    trash_dir = os.path.join(base_dir, "trash")
-    validate_and_clean_apks(universal_cache_dir, trash_dir)
+    validate_and_clean_apks(UNIVERSAL_CACHE_DIR, TRASH_DIR)
     logger.info("APK cache validated and cleaned")
 
     results = {}
@@ -134,7 +154,8 @@ def process_apks(n_clicks, api_key, start_date, end_date, package_list_input, de
                     int(desired_versions),
                     highlight_config,
                     num_cores,
-                    parser_selection
+                    parser_selection,
+                    session_id
                 )
 
                 # Check for cancellation after each major step
@@ -153,6 +174,7 @@ def process_apks(n_clicks, api_key, start_date, end_date, package_list_input, de
     logger.info("APK processing complete")
     return results
 
+@session_scoped
 def process_uploaded_apks(stored_data, highlight_config, num_cores, parser_selection, sort_order, session_id=None):
     """
     Process uploaded APKs for analysis with session tracking
@@ -186,24 +208,24 @@ def process_uploaded_apks(stored_data, highlight_config, num_cores, parser_selec
             'subdomains': None
         }
         
+        # Extract features from each APK once; every data type is derived from its URLs
+        extracted_features = []
+        for i, item in enumerate(stored_data):
+            # Check for cancellation
+            if should_cancel(session_id):
+                logger.info("Process cancelled")
+                return None
+            
+            logger.info(f"Extracting features from {item['filename']} ({i+1}/{len(stored_data)})")
+            extracted_features.append(extract_apk_features(item['server_path'], 'urls', False, parser_selection))
+        
         # Process each data type
         for data_type in ['urls', 'domains', 'subdomains']:
             logger.info(f"Processing {data_type} from uploaded APKs")
             
-            # Extract features from APKs
             all_data = []
-            for i, item in enumerate(stored_data):
-                # Check for cancellation
-                if should_cancel(session_id):
-                    logger.info("Process cancelled")
-                    return None
-                
+            for i, (item, features) in enumerate(zip(stored_data, extracted_features)):
                 filename = item['filename']
-                apk_path = item['server_path']
-                
-                logger.info(f"Extracting features from {filename} ({i+1}/{len(stored_data)})")
-                # Extract features 
-                features = extract_apk_features(apk_path, 'urls', False, parser_selection)
                 
                 if features:
                     # Create data entries for plotting
@@ -255,17 +277,16 @@ def process_uploaded_apks(stored_data, highlight_config, num_cores, parser_selec
         logger.error(f"Error processing uploaded APKs: {str(e)}")
         return None
 
-def process_package(package_name, base_directory, apikey, db_path, start_date, end_date, desired_versions, highlight_config, num_cores, parser_selection):
+@session_scoped
+def process_package(package_name, base_directory, apikey, db_path, start_date, end_date, desired_versions, highlight_config, num_cores, parser_selection, session_id=None):
     ui_logger.logger.info(f"Starting APK processing")
     
-    # Create a directory for the APK cache
-    base_dir = Path(__file__).parent.parent.absolute()
-    universal_cache_dir = os.path.join(base_dir, "apk_cache")
-    os.makedirs(universal_cache_dir, exist_ok=True)
+    # APK cache directory, created at import
+    universal_cache_dir = UNIVERSAL_CACHE_DIR
 
     # Download the APKs if needed
     ui_logger.logger.info(f"Downloading APKs for {package_name}")
-    downloaded_apks = download_apks([package_name], apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions)
+    downloaded_apks = download_apks([package_name], apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions, session_id)
     
     # Process cancellation check
     if downloaded_apks is None:
@@ -293,7 +314,7 @@ def process_package(package_name, base_directory, apikey, db_path, start_date, e
     
     return result
 
-def download_apks(package_names, apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions):
+def download_apks(package_names, apikey, universal_cache_dir, db_path, start_date, end_date, desired_versions, session_id=None):
     os.makedirs(universal_cache_dir, exist_ok=True)
     all_downloaded_apks = []
     
@@ -314,40 +335,48 @@ def download_apks(package_names, apikey, universal_cache_dir, db_path, start_dat
             # Use all available versions
             samples = apk_data
             
-        # Download each APK
+        # Download the APKs not in cache concurrently; the fetches are network-bound
         downloaded_for_package = []
-        for i, (sha256, vercode, vtscandate) in enumerate(samples):
-            # Check for cancellation
-            if threading.current_thread() != threading.current_thread():
-                return None
-                
-            apk_path = check_apk_in_cache(sha256, universal_cache_dir)
-            
-            if not apk_path:
-                # Download if not in cache
-                try:
-                    download_apk(sha256, vercode, vtscandate, package_name, apikey, universal_cache_dir)
+        if should_cancel(session_id):
+            return None
+        # Workers run in a copy of this context, so they see the same session and run
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOWNLOADS) as executor:
+            futures = [
+                None if check_apk_in_cache(sha256, universal_cache_dir) else
+                executor.submit(copy_context().run, download_apk_worker, sha256, vercode, vtscandate, package_name, apikey, universal_cache_dir)
+                for sha256, vercode, vtscandate in samples
+            ]
+            for (sha256, vercode, vtscandate), future in zip(samples, futures):
+                # Check for cancellation; queued downloads are dropped
+                if should_cancel(session_id):
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    return None
+
+                if future is None or future.result():
                     downloaded_for_package.append((sha256, vercode, vtscandate))
-                except Exception as e:
-                    UILogger.get_logger('default')['logger'].error(f"Error downloading APK {sha256}: {str(e)}")
-            else:
-                downloaded_for_package.append((sha256, vercode, vtscandate))
+                else:
+                    UILogger.get_logger('default')['logger'].error(f"Error downloading APK {sha256}")
                 
         all_downloaded_apks.extend(downloaded_for_package)
         
     return all_downloaded_apks
 
-def should_cancel():
-    return False
+# Base64 characters decoded per write; a multiple of 4 so chunks decode independently
+BASE64_CHUNK_SIZE = 4 * (1 << 18)
+
+def write_base64_content(content, file_path):
+    """Decode a data-URL upload to file_path in chunks rather than all at once"""
+    # Decode from offsets into the data URL, so the payload is never copied whole
+    body_start = content.index(',') + 1
+    with open(file_path, 'wb') as f:
+        for start in range(body_start, len(content), BASE64_CHUNK_SIZE):
+            f.write(base64.b64decode(content[start:start + BASE64_CHUNK_SIZE]))
 
 def save_uploaded_files(stored_data, temp_dir):
     apk_files = []
     for item in stored_data:
-        content_type, content_string = item['content'].split(',')
-        decoded = base64.b64decode(content_string)
         file_path = os.path.join(temp_dir, item['filename'])
-        with open(file_path, 'wb') as f:
-            f.write(decoded)
+        write_base64_content(item['content'], file_path)
         # Return tuple of (filename, filepath) to match expected format
         apk_files.append((item['filename'], file_path))
     return apk_files
@@ -357,22 +386,229 @@ def save_uploaded_file_to_server(content, filename):
     upload_dir = "uploaded_apks"
     os.makedirs(upload_dir, exist_ok=True)
     
-    # Decode the base64 content
-    content_type, content_string = content.split(',')
-    decoded = base64.b64decode(content_string)
-    
     # Create unique filename to avoid conflicts
     unique_filename = f"{uuid.uuid4()}_{filename}"
     file_path = os.path.join(upload_dir, unique_filename)
     
-    # Write the file
-    with open(file_path, 'wb') as f:
-        f.write(decoded)
+    # Decode the base64 content straight to the file
+    write_base64_content(content, file_path)
+    
+    return file_path
+
+# Chunked uploads are staged here, one directory per upload, until reassembled
+UPLOAD_CHUNK_DIR = os.path.join("uploaded_apks", "chunks")
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{8,64}$')
+UPLOAD_COPY_BUFFER_SIZE = 1024 * 1024
+# Largest APK accepted from a chunked upload
+MAX_UPLOAD_SIZE = 1024 * 1024 * 1024
+# Slice size used by the browser uploader, and so the most one part may hold
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+MAX_UPLOAD_CHUNKS = -(-MAX_UPLOAD_SIZE // UPLOAD_CHUNK_SIZE)
+# Chunk directories untouched for this long belong to abandoned uploads
+STALE_UPLOAD_CHUNK_AGE = 60 * 60
+
+def _upload_chunk_dir(upload_id):
+    """Staging directory for an upload id, rejecting anything but a hex token"""
+    if not UPLOAD_ID_PATTERN.match(upload_id):
+        raise ValueError(f"Invalid upload id: {upload_id!r}")
+    return os.path.join(UPLOAD_CHUNK_DIR, upload_id)
+
+def save_upload_chunk(upload_id, seq, stream):
+    """Write one chunk of a chunked upload from a file-like stream, enforcing the size limits"""
+    chunk_dir = _upload_chunk_dir(upload_id)
+    seq = int(seq)
+    if not 0 <= seq < MAX_UPLOAD_CHUNKS:
+        raise ValueError(f"Chunk {seq} of upload {upload_id} is out of range")
+    os.makedirs(chunk_dir, exist_ok=True)
+    # Buffer at most one byte past the limit, to tell an oversized chunk from a full one
+    data = bytearray()
+    while len(data) <= UPLOAD_CHUNK_SIZE:
+        block = stream.read(min(UPLOAD_COPY_BUFFER_SIZE, UPLOAD_CHUNK_SIZE + 1 - len(data)))
+        if not block:
+            break
+        data += block
+    if len(data) > UPLOAD_CHUNK_SIZE:
+        raise ValueError(f"Chunk {seq} of upload {upload_id} exceeds {UPLOAD_CHUNK_SIZE} bytes")
+    with open(os.path.join(chunk_dir, f"{seq}.part"), 'wb') as f:
+        f.write(data)
+    # Reject the whole upload as soon as its parts pass the size limit
+    total_size = sum(entry.stat().st_size for entry in os.scandir(chunk_dir))
+    if total_size > MAX_UPLOAD_SIZE:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+        raise ValueError(f"Upload {upload_id} exceeds {MAX_UPLOAD_SIZE} bytes")
+
+def remove_stale_upload_chunks(max_age=STALE_UPLOAD_CHUNK_AGE):
+    """Remove chunk directories of uploads that were never completed"""
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(UPLOAD_CHUNK_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError:
+            continue
+
+def _copy_part(src, dst):
+    """Append src to dst, copying inside the kernel where copy_file_range is available"""
+    if hasattr(os, 'copy_file_range'):
+        # Buffered bytes must reach the file before the kernel appends after them
+        dst.flush()
+        try:
+            remaining = os.fstat(src.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if not copied:
+                    break
+                remaining -= copied
+            if remaining == 0:
+                return
+        except OSError:
+            # Unsupported filesystem; fall through and copy the rest in user space
+            pass
+    shutil.copyfileobj(src, dst, UPLOAD_COPY_BUFFER_SIZE)
+
+def assemble_uploaded_chunks(upload_id, filename, chunk_count):
+    """Concatenate a chunked upload's parts in sequence order into the upload directory"""
+    chunk_dir = _upload_chunk_dir(upload_id)
+    upload_dir = "uploaded_apks"
+    os.makedirs(upload_dir, exist_ok=True)
     
+    # Create unique filename to avoid conflicts
+    file_path = os.path.join(upload_dir, f"{uuid.uuid4()}_{os.path.basename(filename)}")
+    try:
+        # The parts on disk must be exactly 0..chunk_count-1 and fit within the size limit
+        chunk_count = int(chunk_count)
+        part_names = [f"{seq}.part" for seq in range(chunk_count)]
+        if chunk_count < 1 or sorted(os.listdir(chunk_dir)) != sorted(part_names):
+            raise ValueError(f"Upload {upload_id} does not have {chunk_count} parts")
+        total_size = sum(os.path.getsize(os.path.join(chunk_dir, name)) for name in part_names)
+        if total_size > MAX_UPLOAD_SIZE:
+            raise ValueError(f"Upload {upload_id} is {total_size} bytes, over the {MAX_UPLOAD_SIZE} byte limit")
+        
+        with open(file_path, 'wb') as out:
+            for name in part_names:
+                with open(os.path.join(chunk_dir, name), 'rb') as part:
+                    _copy_part(part, out)
+    except Exception:
+        # Don't leave a truncated APK behind
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
     return file_path
 
+# Preset patterns are compiled by the layout module and never evicted
+_PRESET_PATTERNS = {pattern.pattern: pattern for pattern, _ in PRESET_COMPILED.values()}
+
+@lru_cache(maxsize=256)
+def _compile_highlight_pattern(regex):
+    """Compile a custom highlight regex, cached by the regex string"""
+    return re.compile(regex, re.IGNORECASE)
+
+def get_highlight_pattern(regex):
+    """Return the compiled, case-insensitive pattern for a highlight regex (raises re.error if invalid)"""
+    return _PRESET_PATTERNS.get(regex) or _compile_highlight_pattern(regex)
+
+def match_highlight_color(item, highlight_patterns, prefilter=None):
+    """Colour of the first matching (pattern, colour) pair, or None"""
+    # One scan rules out items that match none of the patterns
+    if prefilter is not None and not prefilter.search(item):
+        return None
+    for pattern, color in highlight_patterns:
+        if pattern.search(item):
+            return color
+    return None
+
+def match_preset_color(item, preset_order):
+    """Colour of the first preset in preset_order ((name, colour) pairs) that the scanner finds in item"""
+    hits = {name for _, _, name, _ in scan_presets(item)}
+    if not hits:
+        return None
+    for name, color in preset_order:
+        if name in hits:
+            return color
+    return None
+
+def highlight_overlay(sorted_data, presence_matrix, color_for):
+    """Second heatmap trace tinting the present cells of every highlighted row, or None if nothing matches.
+    Cells hold a colour id (NaN is transparent), mapped through a stepped colorscale"""
+    overlay = np.full(presence_matrix.shape, np.nan)
+    color_ids = {}
+    for data_idx, item in enumerate(sorted_data):
+        # The colour depends only on the item, so match once per row
+        matched_color = color_for(item)
+        if matched_color:
+            overlay[data_idx, presence_matrix[data_idx]] = color_ids.setdefault(matched_color, len(color_ids) + 1)
+    if not color_ids:
+        return None
+    # Colour id i owns the band [(i - 1) / n, i / n] of the scale
+    n = len(color_ids)
+    colorscale = [[position, color] for color, i in color_ids.items() for position in ((i - 1) / n, i / n)]
+    return go.Heatmap(
+        z=overlay,
+        colorscale=colorscale,
+        zmin=0.5,
+        zmax=n + 0.5,
+        showscale=False,
+        opacity=0.3,
+        hoverinfo='skip',
+        xgap=1,
+        ygap=1
+    )
+
+def build_heatmap(count_matrix, sorted_data, sorted_versions, version_labels, hover_text, overlay, title):
+    """Presence/frequency heatmap of count_matrix (rows: sorted_data, columns: sorted_versions),
+    with an optional highlight overlay trace"""
+    fig = go.Figure(data=go.Heatmap(
+        showscale=False,
+        z=count_matrix,
+        x=sorted_versions,
+        y=sorted_data,
+        text=hover_text,
+        hoverinfo='text',
+        colorscale=[[0, 'white'], [0.01, 'grey'], [0.4, '#505050'], [1, 'black']],
+        zmin=0,
+        zmax=count_matrix.max(),
+        xgap=1,
+        ygap=1
+    ))
+    if overlay is not None:
+        fig.add_trace(overlay.update(x=sorted_versions, y=sorted_data))
+    fig.update_layout(
+        title=title,
+        xaxis=dict(tickmode='array', tickvals=list(range(len(sorted_versions))), ticktext=version_labels),
+        yaxis=dict(autorange="reversed")
+    )
+    return fig
+
 def plot_data(all_data, package_name, highlight_config, data_type, sort_order):
     print(f"Preparing data for plotting {data_type}...")
+
+    # Later highlights take precedence, so check them first
+    highlight_patterns = []
+    if highlight_config:
+        pairs = highlight_config.items() if isinstance(highlight_config, dict) else \
+            [(highlight['regex'], highlight['color']) for highlight in highlight_config]
+        for regex, color in reversed(list(pairs)):
+            try:
+                highlight_patterns.append((get_highlight_pattern(regex), color))
+            except re.error as e:
+                print(f"Skipping invalid highlight pattern {regex!r}: {e}")
+
+    # When every highlight is a preset, one fused pattern rejects most items in a single scan
+    highlight_prefilter = None
+    if len(highlight_patterns) > 1 and isinstance(highlight_config, list) and all(
+            preset_configs.get(highlight.get('name'), {}).get('regex') == highlight['regex'] for highlight in highlight_config):
+        highlight_prefilter = build_combined_pattern(frozenset(highlight['name'] for highlight in highlight_config))[0]
+
+    # With the Aho-Corasick scanner, all-preset highlights need no regex at all
+    preset_order = None
+    if highlight_prefilter is not None and PRESET_SCANNER_AVAILABLE:
+        preset_order = [(highlight['name'], highlight['color']) for highlight in reversed(highlight_config)]
     
     MAX_STRING_LENGTH = 100
 
@@ -387,8 +623,11 @@ def plot_data(all_data, package_name, highlight_config, data_type, sort_order):
         return None
 
     df['Data'] = df['Data'].apply(lambda x: truncate_string(x, MAX_STRING_LENGTH))
-    df['Count'] = 1
-    df = df.groupby(['version', 'Data', 'ui_order']).sum().reset_index()
+    # Rows may arrive pre-counted
+    if 'Count' in df.columns:
+        df = df.groupby(['version', 'Data', 'ui_order'], as_index=False)['Count'].sum()
+    else:
+        df = df.groupby(['version', 'Data', 'ui_order']).size().reset_index(name='Count')
 
     if df.empty:
         print(f"No data to plot for {data_type}.")
@@ -400,172 +639,76 @@ def plot_data(all_data, package_name, highlight_config, data_type, sort_order):
     else:  # 'vercode'
         sorted_versions = sorted(df['version'].unique(), key=lambda x: int(x) if x.isdigit() else x)
 
-    # Pivot the count data
-    df_count_pivot = df.pivot_table(index='Data', columns='version', values='Count', aggfunc='sum', fill_value=0)
-    df_count_pivot = df_count_pivot[sorted_versions]
+    # Count grid (rows: features in first-seen order, columns: sorted_versions), filled by integer
+    # position; duplicate (feature, version) rows add up like the old pivot's sum
+    row_codes, features = pd.factorize(df['Data'])
+    version_index = {version: j for j, version in enumerate(sorted_versions)}
+    counts = np.zeros((len(features), len(sorted_versions)), dtype=np.int64)
+    np.add.at(counts, (row_codes, df['version'].map(version_index).to_numpy()), df['Count'].to_numpy())
 
     # Create x-axis labels
     sorted_versions_with_dates = sorted_versions
 
-    # Evolutionary sorting logic
-    # 1: Count appearances of each domain across all versions
-    data_appearances = {}
-    for version in sorted_versions:
-        for item in df[df['version'] == version]['Data'].unique():
-            data_appearances[item] = data_appearances.get(item, 0) + 1
-
-    # 2: Sort domains within each version based on appearances
-    version_sorted_data = {}
-    for version in sorted_versions:
-        current_version_data = df[df['version'] == version]['Data'].unique().tolist()
-        # Sort domains within current version by total appearances (descending)
-        sorted_data = sorted(current_version_data, key=lambda x: (-data_appearances[x], x))
-        version_sorted_data[version] = sorted_data
-
-    # 3: Build master list of domains, maintaining staircase effect
-    master_data_list = []
-    seen_data = set()
-
-    for version in sorted_versions:
-        current_version_sorted_data = version_sorted_data[version]
-        new_or_readded_data = [item for item in current_version_sorted_data if item not in seen_data]
-        master_data_list.extend(new_or_readded_data)
-        seen_data.update(new_or_readded_data)
-
-    sorted_data = master_data_list
+    # Evolutionary sorting logic, read straight off the grid
+    presence = counts > 0
+    # 1: Number of versions each domain appears in
+    data_appearances = presence.sum(axis=1)
+    # 2: Index of the first version each domain appears in
+    first_version = presence.argmax(axis=1)
+
+    # 3: Order by first appearance, then by total appearances (descending), keeping the staircase effect
+    # (np.lexsort takes its primary key last)
+    order = np.lexsort((np.asarray(features, dtype=str), -data_appearances, first_version))
+    sorted_data = features[order].tolist()
+
+    # Count and presence grids in display order (rows: sorted_data, columns: sorted_versions)
+    count_matrix = counts[order]
+    presence_matrix = count_matrix > 0
+
+    def highlight_color(item):
+        return (match_preset_color(item, preset_order) if preset_order
+                else match_highlight_color(item, highlight_patterns, highlight_prefilter))
 
     # Create hover text matrix
-    hover_text = []
-    for item in sorted_data:
-        hover_text_row = []
-        for version in sorted_versions:
-            count = df_count_pivot.at[item, version] if version in df_count_pivot.columns else 0
-            hover_text_data = f"Feature: {truncate_string(item, MAX_STRING_LENGTH)}<br>Version: {version}<br>Count: {count}"
-            hover_text_row.append(hover_text_data)
-        hover_text.append(hover_text_row)
+    # Items were truncated before grouping; only the per-version part varies along a row
+    version_labels = [f"<br>Version: {version}<br>Count: " for version in sorted_versions]
+    hover_text = [
+        [f"Feature: {item}{label}{count}" for label, count in zip(version_labels, row_counts)]
+        for item, row_counts in zip(sorted_data, count_matrix.tolist())
+    ]
 
     # Create feature info list
     feature_info = []
-    for item in sorted_data:
+    for feature in sorted_data:
         info = {
-            'feature': truncate_string(item, MAX_STRING_LENGTH),
-            'alienvault_link': f"https://otx.alienvault.com/indicator/domain/{item}",
-            'whois_link': f"https://www.whois.com/whois/{item}"
+            'feature': feature,
+            'alienvault_link': f"https://otx.alienvault.com/indicator/domain/{feature}",
+            'whois_link': f"https://www.whois.com/whois/{feature}",
+            'open_url': f"https://{feature}",
+            'virustotal_link': f"https://www.virustotal.com/gui/domain/{feature}",
+            'shodan_link': f"https://www.shodan.io/search?query={feature}",
+            'urlscan_link': f"https://urlscan.io/search/#{feature}"
         }
         feature_info.append(info)
 
     # Set threshold for max features to display
     MAX_FEATURES_TO_DISPLAY = 250
 
-    if len(sorted_data) > MAX_FEATURES_TO_DISPLAY:
-        # Create figure without displaying it
-        fig = go.Figure(data=go.Heatmap(
-            showscale=False,
-            z=df_count_pivot.reindex(sorted_data).values,
-            x=sorted_versions,
-            y=sorted_data,
-            text=hover_text,
-            hoverinfo='text',
-            colorscale=[[0, 'white'], [0.01, 'grey'], [0.4, '#505050'], [1, 'black']],
-            zmin=0,
-            zmax=df_count_pivot.max().max(),
-            xgap=1,
-            ygap=1
-        ))
-
-        # Update layout
-        fig.update_layout(
-            title=f"{data_type.capitalize()} Presence and Frequency Across Versions, {package_name}",
-            xaxis=dict(tickmode='array', tickvals=sorted_versions, ticktext=sorted_versions_with_dates),
-            yaxis=dict(autorange="reversed")
-        )
-
-        # Create shapes for highlighting
-        shapes = []
-        if highlight_config:  # Check if highlight config exists
-            for data_idx, item in enumerate(sorted_data):
-                for version_idx, version in enumerate(sorted_versions):
-                    count = df_count_pivot.loc[item, version]
-                    if count > 0:
-                        matched_color = None
-                        for highlight in reversed(highlight_config):
-                            if re.search(highlight['regex'], item, re.IGNORECASE):
-                                matched_color = highlight['color']
-                                break
-                        if matched_color:
-                            shapes.append({
-                                'type': 'rect',
-                                'x0': version_idx - 0.5,
-                                'y0': data_idx - 0.5,
-                                'x1': version_idx + 0.5,
-                                'y1': data_idx + 0.5,
-                                'fillcolor': matched_color,
-                                'opacity': 0.3,
-                                'line': {'width': 0},
-                            })
-
-        fig.update_layout(shapes=shapes)
+    # Highlighting is drawn as one overlay trace rather than a shape per cell
+    overlay = None
+    if highlight_patterns:  # Check if highlight config exists
+        overlay = highlight_overlay(sorted_data, presence_matrix, highlight_color)
 
-        return {
-            'figure': fig,
-            'feature_info': feature_info,
-            'too_large_to_display': True,
-            'feature_count': len(sorted_data)
-        }
-    else:
-        # Create heatmap
-        fig = go.Figure(data=go.Heatmap(
-            showscale=False,
-            z=df_count_pivot.reindex(sorted_data).values,
-            x=sorted_versions,
-            y=sorted_data,
-            text=hover_text,
-            hoverinfo='text',
-            colorscale=[[0, 'white'], [0.01, 'grey'], [0.4, '#505050'], [1, 'black']],
-            zmin=0,
-            zmax=df_count_pivot.max().max(),
-            xgap=1,
-            ygap=1
-        ))
-
-        # Create shapes for highlighting
-        shapes = []
-        if highlight_config:  # Check if highlight config exists
-            for data_idx, item in enumerate(sorted_data):
-                for version_idx, version in enumerate(sorted_versions):
-                    count = df_count_pivot.loc[item, version]
-                    if count > 0:
-                        matched_color = None
-                        for highlight in reversed(highlight_config):
-                            if re.search(highlight['regex'], item, re.IGNORECASE):
-                                matched_color = highlight['color']
-                                break
-                        if matched_color:
-                            shapes.append({
-                                'type': 'rect',
-                                'x0': version_idx - 0.5,
-                                'y0': data_idx - 0.5,
-                                'x1': version_idx + 0.5,
-                                'y1': data_idx + 0.5,
-                                'fillcolor': matched_color,
-                                'opacity': 0.3,
-                                'line': {'width': 0},
-                            })
-
-        # Update layout
-        fig.update_layout(
-            shapes=shapes,
-            title=f"{data_type.capitalize()} Presence and Frequency Across Versions, {package_name}",
-            xaxis=dict(tickmode='array', tickvals=list(range(len(sorted_versions))), ticktext=sorted_versions_with_dates),
-            yaxis=dict(autorange="reversed")
-        )
+    fig = build_heatmap(count_matrix, sorted_data, sorted_versions, sorted_versions_with_dates, hover_text, overlay,
+                        f"{data_type.capitalize()} Presence and Frequency Across Versions, {package_name}")
 
-        return {
-            'figure': fig,
-            'feature_info': feature_info,
-            'too_large_to_display': False,
-            'feature_count': len(sorted_data)
-        }
+    # Too many rows to show inline; the figure is offered as a download instead
+    return {
+        'figure': fig,
+        'feature_info': feature_info,
+        'too_large_to_display': len(sorted_data) > MAX_FEATURES_TO_DISPLAY,
+        'feature_count': len(sorted_data)
+    }
 
 # Old implementation for backwards compatibility
 
@@ -574,14 +717,8 @@ def generate_download_link(fig, package_name, data_type):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{package_name}_{data_type}_{timestamp}.html"
     
-    # Convert figure to HTML
-    plot_html = pio.to_html(fig, full_html=False)
-    
-    # Encode HTML content
-    encoded = base64.b64encode(plot_html.encode()).decode()
-    
-    # Create download link
-    href = f"data:text/html;base64,{encoded}"
+    # Create download link, reusing the encoded HTML if this figure was seen before
+    href = figure_download_href(fig)
     
     return html.Div(children=[
         html.A(